@@ -1,193 +1,85 @@
-import zarr
-import s3fs
 import pandas as pd
-import xarray as xr
 import numpy as np
 
-from pathlib import Path
-from datetime import datetime
-from glob import glob
 from tqdm import tqdm
-from concurrent.futures import ThreadPoolExecutor
-
-from scipy.spatial import cKDTree
-
-
-# for projecting zarr -> lat/lon
-url = "s3://hrrrzarr/sfc/20210601/20210601_00z_anl.zarr"
-fs = s3fs.S3FileSystem(anon=True)
-
-# used for coordinate projection
-chunk_index = xr.open_zarr(s3fs.S3Map("s3://hrrrzarr/grid/HRRR_chunk_index.zarr", s3=fs))
-
-# --- load dataframe ---
-# Avoid reading then dropping "Unnamed: 0"
-df1 = pd.read_csv(
-    "/playpen-ssd/levi/ccrfcd-gauge-grids/data/2021-01-01_2025-07-25_gt_p1.csv",
-    index_col=0,
-)
-df2 = pd.read_csv(
-    "/playpen-ssd/levi/ccrfcd-gauge-grids/data/2021-01-01_2025-07-25_gt_p2.csv",
-    index_col=0,
-)
-df  = pd.concat([df1, df2], axis=0, ignore_index=True)
-
-
-VARS_OF_INTEREST = [
-    {"name": "DPT", "level": "2m_above_ground", "store": "sfc"},
-    {"name": "PWAT", "level": "entire_atmosphere_single_layer", "store": "sfc"},
-    {"name": "HGT", "level": "level_of_adiabatic_condensation_from_sfc", "store": "sfc"},
-    {"name": "HGT", "level": "highest_tropospheric_freezing_level", "store": "sfc"},
-    {"name": "APCP", "level": "surface", "store": "sfc"},
-    {"name": "DPT", "level": "925mb", "store": "sfc"},
-    {"name": "DPT", "level": "850mb", "store": "sfc"},
-    {"name": "DPT", "level": "700mb", "store": "sfc"},
-    {"name": "DPT", "level": "500mb", "store": "sfc"},
-    {"name": "UGRD", "level": "850mb", "store": "sfc"},
-    {"name": "VGRD", "level": "850mb", "store": "sfc"},
-    {"name": "UGRD", "level": "700mb", "store": "sfc"},
-    {"name": "VGRD", "level": "700mb", "store": "sfc"},
-    {"name": "TMP", "level": "2m_above_ground", "store": "sfc"},
-    {"name": "PRES", "level": "surface", "store": "sfc"},
-    {"name": "HGT", "level": "700mb", "store": "sfc"},
-    {"name": "HGT", "level": "850mb", "store": "sfc"},
-    {"name": "TMP", "level": "700mb", "store": "sfc"},
-    {"name": "TMP", "level": "850mb", "store": "sfc"},
-    {"name": "TMP", "level": "500mb", "store": "sfc"},
-    {"name": "SPFH", "level": "1000mb", "store": "prs"},
-    {"name": "SPFH", "level": "925mb",  "store": "prs"},
-    {"name": "SPFH", "level": "850mb",  "store": "prs"},
-    {"name": "SPFH", "level": "700mb",  "store": "prs"},
-    {"name": "RH",   "level": "925mb",  "store": "prs"},
-    {"name": "RH",   "level": "850mb",  "store": "prs"},
-    {"name": "RH",   "level": "700mb",  "store": "prs"},
-]
-
-# Faster membership test than scanning VARS_OF_INTEREST for every zarr file
-VARS_SET = {(v["level"], v["name"]) for v in VARS_OF_INTEREST}
-
-HRRR_ENV_DIR = "/playpen-ssd/levi/ccrfcd-gauge-grids/data/hrrr-env"
-
-# TZ assumed UTC
-dt_fp_dict = {datetime.strptime(Path(fp).name, "%Y%m%d_%Hz_anl"): fp for fp in glob(f"{HRRR_ENV_DIR}/*")}
-
 
-def get_hrrr_dir_path(dt: datetime) -> str | None:
-    # truncate precision < hour
-    truc_dt = datetime(year=dt.year, month=dt.month, day=dt.day, hour=dt.hour)
-    return dt_fp_dict.get(truc_dt)
+from src.utils.hrrr.grid import sync_chunk_index
+from src.utils.hrrr.gauge_index import GaugeHRRRIndex
+from src.utils.hrrr.cube import HRRREnvCube, ingest
+from src.utils.hrrr.variables import VARS_OF_INTEREST, column_name
 
 
-# Cache env var listings per HRRR directory so we don't glob/open metadata per row
-_env_vars_cache: dict[str, list[dict]] = {}
-
-
-def get_env_vars(hrrr_dir: str) -> list[dict]:
-    """
-    Return a list of dicts like:
-        [{"level": ..., "var_name": ..., "var_zarr": zarr.Array}, ...]
-    """
-    if hrrr_dir in _env_vars_cache:
-        return _env_vars_cache[hrrr_dir]
-
-    evd = []
-    env_var_zarrs = glob(f"{hrrr_dir}/*/*/*/*/.zarray")
+DATA_DIR = "/playpen-ssd/levi/ccrfcd-gauge-grids/data"
 
-    for fp in env_var_zarrs:
-        p = Path(fp)
-        env_var_zarr_fp = p.parent
-        env_var_name    = p.parent.name
-        level_name      = p.parent.parent.name
+DATASET_FPS = [
+    f"{DATA_DIR}/2021-01-01_2025-07-25_gt_p1.csv",
+    f"{DATA_DIR}/2021-01-01_2025-07-25_gt_p2.csv",
+]
+OUT_FP = f"{DATA_DIR}/2021-01-01_2025-07-25_hrrr_env.csv"
 
-        if (level_name, env_var_name) in VARS_SET:
-            evd.append({
-                "level": level_name,
-                "var_name": env_var_name,
-                "var_zarr": zarr.open_array(env_var_zarr_fp, mode="r"),
-            })
+# output columns; "{level}_{name}"
+ENV_COLUMNS = [column_name(v) for v in VARS_OF_INTEREST]
 
-    _env_vars_cache[hrrr_dir] = evd
-    return evd
+HRRR_ENV_DIR        = f"{DATA_DIR}/hrrr-env"
+HRRR_ENV_CUBE_FP    = f"{DATA_DIR}/hrrr-env.zarr"
+HRRR_CHUNK_INDEX_FP = f"{DATA_DIR}/hrrr-grid/HRRR_chunk_index.zarr"
+GAUGE_INDEX_DIR     = f"{DATA_DIR}/__cache__/hrrr/gauge_index"
 
 
-def build_latlon_index(chunk_index):
-    """
-    Build a nearest-neighbor index for the HRRR grid.
-    Returns (tree, grid_shape, lons_0_360_flag).
+def extract_env_params_cube(
+        df: pd.DataFrame,
+        index: GaugeHRRRIndex,
+        cube: HRRREnvCube,
+        bilinear: bool = False,
+    ) -> pd.DataFrame:
     """
-    # Use .values to avoid extra xarray wrapping work
-    lats = np.asarray(chunk_index.latitude.values)
-    lons = np.asarray(chunk_index.longitude.values)
-
-    lons_0_360 = (np.nanmin(lons) >= 0) and (np.nanmax(lons) <= 360)
-    if lons_0_360:
-        lons = np.mod(lons, 360.0)
+    HRRR env. params of every ``df`` row (gauge ``gauge_idx``, analysis hour of ``start_datetime_utc``), read from a consolidated ``HRRREnvCube``.
 
-    pts = np.column_stack([lats.ravel(), lons.ravel()])
-    tree = cKDTree(pts)
-    return tree, lats.shape, lons_0_360
+    - Grid points come from the precomputed ``index``: nearest point, or its bilinear corners w/ ``bilinear``
+    - Each variable is read once as a ``[T, G]`` series block at every gauge, then gathered at each row's ``(hour, gauge)``
 
-
-def latlon_to_iyix(lat, lon, tree, grid_shape, lons_0_360=True):
-    """
-    Convert (lat, lon) to nearest (iy, ix) once, then reuse for all variables.
+    Returns
+    ---
+    - A frame w/ one column per ``ENV_COLUMNS`` aligned to ``df.index``; NaN where no gauge/HRRR hour/variable was found
     """
-    if lons_0_360:
-        lon = lon % 360.0
-    dist, flat_idx = tree.query([lat, lon], k=1)
-    iy, ix = np.unravel_index(flat_idx, grid_shape)
-    return int(iy), int(ix), float(dist)
-
-
-# Build index once
-tree, grid_shape, lons_0_360 = build_latlon_index(chunk_index)
-
-
-def proc_row(i, row):
-    vals = row
 
-    # Much cheaper than split/join, assuming start_datetime_utc begins with "YYYY-MM-DD HH"
-    dt = datetime.strptime(vals.start_datetime_utc[:13], "%Y-%m-%d %H")
+    n = len(df)
+    out = {c: np.full(n, np.nan, dtype=np.float64) for c in ENV_COLUMNS}
 
-    hrrr_dir = get_hrrr_dir_path(dt)
-    if hrrr_dir is None:
-        return i, {}
+    gauge_ids = pd.to_numeric(df["gauge_idx"], errors="coerce").to_numpy(dtype=np.float64)
+    located   = np.isfinite(gauge_ids)
+    row_pt    = np.full(n, -1, dtype=np.int64)
+    row_pt[located] = index.positions(gauge_ids[located].astype(np.int64))
 
-    lat, lon = vals.lat, vals.lon
-    env_vars = get_env_vars(hrrr_dir)
-    if not env_vars:
-        return i, {}
+    hours  = pd.to_datetime(df["start_datetime_utc"].astype(str).str[:13], format="%Y-%m-%d %H", errors="coerce")
+    row_t  = cube.time_positions(hours)
+    rows   = np.flatnonzero((row_pt >= 0) & (row_t >= 0))
 
-    # Compute nearest grid point ONCE per row
-    iy, ix, _dist = latlon_to_iyix(lat, lon, tree, grid_shape, lons_0_360=lons_0_360)
+    for comb_name in tqdm(ENV_COLUMNS):
+        if comb_name not in cube.columns:
+            continue
+        if bilinear:
+            vals = (cube.gather(comb_name, index.nbr_iy, index.nbr_ix) * index.nbr_w).sum(axis=-1)
+        else:
+            vals = cube.gather(comb_name, index.iy, index.ix)
+        out[comb_name][rows] = vals[row_t[rows], row_pt[rows]]
 
-    row_dict = {}
-    # Read a single element from each zarr array (no full-array materialization)
-    for var in env_vars:
-        comb_name = var["level"] + "_" + var["var_name"]
-        row_dict[comb_name] = float(var["var_zarr"][iy, ix])
+    return pd.DataFrame(out, index=df.index)
 
-    return i, row_dict
 
+def main() -> None:
 
-all_rows = {}
+    # --- load dataframe ---
+    df = pd.concat([pd.read_csv(fp, index_col=0) for fp in DATASET_FPS], axis=0, ignore_index=True)
 
-import json
+    # gauge -> grid lookup; built from a local chunk index on the first run, loaded from disk afterwards
+    index = GaugeHRRRIndex.for_frame(df, sync_chunk_index(HRRR_CHUNK_INDEX_FP), GAUGE_INDEX_DIR)
 
-# Threading across rows only (avoid nested thread pools)
-with ThreadPoolExecutor() as ex:
-    completed = 0
-    for i, row_dict in tqdm(
-        ex.map(proc_row, range(len(df)), df.itertuples(index=False)),
-        total=len(df)
-    ):
-        all_rows[i] = row_dict
-        completed += 1
+    # consolidate any newly downloaded hours, then read every row from the cube
+    ingest(HRRR_ENV_DIR, HRRR_ENV_CUBE_FP)
+    env = extract_env_params_cube(df, index, HRRREnvCube(HRRR_ENV_CUBE_FP))
+    pd.concat([df, env], axis=1).to_csv(OUT_FP)
 
-        # Write less often and based on completed count (not i, since results may be out of order)
-        if completed % 1000 == 0:
-            with open("scripts/hrrr_env_rows.json", "w") as f:
-                json.dump(all_rows, f)
 
-with open("scripts/hrrr_env_rows.json", "w") as f:
-    json.dump(all_rows, f)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
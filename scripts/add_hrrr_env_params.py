@@ -1,26 +1,26 @@
 import zarr
 import timeit
-import s3fs
 import pandas as pd
-import xarray as xr
 
 from pathlib import Path
 from datetime import datetime, timezone
 from glob import glob
 
+from src.utils.hrrr.grid import sync_chunk_index
+from src.utils.hrrr.gauge_index import GaugeHRRRIndex
 
-# for projecting zarr -> lat/lon
-url = "s3://hrrrzarr/sfc/20210601/20210601_00z_anl.zarr"
-fs = s3fs.S3FileSystem(anon=True)
-
-# used for coordinate projection
-chunk_index = xr.open_zarr(s3fs.S3Map("s3://hrrrzarr/grid/HRRR_chunk_index.zarr", s3=fs))
 
 # --- load dataframe ---
 df1 = pd.read_csv("/playpen-ssd/levi/ccrfcd-gauge-grids/data/2021-01-01_2025-07-25_gt_p1.csv")
 df2 = pd.read_csv("/playpen-ssd/levi/ccrfcd-gauge-grids/data/2021-01-01_2025-07-25_gt_p2.csv")
 df  = pd.concat([df1, df2], axis=0).drop("Unnamed: 0", axis=1)
 
+# gauge -> grid lookup; built from a local chunk index on the first run, loaded from disk afterwards
+# same absolute locations as add_hrr_env_params_v2.py, so both scripts share one chunk index + gauge index
+HRRR_CHUNK_INDEX_FP = "/playpen-ssd/levi/ccrfcd-gauge-grids/data/hrrr-grid/HRRR_chunk_index.zarr"
+GAUGE_INDEX_DIR     = "/playpen-ssd/levi/ccrfcd-gauge-grids/data/__cache__/hrrr/gauge_index"
+gauge_index = GaugeHRRRIndex.for_frame(df, sync_chunk_index(HRRR_CHUNK_INDEX_FP), GAUGE_INDEX_DIR)
+
 
 VARS_OF_INTEREST = [
     {"name": "DPT", "level": "2m_above_ground", "store": "sfc"},
@@ -120,55 +120,21 @@ env_var_d = get_env_vars(dir_fp)
 
 
 import numpy as np
-from scipy.spatial import cKDTree
 
 
-def build_latlon_index(chunk_index):
+def value_at_gauge(gauge_idx, arr):
     """
-    Build a nearest-neighbor index for the HRRR grid.
-    Returns (tree, grid_shape, lons_0_360_flag).
-    """
-    lats = np.asarray(chunk_index.latitude)
-    lons = np.asarray(chunk_index.longitude)
-
-    # Normalize lon handling (your notebook uses 0..360)
-    lons_0_360 = (np.nanmin(lons) >= 0) and (np.nanmax(lons) <= 360)
-
-    if lons_0_360:
-        lons = np.mod(lons, 360.0)  # keep 0..360
-    else:
-        # keep -180..180 form; still OK, just be consistent
-        pass
-
-    pts = np.column_stack([lats.ravel(), lons.ravel()])
-
-    if cKDTree is None:
-        raise ImportError("scipy is required for the fast KDTree approach (pip install scipy).")
-
-    tree = cKDTree(pts)
-    return tree, lats.shape, lons_0_360
-
-
-def value_at_latlon(lat, lon, arr, tree, grid_shape, lons_0_360=True):
-    """
-    Nearest-neighbor value from arr at (lat, lon).
+    Nearest-neighbor value from arr at a gauge.
     Returns (value, (iy, ix), distance_degrees).
     """
-    
-    # if lon in range: 0-360 -> -180-180
-    if lons_0_360:
-        lon = lon % 360.0
 
-    dist, flat_idx = tree.query([lat, lon], k=1)
-    iy, ix = np.unravel_index(flat_idx, grid_shape)
-    return float(arr[iy, ix]), (int(iy), int(ix)), float(dist)
+    pos = int(gauge_index.positions([gauge_idx])[0])
+    assert pos >= 0, f"Error: gauge {gauge_idx} is not in the HRRR gauge index"
+    iy, ix = gauge_index.iy[pos], gauge_index.ix[pos]
+    return float(arr[iy, ix]), (int(iy), int(ix)), float(gauge_index.dist[pos])
 
 
-# Build index once
-tree, grid_shape, lons_0_360 = build_latlon_index(chunk_index)
-
-
-def proc_var(var, dt, lat, lon):
+def proc_var(var, dt, gauge_idx):
 
     # unique level, name ID
     comb_name = var["level"] + "_" + var["var_name"]
@@ -183,7 +149,7 @@ def proc_var(var, dt, lat, lon):
 
     if "val" not in zarr_cache[dt][comb_name]:
 
-        val, (iy, ix), dist = value_at_latlon(lat, lon, za, tree, grid_shape, lons_0_360=lons_0_360)
+        val, (iy, ix), dist = value_at_gauge(gauge_idx, za)
         zarr_cache[dt][comb_name]["val"] = val
 
     # load from cache
@@ -203,7 +169,7 @@ def proc_row(i, row):
     
     # get path to corresponding hrrr zarr dir
     hrrr_dir = get_hrrr_dir_path(dt)
-    lat, lon = vals.lat, vals.lon
+    gauge_idx = vals.gauge_idx
 
     env_vars = get_env_vars(hrrr_dir)
     assert len(env_vars) > 0
@@ -215,7 +181,7 @@ def proc_row(i, row):
 
     with ThreadPoolExecutor() as ex:
 
-        procs = [ex.submit(proc_var, var, dt, lat, lon) for var in env_vars]
+        procs = [ex.submit(proc_var, var, dt, gauge_idx) for var in env_vars]
         for res in as_completed(procs):
             
             result = res.result()
@@ -243,8 +209,9 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 zarr_cache = {}
 all_rows   = {}
 
-
-import json
+# same format as add_hrr_env_params_v2.py (the dataset + one "{level}_{name}" column per variable), own file;
+# the notebooks read the v2 output
+OUT_FP = "/playpen-ssd/levi/ccrfcd-gauge-grids/data/2021-01-01_2025-07-25_hrrr_env_legacy.csv"
 
 
 with ThreadPoolExecutor() as ex:
@@ -256,8 +223,7 @@ with ThreadPoolExecutor() as ex:
     for proc in tqdm(as_completed(procs), total=len(procs)):
         i, row_dict = proc.result()
         all_rows[i] = row_dict
-        if i % 100 == 0: 
-            with open("scripts/hrrr_env_rows.json", "w") as f:
-                json.dump(all_rows, f)
 
-with open("scripts/hrrr_env_rows.json", "w") as f: json.dump(all_rows, f)
\ No newline at end of file
+# ``i`` is the row's position in ``df``
+env = pd.DataFrame.from_dict(all_rows, orient="index").reindex(range(len(df)))
+pd.concat([df.reset_index(drop=True), env], axis=1).to_csv(OUT_FP)
\ No newline at end of file
@@ -9,6 +9,7 @@ from tqdm import tqdm
 from pathlib import Path
 from datetime import datetime, timedelta
 
+from src.utils.mrms.grid import BoundingBox
 from src.mrms_qpe.fetch_mrms_qpe import MRMSQPEClient
 from src.stats.mrms_ccrfcd_stats_client import StatsClient, MRMSProductsEnum
 
@@ -29,6 +30,7 @@ LAT_MIN = 35.8
 LAT_MAX = 36.4
 LON_MIN = -115.4
 LON_MAX = -114.8
+LV_BBOX = BoundingBox(LAT_MIN, LAT_MAX, LON_MIN, LON_MAX)
 
 
 stats_client = StatsClient()
@@ -49,7 +51,7 @@ def is_valid_date(dt: datetime) -> bool:
 def is_min_rain_day(dt: datetime) -> bool:
     
     next_day = dt + timedelta(days=1)
-    xarr: xarray.Dataset = mrms_qpe_client.fetch_radar_only_qpe_24hr(next_day)
+    xarr: xarray.Dataset = mrms_qpe_client.fetch_radar_only_qpe_24hr(next_day, bbox=LV_BBOX)
     
     # no MRMS file @path
     if xarr is None: 
@@ -0,0 +1,129 @@
+"""
+Offline check of the selective HRRR download against a local stand-in of the ``hrrrzarr`` tree.
+
+    python -m scripts.validate_hrrr_download
+
+- only the kept chunk keys + zarr metadata (``ZARR_META``) of each variable are listed and transferred
+- the local layout is the ``{level}/{name}/{level}/{name}/{chunk}`` one ``cube.read_hour`` opens
+- ``chunks_window`` / ``chunks_mask`` cover exactly the kept chunks on the store's own ``.zarray`` chunking
+- ``skip_existing`` skips hours that are already on disk
+"""
+
+import json
+import tempfile
+import numpy as np
+
+from pathlib import Path
+from datetime import datetime
+from fsspec.implementations.local import LocalFileSystem
+
+from src.utils.mrms.mrms import MRMSAWSS3Client
+from src.utils.hrrr.grid import HRRR_SHAPE, HRRR_CHUNK_SHAPE
+from src.utils.hrrr.download import VEF_CHUNKS, ZARR_META, hour_dir_name, hour_url, list_hour, submit_hours
+from src.utils.hrrr.cube import chunks_window, chunks_mask
+from src.utils.hrrr.variables import VARS_OF_INTEREST
+
+
+# a few fields from each store is enough; the listing is per-variable
+VARS = [v for v in VARS_OF_INTEREST if v["store"] == "sfc"][:3] + [v for v in VARS_OF_INTEREST if v["store"] == "prs"][:2]
+
+
+def _chunk_grid() -> tuple[int, int]:
+    return -(-HRRR_SHAPE[0] // HRRR_CHUNK_SHAPE[0]), -(-HRRR_SHAPE[1] // HRRR_CHUNK_SHAPE[1])
+
+
+def make_hour(bucket: Path, dt: datetime) -> None:
+    """
+    Every chunk of every ``VARS`` field of one hour, laid out like ``s3://hrrrzarr``, plus some keys that must not be fetched.
+    """
+
+    ny, nx = _chunk_grid()
+    for var in VARS:
+        root = Path(hour_url(dt, var["store"], str(bucket)))
+        grp  = root / var["level"] / var["name"]
+        arr  = grp / var["level"] / var["name"]
+        arr.mkdir(parents=True, exist_ok=True)
+
+        (root / ".zgroup").write_text('{"zarr_format": 2}')
+        (root / ".zmetadata").write_text("{}")
+        (grp / ".zgroup").write_text('{"zarr_format": 2}')
+        (grp / ".zattrs").write_text("{}")
+        (arr / ".zattrs").write_text("{}")
+        (arr / ".zarray").write_text(json.dumps({
+            "zarr_format": 2, "shape": list(HRRR_SHAPE), "chunks": list(HRRR_CHUNK_SHAPE), "dtype": "<f2",
+            "compressor": None, "fill_value": None, "filters": None, "order": "C",
+        }))
+        for cy in range(ny):
+            for cx in range(nx):
+                (arr / f"{cy}.{cx}").write_bytes(b"\0")
+
+        # noise the filter must not pick up
+        (arr / ".DS_Store").write_bytes(b"\0")
+        (arr / "4.1.tmp").write_bytes(b"\0")
+
+    # a field we did not ask for
+    other = Path(hour_url(dt, "sfc", str(bucket))) / "surface" / "GUST" / "surface" / "GUST"
+    other.mkdir(parents=True, exist_ok=True)
+    (other / ".zarray").write_text("{}")
+    (other / "4.1").write_bytes(b"\0")
+
+
+def main() -> None:
+
+    dts = [datetime(2024, 7, 1, 0), datetime(2024, 7, 1, 1)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        bucket = Path(tmp) / "hrrrzarr"
+        out    = Path(tmp) / "hrrr-env"
+        for dt in dts:
+            make_hour(bucket, dt)
+
+        client = MRMSAWSS3Client(file_system=LocalFileSystem(), max_workers=4)
+
+        # 1. listing: per variable, exactly the kept chunks + the metadata of its group and array
+        keys, tos = list_hour(client, dts[0], str(out), vars=VARS, bucket=str(bucket))
+        sub_dir   = out / hour_dir_name(dts[0])
+        for var in VARS:
+            rel  = f"{var['level']}/{var['name']}/"
+            mine = sorted(Path(t).relative_to(sub_dir).as_posix() for t in tos if Path(t).relative_to(sub_dir).as_posix().startswith(rel))
+            want = sorted(
+                [f"{rel}.zgroup", f"{rel}.zattrs", f"{rel}{rel}.zattrs", f"{rel}{rel}.zarray"]
+                + [f"{rel}{rel}{c}" for c in VEF_CHUNKS]
+            )
+            assert mine == want, f"Error: {rel}\n  got:  {mine}\n  want: {want}"
+        assert len(keys) == len(tos) == len(VARS) * (4 + len(VEF_CHUNKS)), f"Error: {len(keys)} keys"
+        assert not any("GUST" in k for k in keys), "Error: fetched a field that was not asked for"
+        assert all(Path(k).name in ZARR_META or Path(k).name in VEF_CHUNKS for k in keys), "Error: unexpected key"
+        print(f"ok   list_hour: {len(keys)} keys")
+
+        # 2. the window + mask the cube is built on cover exactly the kept chunks of the store's chunking
+        zarray = json.loads((Path(hour_url(dts[0], VARS[0]["store"], str(bucket))) / VARS[0]["level"] / VARS[0]["name"] / VARS[0]["level"] / VARS[0]["name"] / ".zarray").read_text())
+        assert tuple(zarray["chunks"]) == HRRR_CHUNK_SHAPE, f"Error: store chunks {zarray['chunks']} != {HRRR_CHUNK_SHAPE}"
+        rows, cols = chunks_window(VEF_CHUNKS)
+        mask = chunks_mask(rows, cols, VEF_CHUNKS)
+        kept = np.zeros(HRRR_SHAPE, dtype=bool)
+        for c in VEF_CHUNKS:
+            cy, cx = (int(v) for v in c.split("."))
+            kept[cy * HRRR_CHUNK_SHAPE[0]:(cy + 1) * HRRR_CHUNK_SHAPE[0], cx * HRRR_CHUNK_SHAPE[1]:(cx + 1) * HRRR_CHUNK_SHAPE[1]] = True
+        assert kept[rows, cols].sum() == kept.sum(), "Error: chunks_window does not cover every kept chunk"
+        assert np.array_equal(mask, kept[rows, cols]), "Error: chunks_mask != kept chunks"
+        print(f"ok   chunks_window {rows}, {cols}; {int(mask.sum())} / {mask.size} cells kept")
+
+        # 3. end to end; everything listed lands on disk, nothing else does
+        bulk, sub_dirs = submit_hours(client, dts, str(out), vars=VARS, bucket=str(bucket))
+        results = bulk.wait()
+        assert sorted(sub_dirs) == sorted(str(out / hour_dir_name(dt)) for dt in dts), f"Error: {sub_dirs}"
+        on_disk = sorted(str(p) for p in out.rglob("*") if p.is_file())
+        assert on_disk == sorted(r.local_path for r in results), "Error: files on disk != transfers"
+        assert len(on_disk) == len(dts) * len(keys), f"Error: {len(on_disk)} files"
+        print(f"ok   submit_hours: {len(on_disk)} files")
+
+        # 4. hours already on disk are skipped
+        bulk, sub_dirs = submit_hours(client, dts, str(out), vars=VARS, bucket=str(bucket))
+        assert bulk.total == 0 and sub_dirs == [], f"Error: re-listed {sub_dirs}"
+        print("ok   skip_existing")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Offline check of ``MRMSAWSS3Client`` transfers against an fsspec ``LocalFileSystem`` over a temp tree.
+
+    python -m scripts.validate_mrms_client
+
+- retry + backoff on a flaky read; no retry on a missing key
+- ``DownloadResult`` fields
+- ``BulkDownload.cancel()`` / ``progress()`` / ``wait(raise_errors=False)``
+- ``download()`` return type per mode
+"""
+
+import os
+import time
+import tempfile
+import threading
+
+from pathlib import Path
+from fsspec.implementations.local import LocalFileSystem
+
+from src.utils.mrms.mrms import MRMSAWSS3Client, DownloadResult
+
+
+class FlakyFS:
+    """
+    ``LocalFileSystem`` whose first ``n_fail`` ``get_file`` calls raise; optionally blocks every transfer on ``gate``.
+    """
+
+    def __init__(self, n_fail: int = 0, gate: threading.Event | None = None):
+        self._fs    = LocalFileSystem()
+        self.n_fail = n_fail
+        self.gate   = gate
+        self.calls  = 0
+        self._lock  = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self._fs, name)
+
+    def get_file(self, rpath, lpath, **kwargs):
+        with self._lock:
+            self.calls += 1
+            fail = self.calls <= self.n_fail
+        if self.gate is not None:
+            self.gate.wait()
+        if fail:
+            raise OSError("simulated transient read error")
+        return self._fs.get_file(rpath, lpath, **kwargs)
+
+
+def _client(fs) -> MRMSAWSS3Client:
+    client = MRMSAWSS3Client(file_system=fs, max_workers=1)
+    client._BACKOFF_S = 0.01
+    return client
+
+
+def main() -> None:
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        src = Path(tmp) / "bucket" / "CONUS" / "PRODUCT" / "20240101"
+        src.mkdir(parents=True)
+        for i in range(5):
+            (src / f"PRODUCT_20240101-00{i}000.grib2.gz").write_bytes(os.urandom(1024 * (i + 1)))
+        keys = sorted(str(p) for p in src.iterdir())
+        dst  = Path(tmp) / "out"
+
+        # 1. a flaky read is retried w/ backoff; the result records how many attempts it took
+        fs  = FlakyFS(n_fail=2)
+        res = _client(fs).download_objects(keys[:1], [str(dst / "a" / "f0")])[0]
+        assert isinstance(res, DownloadResult), f"Error: expected DownloadResult, got {type(res)}"
+        assert res.key == keys[0], f"Error: key {res.key}"
+        assert res.local_path == str(dst / "a" / "f0"), f"Error: local_path {res.local_path}"
+        assert res.bytes == os.path.getsize(keys[0]) == 1024, f"Error: bytes {res.bytes}"
+        assert res.attempts == 3 and fs.calls == 3, f"Error: attempts {res.attempts}, calls {fs.calls}"
+        assert res.elapsed >= 0.01 + 0.02, f"Error: elapsed {res.elapsed} shorter than the backoff"
+        assert Path(res.local_path).read_bytes() == Path(keys[0]).read_bytes(), "Error: content mismatch"
+        print("ok   retry/backoff + DownloadResult")
+
+        # 2. more failures than retries -> RuntimeError; a missing key is not retried
+        fs = FlakyFS(n_fail=MRMSAWSS3Client._MAX_RETRIES)
+        try:
+            _client(fs).download_objects(keys[:1], [str(dst / "b" / "f0")])
+            raise AssertionError("Error: expected a RuntimeError after exhausting retries")
+        except RuntimeError:
+            pass
+        assert fs.calls == MRMSAWSS3Client._MAX_RETRIES, f"Error: calls {fs.calls}"
+
+        fs = FlakyFS()
+        try:
+            _client(fs).download_objects([keys[0] + ".missing"], [str(dst / "b" / "missing")])
+            raise AssertionError("Error: expected FileNotFoundError for a missing key")
+        except FileNotFoundError:
+            pass
+        assert fs.calls == 1, f"Error: missing key retried {fs.calls} times"
+        print("ok   retries exhausted / missing key")
+
+        # 3. cancel(); w/ one worker blocked on the first transfer, the other 4 are still queued
+        gate = threading.Event()
+        bulk = _client(FlakyFS(gate=gate)).submit_bulk_download(keys, [str(dst / "c" / Path(k).name) for k in keys])
+        time.sleep(0.1)
+        n_cancelled = bulk.cancel()
+        gate.set()
+        results = bulk.wait(raise_errors=False)
+        progress = bulk.progress()
+        assert n_cancelled == 4, f"Error: cancelled {n_cancelled}"
+        assert results[0] is not None and all(r is None for r in results[1:]), f"Error: results {results}"
+        assert (progress["completed"], progress["failed"]) == (1, 4), f"Error: progress {progress}"
+        assert progress["bytes"] == 1024, f"Error: progress {progress}"
+        assert bulk.done(), "Error: handle not done after wait()"
+        print("ok   cancel + progress")
+
+        # 4. download(): a path for one object, always a list for a prefix
+        client = _client(FlakyFS())
+        one = client.download(keys[0], str(dst / "d"))
+        assert isinstance(one, str) and Path(one).is_file(), f"Error: download() returned {one!r}"
+
+        solo = Path(tmp) / "bucket" / "solo"
+        solo.mkdir()
+        (solo / "only.grib2.gz").write_bytes(b"x")
+        many = client.download(str(solo) + "/", str(dst / "e"), recursive=True)
+        assert isinstance(many, list) and len(many) == 1, f"Error: download(recursive=True) returned {many!r}"
+        many = client.download(str(src) + "/", str(dst / "f"), recursive=True)
+        assert sorted(Path(p).name for p in many) == [Path(k).name for k in keys], f"Error: {many}"
+        print("ok   download() return types")
+
+
+if __name__ == "__main__":
+    main()
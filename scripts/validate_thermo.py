@@ -0,0 +1,298 @@
+"""
+Check ``src/utils/hrrr/thermo.py`` against the reference implementations in ``zarr.ipynb`` on a fixed random sample,
+then time ``derive`` on 1M rows.
+
+    python -m scripts.validate_thermo [--n 20000] [--n-time 1000000]
+
+Exits non-zero if any field is outside its tolerance.
+"""
+
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+from src.utils.hrrr import thermo
+
+
+# ------------------------------------------------------------------
+# references; copied from zarr.ipynb (cells 18, 19, 20, 34)
+# ------------------------------------------------------------------
+
+def _ref_sat_vp(T):
+    T_C = T - 273.15
+    return 611.2 * np.exp(17.67 * T_C / (T_C + 243.5))
+
+
+def ref_wet_bulb_temperature(T, Td, P, max_iter=20, tol=0.05):
+    Tw = 0.5 * (T + Td)
+    e_actual = _ref_sat_vp(Td)
+    A = 6.6e-4
+    for _ in range(max_iter):
+        e_sat_Tw = _ref_sat_vp(Tw)
+        residual = e_sat_Tw - A * P * (T - Tw) - e_actual
+        T_C = Tw - 273.15
+        deriv = e_sat_Tw * 17.67 * 243.5 / (T_C + 243.5)**2 + A * P
+        delta = residual / deriv
+        Tw = Tw - delta
+        if np.all(np.abs(delta) < tol):
+            break
+    return np.clip(Tw, Td, T)
+
+
+def ref_dcape_layer(df):
+    G, RD = 9.81, 287.05
+    T_700, Td_700, z_700 = df['700mb_TMP'].values, df['700mb_DPT'].values, df['700mb_HGT'].values
+    T_850, z_850 = df['850mb_TMP'].values, df['850mb_HGT'].values
+    T_sfc, P_sfc = df['2m_above_ground_TMP'].values, df['surface_PRES'].values
+    P_700, P_850 = 70000.0, 85000.0
+
+    Tw_700 = ref_wet_bulb_temperature(T_700, Td_700, P_700)
+    dz_700_850 = z_700 - z_850
+    T_parcel_850 = Tw_700 + 6.5e-3 * dz_700_850
+    T_avg_low = 0.5 * (T_850 + T_sfc)
+    z_sfc = np.maximum(z_850 - (RD * T_avg_low / G) * np.log(P_sfc / P_850), 0)
+    dz_850_sfc = z_850 - z_sfc
+    T_parcel_sfc = T_parcel_850 + 7.5e-3 * dz_850_sfc
+
+    T_env_avg_1 = 0.5 * (T_700 + T_850)
+    buoyancy_1 = (T_env_avg_1 - 0.5 * (Tw_700 + T_parcel_850)) / T_env_avg_1
+    T_env_avg_2 = 0.5 * (T_850 + T_sfc)
+    buoyancy_2 = (T_env_avg_2 - 0.5 * (T_parcel_850 + T_parcel_sfc)) / T_env_avg_2
+    return np.maximum(G * np.maximum(buoyancy_1, 0) * dz_700_850 + G * np.maximum(buoyancy_2, 0) * dz_850_sfc, 0)
+
+
+def _ref_wetbulb_stull(T, Td):
+    T_C = T - 273.15
+    RH = np.clip(100.0 * _ref_sat_vp(Td) / _ref_sat_vp(T), 1.0, 100.0)
+    return (T_C * np.arctan(0.151977 * np.sqrt(RH + 8.313659))
+            + np.arctan(T_C + RH) - np.arctan(RH - 1.676331)
+            + 0.00391838 * RH**1.5 * np.arctan(0.023101 * RH) - 4.686035) + 273.15
+
+
+def _ref_dcape_single(T_500, Td_500, T_700, Td_700, T_850, Td_850, T_sfc, p_sfc):
+    G, RD, CP, LV, EPS = 9.81, 287.04, 1005.0, 2.501e6, 0.622
+    P_500, P_700, P_850 = 50000.0, 70000.0, 85000.0
+    Tw_500, Tw_700, Tw_850 = _ref_wetbulb_stull(T_500, Td_500), _ref_wetbulb_stull(T_700, Td_700), _ref_wetbulb_stull(T_850, Td_850)
+    if Tw_500 <= Tw_700 and Tw_500 <= Tw_850:
+        p_origin, T_parcel = P_500, Tw_500
+    elif Tw_700 <= Tw_850:
+        p_origin, T_parcel = P_700, Tw_700
+    else:
+        p_origin, T_parcel = P_850, Tw_850
+    n_levels = 40
+    dp = (p_sfc - p_origin) / (n_levels - 1)
+    dcape = 0.0
+    for i in range(n_levels - 1):
+        p = p_origin + i * dp
+        p_avg = 0.5 * (p + p + dp)
+        log_p = np.log(p_avg)
+        if p_avg <= P_700:
+            T_env = T_500 + (log_p - np.log(P_500)) / (np.log(P_700) - np.log(P_500)) * (T_700 - T_500)
+        elif p_avg <= P_850:
+            T_env = T_700 + (log_p - np.log(P_700)) / (np.log(P_850) - np.log(P_700)) * (T_850 - T_700)
+        else:
+            T_env = T_850 + (log_p - np.log(P_850)) / (np.log(p_sfc) - np.log(P_850)) * (T_sfc - T_850)
+        es = _ref_sat_vp(T_parcel)
+        ws = EPS * es / max(p - es, 1.0)
+        gamma_m = (RD * T_parcel / (p * CP)) * (1.0 + (LV * ws) / (RD * T_parcel)) / (1.0 + (LV * LV * ws * EPS) / (CP * RD * T_parcel * T_parcel))
+        T_next = T_parcel + gamma_m * dp
+        T_avg = 0.5 * (T_parcel + T_next)
+        es_p = _ref_sat_vp(T_avg)
+        ws_p = EPS * es_p / max(p_avg - es_p, 1.0)
+        Tv_parcel = T_avg * (1.0 + 0.61 * ws_p)
+        Tv_env = T_env * 1.01
+        d = Tv_parcel - Tv_env
+        if d < 0:
+            dcape += G * (-d / Tv_env) * (dp / (p_avg / (RD * Tv_env) * G))
+        T_parcel = T_next
+    return max(dcape, 0.0)
+
+
+def ref_dcape(df):
+    cols = ['500mb_TMP', '500mb_DPT', '700mb_TMP', '700mb_DPT', '850mb_TMP', '850mb_DPT', '2m_above_ground_TMP', 'surface_PRES']
+    return np.array([_ref_dcape_single(*row) for row in df[cols].to_numpy()])
+
+
+def ref_lcl_lfc_rh(df, theta_e_sfc):
+
+    # cell 18 uses Tetens, not the Bolton form of cells 19/20
+    def svp(T):
+        T_C = T - 273.15
+        return 610.78 * np.exp(17.27 * T_C / (T_C + 237.3))
+
+    def rh(T, Td):
+        return np.clip(svp(Td) / svp(T), 0, 1)
+
+    def theta_e_bolton(T, Td, p_hPa):
+        e = svp(Td)
+        r = 0.622 * e / (p_hPa * 100 - e + 1e-10)
+        return T * (1000 / p_hPa) ** 0.286 * np.exp(2.5e6 * r / (1005 * T))
+
+    lcl = df['level_of_adiabatic_condensation_from_sfc_HGT'].values
+    h_850, h_700 = df['850mb_HGT'].values, df['700mb_HGT'].values
+    T_850, Td_850, T_700, Td_700 = df['850mb_TMP'].values, df['850mb_DPT'].values, df['700mb_TMP'].values, df['700mb_DPT'].values
+    h_925  = np.maximum(0, (df['surface_PRES'].values / 100 - 925) * 8)
+    rh_925 = rh(df['925mb_DPT'].values + 4, df['925mb_DPT'].values)
+
+    th_850, th_700 = theta_e_bolton(T_850, Td_850, 850), theta_e_bolton(T_700, Td_700, 700)
+    denom = th_700 - th_850
+    denom = np.where(np.abs(denom) < 0.1, 0.1, denom)
+    lfc = np.maximum(h_850 + np.clip((theta_e_sfc - th_850) / denom, 0, 1) * (h_700 - h_850), lcl)
+
+    sample_h  = lcl[:, None] + np.linspace(0, 1, 5)[None, :] * (lfc - lcl)[:, None]
+    h_stack   = np.column_stack([h_925, h_850, h_700])
+    rh_stack  = np.column_stack([rh_925, rh(T_850, Td_850), rh(T_700, Td_700)])
+    order     = np.argsort(h_stack, axis=1)
+    h_sorted  = np.take_along_axis(h_stack, order, axis=1)
+    rh_sorted = np.take_along_axis(rh_stack, order, axis=1)
+    out = np.array([[np.interp(sample_h[i, j], h_sorted[i], rh_sorted[i]) for j in range(5)] for i in range(len(df))])
+    return out.mean(axis=1) * 100
+
+
+def ref_layer_pw(df):
+    G = 9.80665
+    p_sfc = df['surface_PRES'].values / 100.0
+
+    def q(p, Td):
+        e = 6.112 * np.exp(17.67 * (Td - 273.15) / (Td - 273.15 + 243.5))
+        return 0.622 * e / (p - e)
+
+    q_sfc, q_925 = q(p_sfc, df['2m_above_ground_DPT'].values), q(925.0, df['925mb_DPT'].values)
+    q_850, q_700 = q(850.0, df['850mb_DPT'].values), q(700.0, df['700mb_DPT'].values)
+    a = (q_sfc + q_925) / 2 * (p_sfc - 925) * 100 / G
+    b = (q_925 + q_850) / 2 * (925 - 850) * 100 / G
+    c = (q_850 + q_700) / 2 * (850 - 700) * 100 / G
+    d = (q_sfc + q_850) / 2 * (p_sfc - 850) * 100 / G
+    e = (q_sfc + q_700) / 2 * (p_sfc - 700) * 100 / G
+    pw_850 = np.where(p_sfc >= 925, a + b, np.where(p_sfc >= 850, d, 0.0))
+    pw_700 = np.where(p_sfc >= 925, a + b + c, np.where(p_sfc >= 850, d + c, np.where(p_sfc >= 700, e, 0.0)))
+    return pw_850, pw_700
+
+
+# ------------------------------------------------------------------
+# sample
+# ------------------------------------------------------------------
+
+def sample_profiles(n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Plausible, fixed-seed profiles over the range of the dataset (desert SW, all seasons).
+    """
+
+    rng   = np.random.default_rng(seed)
+    T_sfc = rng.uniform(268, 318, n)
+    T_850 = T_sfc - rng.uniform(0, 15, n)
+    T_700 = T_850 - rng.uniform(5, 20, n)
+    T_500 = T_700 - rng.uniform(10, 25, n)
+    z_850 = rng.uniform(1300, 1650, n)
+    return pd.DataFrame({
+        "surface_PRES": rng.uniform(85000, 101500, n),
+        "2m_above_ground_TMP": T_sfc,
+        "2m_above_ground_DPT": T_sfc - rng.uniform(0, 40, n),
+        "925mb_DPT": T_sfc - rng.uniform(0, 35, n),
+        "850mb_TMP": T_850,
+        "850mb_DPT": T_850 - rng.uniform(0, 30, n),
+        "850mb_HGT": z_850,
+        "700mb_TMP": T_700,
+        "700mb_DPT": T_700 - rng.uniform(0, 30, n),
+        "700mb_HGT": z_850 + rng.uniform(1450, 1750, n),
+        "500mb_TMP": T_500,
+        "500mb_DPT": T_500 - rng.uniform(0, 30, n),
+        "850mb_UGRD": rng.normal(0, 8, n),
+        "850mb_VGRD": rng.normal(0, 8, n),
+        "700mb_UGRD": rng.normal(0, 10, n),
+        "700mb_VGRD": rng.normal(0, 10, n),
+        "level_of_adiabatic_condensation_from_sfc_HGT": rng.uniform(0, 3500, n),
+        "highest_tropospheric_freezing_level_HGT": rng.uniform(1500, 5000, n),
+    })
+
+
+def _check(name: str, got: np.ndarray, ref: np.ndarray, rtol: float, atol: float) -> bool:
+    got, ref = np.asarray(got, dtype=np.float64), np.asarray(ref, dtype=np.float64)
+    both_nan = np.isnan(got) & np.isnan(ref)
+    err = np.where(both_nan, 0.0, np.abs(got - ref))
+    ok  = bool(np.all(both_nan | (err <= atol + rtol * np.abs(ref))))
+    print(f"{'ok  ' if ok else 'FAIL'} {name:<28} max abs err: {np.nanmax(err):.3e}  (rtol={rtol:g}, atol={atol:g})")
+    return ok
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=20_000, help="rows compared against the (row-looping) references")
+    parser.add_argument("--n-time", type=int, default=1_000_000, help="rows timed through derive()")
+    args = parser.parse_args()
+
+    df = sample_profiles(args.n)
+    c  = {k: df[k].to_numpy() for k in df.columns}
+    ok = True
+
+    # wet-bulb; per-element freezing vs. whole-array convergence, both to a 0.05 K step
+    ok &= _check(
+        "wet_bulb_temperature",
+        thermo.wet_bulb_temperature(c["700mb_TMP"], c["700mb_DPT"], thermo.P_700),
+        ref_wet_bulb_temperature(c["700mb_TMP"], c["700mb_DPT"], thermo.P_700),
+        rtol=0.0, atol=0.05,
+    )
+
+    # DCAPE (layer); only differs through the wet-bulb above: ~ g * dTw / T * dz
+    ok &= _check(
+        "dcape_layer",
+        thermo.dcape_layer(
+            c["700mb_TMP"], c["700mb_DPT"], c["700mb_HGT"], c["850mb_TMP"], c["850mb_HGT"], c["2m_above_ground_TMP"], c["surface_PRES"],
+        ),
+        ref_dcape_layer(df),
+        rtol=1e-3, atol=1.0,
+    )
+
+    # DCAPE (integrated); same arithmetic, vectorized over rows
+    ok &= _check(
+        "dcape",
+        thermo.dcape(
+            c["500mb_TMP"], c["500mb_DPT"], c["700mb_TMP"], c["700mb_DPT"], c["850mb_TMP"], c["850mb_DPT"],
+            c["2m_above_ground_TMP"], c["surface_PRES"],
+        ),
+        ref_dcape(df),
+        rtol=1e-9, atol=1e-6,
+    )
+
+    # LCL-LFC RH; same surface theta-e fed to both so only the LFC search + interpolation are compared
+    theta_e_sfc = thermo.equivalent_potential_temperature(c["surface_PRES"], c["2m_above_ground_TMP"], c["2m_above_ground_DPT"])
+    ok &= _check(
+        "lcl_lfc_rh",
+        thermo.lcl_lfc_rh(
+            c["level_of_adiabatic_condensation_from_sfc_HGT"], c["surface_PRES"], theta_e_sfc, c["925mb_DPT"],
+            c["850mb_TMP"], c["850mb_DPT"], c["850mb_HGT"], c["700mb_TMP"], c["700mb_DPT"], c["700mb_HGT"],
+        ),
+        ref_lcl_lfc_rh(df, theta_e_sfc),
+        rtol=0.0, atol=1e-9,
+    )
+
+    pw_850, pw_700 = thermo.layer_pw(c["surface_PRES"], c["2m_above_ground_DPT"], c["925mb_DPT"], c["850mb_DPT"], c["700mb_DPT"])
+    ref_850, ref_700 = ref_layer_pw(df)
+    ok &= _check("sfc_850_pw", pw_850, ref_850, rtol=1e-9, atol=1e-9)
+    ok &= _check("sfc_700_pw", pw_700, ref_700, rtol=1e-9, atol=1e-9)
+
+    # surface theta-e vs. MetPy (what the notebook used), if available
+    try:
+        from metpy.calc import equivalent_potential_temperature
+        from metpy.units import units
+        ref = equivalent_potential_temperature(
+            c["surface_PRES"] * units.Pa, c["2m_above_ground_TMP"] * units.K, c["2m_above_ground_DPT"] * units.K,
+        ).m_as("K")
+        ok &= _check("surface_theta_e (metpy)", theta_e_sfc, ref, rtol=1e-4, atol=0.0)
+    except ImportError:
+        print("skip surface_theta_e (metpy not installed)")
+
+    # timing
+    big = sample_profiles(args.n_time, seed=1)
+    t0  = time.perf_counter()
+    thermo.derive(big)
+    print(f"derive(): {args.n_time:,} rows in {time.perf_counter() - t0:.2f}s")
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
 import os
 import warnings
+import numpy as np
 import xarray as xr
 
 from glob import glob
-from typing import List
+from typing import List, Tuple
 from datetime import datetime, timedelta
-from bisect import bisect_left, bisect_right
-from concurrent.futures import ProcessPoolExecutor, as_completed
 
-from src.utils.mrms.files import ZippedGrib2File, Grib2File
+from src.utils.mrms.files import ZippedGrib2File, Grib2File, decode_grib2_gz_bytes
+from src.utils.mrms.grid import BoundingBox, MRMSGrid, SharedGrid
+from src.utils.mrms.cube import MRMSCubeWriter
+from src.utils.mrms.cache import MRMSGridCache
+from src.utils.mrms.listing import MRMSListing, MRMSListingIndex
+from src.utils.mrms.pipeline import MRMSFetchPipeline
 from src.utils.mrms.mrms import MRMSDomain, MRMSPath
 from src.utils.mrms.mrms import MRMSAWSS3Client
 from src.utils.mrms.products import MRMSProductsEnum
@@ -27,14 +31,27 @@ warnings.filterwarnings(
 )
 
 
-def _process_single_file(fp: str, to_dir: str) -> xr.Dataset:
-            
-    # HACK:...
-    _fp = glob(f"{to_dir}/*{os.path.basename(fp)}")[0]
-    zipped_gf = ZippedGrib2File(_fp)
-    gf        = zipped_gf.unzip(to_dir=to_dir)
-    xa        = gf.to_xarray()
-    return xa
+def _process_single_file(
+        buf: bytes, 
+        bbox: BoundingBox | None = None, 
+        product: str | None = None, 
+        valid_time: datetime | None = None,
+        cache: MRMSGridCache | None = None,
+    ) -> SharedGrid:
+    """
+    Decode stage of the fetch pipeline; runs in a worker process.
+
+    Returns
+    ---
+    - A ``SharedGrid``; values are handed back through a shared buffer instead of being pickled.
+    """
+
+    grid = decode_grib2_gz_bytes(buf, bbox=bbox)
+
+    if cache is not None:
+        cache.put(product, valid_time, grid, bbox)
+
+    return SharedGrid.from_grid(grid)
 
 
 class MRMSQPEClient:
@@ -42,48 +59,83 @@ class MRMSQPEClient:
     Wrapper for the MRMS AWS bucket; specifically for fetching 1H Radar-Only QPE.
     """
 
-    def __init__(self):
-        self.mrms_client = MRMSAWSS3Client()
+    def __init__(
+            self, 
+            cache: MRMSGridCache | None = None, 
+            use_cache=True,
+            n_download: int = 16,
+            n_decode: int | None = None,
+            max_buffered: int = 32,
+        ):
+        """
+        Params
+        ---
+        - :cache: decoded-grid cache consulted before any S3 access; default: ``MRMSGridCache()``
+        - :use_cache: set ``False`` to always fetch from S3
+            - only cropped (``bbox``) grids are stored; a full-CONUS grid is ~100 MB, a day of 2-min files would overrun the cache
+        - :n_download: concurrent downloads in batch/range fetches
+        - :n_decode: decode processes in batch/range fetches; default: ``os.cpu_count()``
+        - :max_buffered: max downloaded files waiting on a decoder (bounds memory)
+        """
+        self.mrms_client  = MRMSAWSS3Client(max_workers=n_download)
+        self.cache        = (cache or MRMSGridCache()) if use_cache else None
+        self.listings     = MRMSListingIndex(self.mrms_client)
+        self.n_download   = n_download
+        self.n_decode     = n_decode
+        self.max_buffered = max_buffered
+
+    def _pipeline(self) -> MRMSFetchPipeline:
+        return MRMSFetchPipeline(
+            self.mrms_client,
+            _process_single_file,
+            n_download   = self.n_download,
+            n_decode     = self.n_decode,
+            max_buffered = self.max_buffered,
+        )
 
-    def _get_closest_file(self, paths: List[str], start_time: datetime, mode="nearest") -> str:
-        
-        if not paths:
-            raise ValueError("Received an empty list of paths.")
+    def _cache_get(self, product: str, valid_time: datetime, bbox: BoundingBox | None):
+        if self.cache is None:
+            return None
+        return self.cache.get(product, valid_time, bbox)
 
-        # 1. Build and sort (datetime, path) pairs
-        dt_path_pairs = sorted(
-            ((MRMSPath.from_str(fp).get_base_datetime(), fp) for fp in paths),
-            key=lambda t: t[0],
-        )
-        dts = [p[0] for p in dt_path_pairs]  # just the datetimes
-        mode = (mode or "nearest").lower()
+    def _cache_for(self, bbox: BoundingBox | None) -> MRMSGridCache | None:
+        """
+        The cache new grids of ``bbox`` are written to; ``None`` (don't store) for full-CONUS grids.
+        """
+        return self.cache if bbox is not None else None
 
-        # 2. Choose according to mode
-        if mode == "nearest":
-            chosen_dt, chosen_fp = min(
-                dt_path_pairs, key=lambda t: abs(t[0] - start_time)
-            )
-            return chosen_fp
+    def _get_closest_file(self, paths: List[str], start_time: datetime, mode="nearest") -> str:
+        return MRMSListing.from_keys(paths).select(start_time, mode=mode)
 
-        elif mode == "first":
-            idx = bisect_right(dts, start_time) - 1
-            if idx < 0:
-                raise ValueError(
-                    "No file time is ≤ start_time; cannot satisfy mode='first'."
-                )
-            return dt_path_pairs[idx][1]
+    def _get_closest_files(
+            self, 
+            paths: List[str], 
+            start_times: np.ndarray, 
+            mode="nearest", 
+            tolerance: timedelta | None = None,
+        ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Batch version of ``_get_closest_file``; one ``searchsorted`` pass for all ``start_times``.
 
-        elif mode == "next":
-            idx = bisect_left(dts, start_time)
-            if idx >= len(dts):
-                raise ValueError(
-                    "No file time is ≥ start_time; cannot satisfy mode='next'."
-                )
-            return dt_path_pairs[idx][1]
+        Returns
+        ---
+        - ``(keys, hit)``; ``keys[i]`` is ``None`` where no file is within ``tolerance`` of ``start_times[i]``
+        """
+        keys, _, hit = MRMSListing.from_keys(paths).match(start_times, mode=mode, tolerance=tolerance)
+        return keys, hit
 
-        else:
-            raise ValueError(f"Unrecognized mode '{mode}'. "
-                             "Choose 'nearest', 'first', or 'next'.")
+    def _fetch_grid(self, product: str, key: str, valid_time: datetime, bbox: BoundingBox | None = None) -> MRMSGrid:
+        """
+        current pipeline: cache -> read gzip bytes -> decompress + decode in memory -> cache
+        """
+
+        grid = self._cache_get(product, valid_time, bbox)
+        if grid is None:
+            buf  = self.mrms_client.read_bytes(key)
+            grid = decode_grib2_gz_bytes(buf, bbox=bbox)
+            if self._cache_for(bbox) is not None:
+                self.cache.put(product, valid_time, grid, bbox)
+        return grid
 
     def _fetch_radar_only_qpe_x(
             self, 
@@ -93,6 +145,7 @@ class MRMSQPEClient:
             time_zone="UTC", 
             to_dir="__temp",
             del_tmp_files=False,
+            bbox: BoundingBox | None = None,
         ) -> xr.Dataset | None:
         """
         **Timezone**: ``UTC``
@@ -106,6 +159,7 @@ class MRMSQPEClient:
             - "nearest": find the closest valid file to provide ``datetime``
             - "first"  : closest valid file whos time < start_time
             - "next"   : closest valid file whos time > start_time
+        :bbox: ``BoundingBox``; if set, only this window of the CONUS grid is decoded
 
         Returns
         ---
@@ -116,29 +170,24 @@ class MRMSQPEClient:
         if time_zone == "PDT":
             end_time += timedelta(hours=7)
 
-        yyyymmdd = end_time.strftime("%Y%m%d")
-        basepath = MRMSPath(
-            domain   = MRMSDomain.CONUS, 
-            product  = product,
-            yyyymmdd = yyyymmdd
-            )
-        
+        # a file valid exactly @end_time satisfies every mode; skip S3 entirely
+        grid = self._cache_get(product, end_time, bbox)
+        if grid is not None:
+            return grid.to_xarray()
+
         try:
-            file_paths   = self.mrms_client.ls(str(basepath))
+            listing = self.listings.get(product, end_time)
         except:
-            print(f"Error: no MRMS file @{str(basepath)}")
+            print(f"Error: no MRMS file @{product}/{end_time.strftime('%Y%m%d')}")
             return None
 
-        nearest_path = self._get_closest_file(file_paths, end_time)
+        nearest_path = listing.select(end_time, mode=mode)
         
-        # TODO: del grib2 files after download
-        mp = MRMSPath.from_str(nearest_path)
+        mp         = MRMSPath.from_str(nearest_path)
+        valid_time = mp.get_base_datetime()
 
-        # current pipeline: download -> unzip -> convert to xarray -> cleanup
-        fp = self.mrms_client.download(str(mp), to=to_dir)
-        zipped_gf = ZippedGrib2File(fp)
-        gf        = zipped_gf.unzip(to_dir=to_dir)
-        xa        = gf.to_xarray()
+        grid = self._fetch_grid(product, str(mp), valid_time, bbox)
+        xa   = grid.to_xarray()
 
         if del_tmp_files == True:
             tmp_fps = glob(f"{to_dir}/**")
@@ -155,6 +204,7 @@ class MRMSQPEClient:
             time_zone="UTC", 
             to_dir="__temp",
             del_tmp_files=False,
+            bbox: BoundingBox | None = None,
         ) -> List[xr.Dataset | None]:
         """
         **Timezone**: ``UTC``
@@ -168,6 +218,9 @@ class MRMSQPEClient:
             - "nearest": find the closest valid file to provide ``datetime``
             - "first"  : closest valid file whos time < start_time
             - "next"   : closest valid file whos time > start_time
+        :bbox: ``BoundingBox``; if set, only this window of the CONUS grid is decoded
+            - cropped grids are returned in memory; full-CONUS grids are moved out of shared memory to ``to_dir``
+              and mapped lazily from disk, so a full day never holds ~70 GB in ``/dev/shm``
 
         Returns
         ---
@@ -177,48 +230,51 @@ class MRMSQPEClient:
         if time_zone == "PDT":
             end_time += timedelta(hours=7)
 
-        yyyymmdd = end_time.strftime("%Y%m%d")
-        basepath = MRMSPath(
-            domain   = MRMSDomain.CONUS, 
-            product  = product,
-            yyyymmdd = yyyymmdd
-            )
-        
         try:
-            file_paths   = self.mrms_client.ls(str(basepath))
+            listing = self.listings.get(product, end_time)
         except:
-            print(f"Error: no MRMS file @{str(basepath)}")
+            print(f"Error: no MRMS file @{product}/{end_time.strftime('%Y%m%d')}")
             return None
 
-        basepath_str = str(basepath)
-        if not basepath_str.endswith("/"):
-            basepath_str += "/"
-
-        fps = self.mrms_client.download(basepath_str, to=to_dir, recursive=True)
-        
-        xas = []
-        with ProcessPoolExecutor() as executor:
-            futures = {executor.submit(_process_single_file, fp, to_dir): fp for fp in fps}
-            for future in as_completed(futures):
-                result = future.result()
-                if result is not None:
-                    xas.append(result)
+        # serve what we can from the cache; only download + decode the misses
+        xas    = []
+        misses = []
+        for fp, valid_time in zip(listing.keys, listing.times.astype("datetime64[us]").tolist()):
+            grid = self._cache_get(product, valid_time, bbox)
+            if grid is None:
+                misses.append((fp, fp, (bbox, product, valid_time, self._cache_for(bbox))))
+            else:
+                xas.append(grid.to_xarray())
+
+        # download -> decode stages overlap; files are decoded as soon as their bytes land
+        for fp, result in self._pipeline().run(misses):
+            if isinstance(result, Exception):
+                print(f"Error: failed to fetch {fp}: {result}")
+                continue
+            if bbox is None:
+                grid = result.to_grid_in(to_dir)
+            else:
+                # copy out; the shared pages are released as soon as the mapping is dropped
+                grid = result.to_grid()
+                grid = MRMSGrid(np.array(grid.values), grid.latitude, grid.longitude, grid.time)
+            xas.append(grid.to_xarray())
 
         if del_tmp_files == True:
             tmp_fps = glob(f"{to_dir}/**")
             for fp in tmp_fps:
                 os.remove(fp)
 
+        xas.sort(key=lambda xa: xa.time.values)
         return xas
 
-    def fetch_radar_only_qpe_15m(self, end_time: datetime, mode="nearest", time_zone="UTC"):
+    def fetch_radar_only_qpe_15m(self, end_time: datetime, mode="nearest", time_zone="UTC", bbox: BoundingBox | None = None):
         """
         **Time Zone**: ``UTC``
         - Fetch ``end_time-0:15``-``end_time``
         """
-        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_15M, mode=mode, time_zone=time_zone)
+        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_15M, mode=mode, time_zone=time_zone, bbox=bbox)
     
-    def fetch_radar_only_qpe_1hr(self, end_time: datetime, mode="nearest", time_zone="UTC") -> xr.Dataset | None:
+    def fetch_radar_only_qpe_1hr(self, end_time: datetime, mode="nearest", time_zone="UTC", bbox: BoundingBox | None = None) -> xr.Dataset | None:
         """
         **Time Zone**: ``UTC``
         - Fetch ``end_time-1:00``-``end_time``
@@ -229,43 +285,144 @@ class MRMSQPEClient:
         - :mode: {"nearest", "first"} 
             - When an MRMS product is unavailable for specified `end_time`, how we select the next closest item.
         - :time_zone: {"UTC", "PDT", "PST"}; default: "UTC"
+        - :bbox: ``BoundingBox``; crop on decode (default: full CONUS grid)
         """
-        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_01H, mode=mode, time_zone=time_zone)
+        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_01H, mode=mode, time_zone=time_zone, bbox=bbox)
 
-    def fetch_radar_only_qpe_3hr(self, end_time: datetime, mode="nearest", time_zone="UTC"):
+    def fetch_radar_only_qpe_3hr(self, end_time: datetime, mode="nearest", time_zone="UTC", bbox: BoundingBox | None = None):
         """
         **Time Zone**: ``UTC``
         - Fetch ``end_time-3:00``-``end_time``
         """
-        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_03H, mode=mode, time_zone=time_zone)
+        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_03H, mode=mode, time_zone=time_zone, bbox=bbox)
     
-    def fetch_radar_only_qpe_6hr(self, end_time: datetime, mode="nearest", time_zone="UTC"):
+    def fetch_radar_only_qpe_6hr(self, end_time: datetime, mode="nearest", time_zone="UTC", bbox: BoundingBox | None = None):
         """
         **Time Zone**: ``UTC``
         - Fetch ``end_time-6:00``-``end_time``
         """
-        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_06H, mode=mode, time_zone=time_zone)
+        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_06H, mode=mode, time_zone=time_zone, bbox=bbox)
     
-    def fetch_radar_only_qpe_12hr(self, end_time: datetime, mode="nearest", time_zone="UTC"):
+    def fetch_radar_only_qpe_12hr(self, end_time: datetime, mode="nearest", time_zone="UTC", bbox: BoundingBox | None = None):
         """
         **Time Zone**: ``UTC``
         - Fetch ``end_time-12:00``-``end_time``
         """
-        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_12H, mode=mode, time_zone=time_zone)
+        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_12H, mode=mode, time_zone=time_zone, bbox=bbox)
     
-    def fetch_radar_only_qpe_24hr(self, end_time: datetime, mode="nearest", time_zone="UTC"):
+    def fetch_radar_only_qpe_24hr(self, end_time: datetime, mode="nearest", time_zone="UTC", bbox: BoundingBox | None = None):
         """
         **Time Zone**: ``UTC``
         - Fetch ``end_time-24:00``-``end_time``
         """
-        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_24H, mode=mode, time_zone=time_zone)
+        return self._fetch_radar_only_qpe_x(end_time, MRMSProductsEnum.RadarOnly_QPE_24H, mode=mode, time_zone=time_zone, bbox=bbox)
     
-    def fetch_radar_only_qpe_full_day_1hr(self, end_time: datetime, mode="nearest", time_zone="UTC", del_tmps=False) -> List[xr.Dataset]:
+    def fetch_radar_only_qpe_full_day_1hr(self, end_time: datetime, mode="nearest", time_zone="UTC", del_tmps=False, bbox: BoundingBox | None = None) -> List[xr.Dataset]:
         """
         **Time Zone**: ``UTC``
         - Fetch ``end_time-24:00``-``end_time``
         """
-        return self._fetch_radar_only_qpe_x_batch(end_time, MRMSProductsEnum.RadarOnly_QPE_01H, mode=mode, time_zone=time_zone, del_tmp_files=del_tmps)
+        return self._fetch_radar_only_qpe_x_batch(end_time, MRMSProductsEnum.RadarOnly_QPE_01H, mode=mode, time_zone=time_zone, del_tmp_files=del_tmps, bbox=bbox)
+
+
+    def fetch_range(
+            self, 
+            products: str | List[str], 
+            start_time: datetime, 
+            end_time: datetime, 
+            bbox: BoundingBox | None = None,
+            store: str | None = None,
+            time_chunk: int = 720,
+            step: timedelta | None = None,
+            tolerance: timedelta | None = None,
+        ) -> xr.Dataset | None:
+        """
+        **Timezone**: ``UTC``
+        - Fetch every file of each product valid in ``[start_time, end_time]``; may span any number of days.
+
+        Params
+        ---
+        - :products: one or more ``MRMSProductsEnum`` values; each becomes a data variable
+        - :bbox: ``BoundingBox``; crop on decode (strongly recommended for long ranges)
+        - :store: optional path to a zarr store; if set the cube is written there ``time_chunk`` steps at a time
+        - :step: if set, only the file nearest to each ``start_time + k * step`` is fetched (e.g., hourly from a 2-min product)
+            - MRMS files are often late or missing; the time axis holds the matched files' valid times
+            - steps w/o a file within ``tolerance`` (default: ``step / 2``) are left out w/ a ``RuntimeWarning``
+
+        Returns
+        ---
+        - A time-sorted ``xr.Dataset`` w/ dims ``(time, latitude, longitude)``; ``NaN`` where a product has no file at a time step.
+        - ``None`` if no files exist in the range.
+        """
+
+        assert start_time <= end_time, f"Error: `start_time` > `end_time`"
+        if isinstance(products, str):
+            products = [products]
+
+        # 1. one listing per (product, day); keep files inside the range, or the file nearest each step
+        tasks = []
+        for product in products:
+            if step is None:
+                listing = self.listings.get_range(product, start_time, end_time)
+                mask    = (listing.times >= np.datetime64(start_time, "ns")) & (listing.times <= np.datetime64(end_time, "ns"))
+                tasks  += [(product, key, t) for key, t in zip(listing.keys[mask], listing.times[mask])]
+                continue
+
+            tol     = tolerance if tolerance is not None else step / 2
+            targets = np.arange(
+                np.datetime64(start_time, "ns"),
+                np.datetime64(end_time, "ns") + np.timedelta64(1, "ns"),
+                np.timedelta64(step, "ns"),
+            )
+            keys, times, hit = self.listings.match(product, targets, mode="nearest", tolerance=tol)
+            if not hit.all():
+                warnings.warn(
+                    f"{int((~hit).sum())} of {len(targets)} {product} steps in [{start_time}, {end_time}] "
+                    f"have no file within {tol}; left out",
+                    RuntimeWarning,
+                    stacklevel=2,
+                )
+
+            # a file may be the nearest to more than one step
+            _, first = np.unique(keys[hit].astype(str), return_index=True)
+            tasks   += [(product, key, t) for key, t in zip(keys[hit][first], times[hit][first])]
+
+        if not tasks:
+            return None
+
+        # 2. shared, sorted time axis
+        times  = np.unique(np.asarray([t for _, _, t in tasks], dtype="datetime64[ns]"))
+        t_idxs = np.searchsorted(times, np.asarray([t for _, _, t in tasks], dtype="datetime64[ns]"))
+        order  = np.argsort(t_idxs, kind="stable")
+        writer = MRMSCubeWriter(products, times, store=store, time_chunk=time_chunk)
+
+        # 3. product/time slots w/o a file will never be written
+        have = {(product, int(t_idxs[i])) for i, (product, _, _) in enumerate(tasks)}
+        for product in products:
+            for t_idx in range(len(times)):
+                if (product, t_idx) not in have:
+                    writer.skip(product, t_idx)
+
+        # 4. serve cache hits; stream the misses through the download -> decode pipeline
+        misses = []
+        for i in order:
+            product, key, t = tasks[i]
+            t_idx      = int(t_idxs[i])
+            valid_time = t.astype("datetime64[us]").item()
+            grid       = self._cache_get(product, valid_time, bbox)
+            if grid is None:
+                misses.append(((product, t_idx), key, (bbox, product, valid_time, self._cache_for(bbox))))
+            else:
+                writer.write(product, t_idx, grid)
+
+        for (product, t_idx), result in self._pipeline().run(misses):
+            if isinstance(result, Exception):
+                print(f"Error: failed to fetch {product} @{times[t_idx]}: {result}")
+                writer.skip(product, t_idx)
+                continue
+            writer.write(product, t_idx, result.to_grid())
+
+        return writer.close()
 
 
 if __name__ == "__main__":
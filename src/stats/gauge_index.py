@@ -0,0 +1,183 @@
+"""
+# Gauge -> MRMS cell index
+---
+The nearest MRMS grid cell of every CCRFCD gauge, found once per (grid, gauge network) and persisted under ``data/__cache__/stats/gauge_index``.
+
+- Reading every gauge's MRMS value from a decoded grid is then one fancy-index gather: ``values[..., rows, cols]``
+- Works on a single ``[H, W]`` grid or a ``[T, H, W]`` stack
+"""
+
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from typing import Dict
+
+from src.utils.mrms.grid import BoundingBox, MRMSGridGeometry
+
+
+class GaugeMRMSIndex:
+
+    _DEFAULT_DIR     = "data/__cache__/stats/gauge_index"
+    _METADATA_FP     = "data/ccrfcd_rain_gauge_metadata.csv"
+
+    # in-process cache; {key: index}
+    _MEM: Dict[str, 'GaugeMRMSIndex'] = {}
+
+    def __init__(
+            self,
+            station_ids: np.ndarray,
+            lat: np.ndarray,
+            lon: np.ndarray,
+            rows: np.ndarray,
+            cols: np.ndarray,
+            grid_shape: tuple,
+            key: str,
+        ):
+        """
+        Params
+        ---
+        - :station_ids: ``[G]``; sorted, unique
+        - :lat, lon: ``[G]`` gauge locations; ``lon`` in ``[0, 360)`` (same as MRMS)
+        - :rows, cols: ``[G]`` nearest cell of each gauge on a grid of ``grid_shape``
+        """
+        self.station_ids = station_ids
+        self.lat         = lat
+        self.lon         = lon
+        self.rows        = rows
+        self.cols        = cols
+        self.grid_shape  = tuple(int(n) for n in grid_shape)
+        self.key         = key
+
+    def __len__(self) -> int:
+        return len(self.station_ids)
+
+    @staticmethod
+    def _grid_key(latitude: np.ndarray, longitude: np.ndarray, metadata_fp: str) -> str:
+        st = os.stat(metadata_fp)
+        s  = "|".join([
+            f"{len(latitude)},{latitude[0]:.6f},{latitude[-1]:.6f}",
+            f"{len(longitude)},{longitude[0]:.6f},{longitude[-1]:.6f}",
+            f"{Path(metadata_fp).resolve()},{st.st_size},{st.st_mtime}",
+        ])
+        return hashlib.sha256(s.encode()).hexdigest()
+
+    @staticmethod
+    def _read_gauges(metadata_fp: str):
+        """
+        Returns
+        ---
+        - ``(station_ids, lat, lon)`` of every gauge w/ exactly one, located metadata row; sorted by id
+        """
+
+        meta = pd.read_csv(metadata_fp)
+        meta = meta[(meta['station_id'] > 0) & meta['lat'].notna() & meta['lon'].notna()]
+        ids  = meta['station_id'].astype(np.int64)
+        meta = meta[ids.map(ids.value_counts()) == 1]
+        meta = meta.assign(station_id=meta['station_id'].astype(np.int64)).sort_values('station_id')
+
+        lon = meta['lon'].to_numpy(dtype=np.float64)
+        return (
+            meta['station_id'].to_numpy(dtype=np.int64),
+            meta['lat'].to_numpy(dtype=np.float64),
+            np.where(lon < 0, lon + 360, lon),
+        )
+
+    @classmethod
+    def for_grid(
+            cls,
+            latitude: np.ndarray,
+            longitude: np.ndarray,
+            metadata_fp: str = _METADATA_FP,
+            root: str = _DEFAULT_DIR,
+        ) -> 'GaugeMRMSIndex':
+        """
+        Index for a (possibly cropped) grid w/ these 1D ``latitude``/``longitude`` coordinates; memory -> disk -> build.
+        """
+
+        latitude  = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        key       = cls._grid_key(latitude, longitude, metadata_fp)
+
+        # 1. in-memory
+        if key in cls._MEM:
+            return cls._MEM[key]
+
+        # 2. on-disk
+        fp = Path(root) / f"{key}.npz"
+        if fp.is_file():
+            try:
+                with np.load(fp, allow_pickle=False) as npz:
+                    index = cls(
+                        npz["station_ids"], npz["lat"], npz["lon"], npz["rows"], npz["cols"], tuple(npz["grid_shape"]), key,
+                    )
+                cls._MEM[key] = index
+                return index
+            except Exception:
+                pass
+
+        # 3. build; nearest row/col of every gauge (same as the per-call argmin it replaces, just done once)
+        station_ids, lat, lon = cls._read_gauges(metadata_fp)
+        rows = np.abs(latitude[:, None] - lat).argmin(axis=0).astype(np.int64)
+        cols = np.abs(longitude[:, None] - lon).argmin(axis=0).astype(np.int64)
+        index = cls(station_ids, lat, lon, rows, cols, (len(latitude), len(longitude)), key)
+
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        tmp_fp = fp.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_fp, "wb") as f:
+            np.savez(
+                f,
+                station_ids=station_ids, lat=lat, lon=lon, rows=rows, cols=cols,
+                grid_shape=np.asarray(index.grid_shape, dtype=np.int64),
+            )
+        os.replace(tmp_fp, fp)
+
+        cls._MEM[key] = index
+        return index
+
+    @classmethod
+    def for_geometry(
+            cls,
+            geometry: MRMSGridGeometry,
+            bbox: BoundingBox | None = None,
+            metadata_fp: str = _METADATA_FP,
+            root: str = _DEFAULT_DIR,
+        ) -> 'GaugeMRMSIndex':
+        """
+        Index for the grid ``decode_grib2_bytes(..., bbox)`` produces for this ``geometry``.
+        """
+
+        rows, cols = (slice(None), slice(None)) if bbox is None else geometry.window(bbox)
+        return cls.for_grid(geometry.latitude()[rows], geometry.longitude()[cols], metadata_fp, root)
+
+    def positions(self, station_ids: np.ndarray) -> np.ndarray:
+        """
+        Returns
+        ---
+        - Position of each of ``station_ids`` in this index; ``-1`` for unknown gauges
+        """
+
+        station_ids = np.asarray(station_ids, dtype=np.int64)
+        pos = np.searchsorted(self.station_ids, station_ids)
+        pos = np.clip(pos, 0, max(len(self.station_ids) - 1, 0))
+        ok  = (len(self.station_ids) > 0) & (self.station_ids[pos] == station_ids)
+        return np.where(ok, pos, -1)
+
+    def gather(self, values: np.ndarray) -> np.ndarray:
+        """
+        Params
+        ---
+        - :values: ``[H, W]`` grid or ``[..., H, W]`` stack on the grid this index was built for
+
+        Returns
+        ---
+        - ``[..., G]``; every gauge's cell value
+        """
+
+        values = np.asarray(values)
+        assert values.shape[-2:] == self.grid_shape, (
+            f"Error: grid shape {values.shape[-2:]} does not match index {self.grid_shape}"
+        )
+        return values[..., self.rows, self.cols]
@@ -1,18 +1,38 @@
+import os
 import xarray
 import warnings
 import numpy as np
 import pandas as pd
 
 from tqdm import tqdm
-from typing import List
+from typing import Dict, Iterator, Tuple
 from datetime import datetime, timedelta
 from concurrent.futures import ProcessPoolExecutor, as_completed
 
+from src.utils.mrms.grid import BoundingBox, share_array
 from src.utils.mrms.products import MRMSProductsEnum
+from src.utils.ccrfcd.store import GaugeStore
 from src.utils.ccrfcd.ccrfcd_client import CCRFCDClient
+from src.stats.gauge_index import GaugeMRMSIndex
 from src.mrms_qpe.fetch_mrms_qpe import MRMSQPEClient
 
 
+# accumulation period (h) of each supported MRMS QPE product
+_PRODUCT_HOURS = {"01H": 1, "03H": 3, "06H": 6, "12H": 12, "24H": 24}
+
+# output columns + dtypes
+_COLUMNS = {
+    "start_time": "datetime64[ns]",
+    "end_time":   "datetime64[ns]",
+    "station_id": np.int32,
+    "lat":        np.float32,
+    "lon":        np.float32,
+    "gauge_qpe":  np.float32,
+    "mrms_qpe":   np.float32,
+    "delta_qpe":  np.float32,
+}
+
+
 warnings.filterwarnings(
     "ignore",
     category=FutureWarning,
@@ -20,73 +40,195 @@ warnings.filterwarnings(
 )
 
 
-class StatsClient:
-    
-    def __init__(self):
-        
-        self.ccrfcd_client = CCRFCDClient()
-        self.mrms_client   = MRMSQPEClient()
+# per-worker state; set once by ``_init_worker`` so tasks only carry a buffer path + a timestamp
+_WORKER: Dict = {}
 
-    def _get_gauge_mrms_deltas(self, gpe_raw_vals: List[dict], xarr: xarray.Dataset) -> List[dict]:
-        
-        lats        = [item["lat"] for item in gpe_raw_vals]
-        lons        = [item["lon"] for item in gpe_raw_vals]
-        station_ids = [item["station_id"] for item in gpe_raw_vals]
-        qpes        = [item["qpe"] for item in gpe_raw_vals]
-
-        # slice to region to save time during search
-        _xarr = xarr.sel(
-            latitude =slice(self.ccrfcd_client._LAT_MAX, self.ccrfcd_client._LAT_MIN),
-            longitude=slice(self.ccrfcd_client._LON_MIN + 360, self.ccrfcd_client._LON_MAX + 360)
-        )
 
-        grid_lats = _xarr['latitude'].values
-        grid_lons = _xarr['longitude'].values
+def _get_gauge_mrms_deltas(index: GaugeMRMSIndex, station_ids: np.ndarray, gauge_qpes: np.ndarray, values: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Params
+    ---
+    - :values: one ``[H, W]`` MRMS grid (mm) on the grid of ``index``
+
+    Returns
+    ---
+    - Columns ``station_id``, ``lat``, ``lon``, ``gauge_qpe``, ``mrms_qpe``, ``delta_qpe``; one row per gauge
+    """
 
-        # mm -> inch
-        qpe_values = _xarr['unknown'].values / 25.4
+    pos = index.positions(station_ids)
+    ok  = pos >= 0
 
-        lats = np.array(lats)
-        lons = np.array(lons)
+    # get closest MRMS grid cell; read QPE value
+    # mm -> inch
+    mrms_qpes = np.full(len(pos), np.nan)
+    mrms_qpes[ok] = index.gather(values)[pos[ok]] / 25.4
 
-        lat_indices = np.abs(grid_lats[:, None] - lats).argmin(axis=0)
-        lon_indices = np.abs(grid_lons[:, None] - lons).argmin(axis=0)
+    return {
+        "station_id": np.asarray(station_ids, dtype=np.int32),
+        "lat":        np.where(ok, index.lat[pos], np.nan).astype(np.float32),
+        "lon":        np.where(ok, index.lon[pos], np.nan).astype(np.float32),
+        "gauge_qpe":  np.asarray(gauge_qpes, dtype=np.float32),
+        "mrms_qpe":   mrms_qpes.astype(np.float32),
+        "delta_qpe":  (gauge_qpes - mrms_qpes).astype(np.float32),
+    }
 
-        # get closest MRMS grid cell; read QPE value
-        deltas = []
-        for i, station_id in enumerate(station_ids):
 
-            gauge_qpe = qpes[i]
-            mrms_qpe  = qpe_values[lat_indices[i], lon_indices[i]]
-            delta_qpe = gauge_qpe - float(mrms_qpe)
+def _init_worker(store: GaugeStore, index: GaugeMRMSIndex) -> None:
+    """
+    Runs once per worker; ``store`` arrives as a path and is re-mapped, so no gauge history is copied.
+    """
+    _WORKER["store"] = store
+    _WORKER["index"] = index
+    _WORKER["cubes"] = {}
 
-            # print(f"station id: {station_id} | delta: {delta_qpe}")
 
-            deltas.append({
-                "station_id": station_id,
-                "mrms_qpe": mrms_qpe,
-                "gauge_qpe": gauge_qpe,
-                "delta_qpe": delta_qpe,
-                "lat": lats[i],
-                "lon": lons[i],
-            })
+def _proc_gauge(cube_fp: str, t_idx: int, end_time: np.datetime64, acc_window: np.timedelta64) -> Tuple[int, Dict[str, np.ndarray], np.datetime64, np.datetime64]:
+    """
+    Gauge vs. MRMS for timestep ``t_idx`` of the shared ``[T, H, W]`` MRMS cube at ``cube_fp``.
+    """
 
-        return deltas
+    store: GaugeStore      = _WORKER["store"]
+    index: GaugeMRMSIndex  = _WORKER["index"]
 
-    def _proc_gauge(self, xarr: xarray.Dataset) -> List[dict]:
+    # map each day's cube once; only the current day is kept mapped
+    cubes = _WORKER["cubes"]
+    if cube_fp not in cubes:
+        cubes.clear()
+        cubes[cube_fp] = np.load(cube_fp, mmap_mode="r")
+
+    # the MRMS valid time closes the accumulation window
+    mrms_end_time   = end_time
+    mrms_start_time = end_time - acc_window
+
+    # grab rain-gauge qpe; gauges w/o data are dropped
+    qpe  = store.window_sums(index.station_ids, [mrms_start_time], [mrms_end_time])[:, 0]
+    keep = ~np.isnan(qpe)
+
+    deltas = _get_gauge_mrms_deltas(index, index.station_ids[keep], qpe[keep], cubes[cube_fp][t_idx])
+    return t_idx, deltas, mrms_start_time, mrms_end_time
+
+
+class StatsClient:
+    
+    def __init__(self):
         
-        # get start_time from xarr
-        secs = xarr.time.values.astype('datetime64[s]').astype('int64')
+        self.ccrfcd_client = CCRFCDClient()
+        self.mrms_client   = MRMSQPEClient()
+
+        # only the CCRFCD extent of each MRMS grid is ever decoded
+        self.bbox = BoundingBox(
+            lat_min=self.ccrfcd_client._LAT_MIN,
+            lat_max=self.ccrfcd_client._LAT_MAX,
+            lon_min=self.ccrfcd_client._LON_MIN,
+            lon_max=self.ccrfcd_client._LON_MAX,
+        )
 
-        # HACK:
-        mrms_end_time = datetime.utcfromtimestamp(secs)
-        mrms_start_time = mrms_end_time - timedelta(hours=1)
+    def _gauge_index(self, xarr: xarray.Dataset) -> GaugeMRMSIndex:
+        """
+        Gauge -> MRMS cell index for the grid of ``xarr``; built once, then reused (and cached on disk).
+        """
+        return GaugeMRMSIndex.for_grid(xarr['latitude'].values, xarr['longitude'].values)
 
-        # grab rain-gauge qpe
-        gauge_qpes    = self.ccrfcd_client._fetch_all_gauge_qpe(mrms_start_time, mrms_end_time, disable_tqdm=True)
+    @staticmethod
+    def _product_hours(mrms_product: str) -> int:
+        suffix = mrms_product.split("_")[-2]
+        if suffix not in _PRODUCT_HOURS:
+            raise NotImplementedError(f"Error: invalid product: {mrms_product}")
+        return _PRODUCT_HOURS[suffix]
 
-        deltas = self._get_gauge_mrms_deltas(gauge_qpes, xarr)
-        return deltas, mrms_start_time, mrms_end_time
+    def iter_stats_for_range(
+            self, 
+            start_time: datetime, 
+            end_time: datetime, 
+            mrms_product: MRMSProductsEnum, 
+            timedelta_interval: timedelta = None,
+            fetch_full_day: bool = False,
+            max_workers: int | None = None,
+        ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        **Timezone**: ``UTC``
+        Gauge vs. MRMS QPE for every MRMS timestep in ``[start_time, end_time]``; any number of days.
+
+        Params
+        ---
+        - :fetch_full_day: use every MRMS file in the range (every 2 min. for ``01H``)
+            - otherwise the file nearest each ``start_time + k * timedelta_interval`` (default: the product's accumulation period);
+              steps w/o a file within half an interval are left out w/ a ``RuntimeWarning`` (see ``MRMSQPEClient.fetch_range``)
+        - :max_workers: processes used to compare gauges w/ MRMS
+            - each worker maps the gauge store once; tasks carry only a shared-buffer path + a timestamp
+
+        Returns
+        ---
+        - An iterator of column chunks (one per UTC day, sorted by ``end_time``); memory is bounded by one day
+            - days w/o any MRMS file yield no chunk; each is reported w/ a ``RuntimeWarning``
+            - ``start_time``, ``end_time``: ``datetime64[ns]``
+            - ``station_id``: ``int32``
+            - ``lat``, ``lon``, ``gauge_qpe``, ``mrms_qpe``, ``delta_qpe``: ``float32``
+        """
+
+        assert start_time < end_time, f"Error: `start_time` >= `end_time`"
+
+        acc_window = timedelta(hours=self._product_hours(mrms_product))
+        step       = None if fetch_full_day else (timedelta_interval or acc_window)
+
+        day = datetime(start_time.year, start_time.month, start_time.day)
+
+        ex, ex_key = None, None
+        try:
+            while day <= end_time:
+
+                # this day's slice of the range; w/ a step, start on the first point of the global grid
+                d0 = max(start_time, day)
+                if step is not None and d0 > start_time:
+                    d0 = start_time + -((start_time - d0) // step) * step
+                d1  = min(end_time, day + timedelta(days=1) - timedelta(microseconds=1))
+                day += timedelta(days=1)
+                if d0 > d1:
+                    continue
+
+                cube = self.mrms_client.fetch_range(mrms_product, d0, d1, bbox=self.bbox, step=step)
+                if cube is None:
+                    warnings.warn(f"no MRMS files for {mrms_product} in [{d0}, {d1}]; skipping the day", RuntimeWarning, stacklevel=2)
+                    continue
+
+                # workers get the gauge store + index once; rebuilt only if the MRMS grid changes
+                index = self._gauge_index(cube)
+                if ex_key != index.key:
+                    if ex is not None:
+                        ex.shutdown()
+                    ex = ProcessPoolExecutor(
+                        max_workers = max_workers, 
+                        initializer = _init_worker, 
+                        initargs    = (self.ccrfcd_client.store, index),
+                    )
+                    ex_key = index.key
+
+                # one shared copy of the day's grids; tasks only carry its path + a timestep
+                cube_fp = share_array(np.ascontiguousarray(cube[mrms_product].values, dtype=np.float32))
+                times   = cube["time"].values.astype("datetime64[ns]")
+                acc     = np.timedelta64(acc_window, "ns")
+
+                chunks = []
+                try:
+                    with tqdm(total=len(times), desc=f"Fetching stats: {d0:%Y-%m-%d}") as pbar:
+                        futures = [ex.submit(_proc_gauge, cube_fp, i, times[i], acc) for i in range(len(times))]
+                        for future in as_completed(futures):
+                            t_idx, deltas, curr_start_time, curr_end_time = future.result()
+                            n = len(deltas["station_id"])
+                            chunks.append((t_idx, {
+                                "start_time": np.full(n, curr_start_time, dtype="datetime64[ns]"),
+                                "end_time":   np.full(n, curr_end_time, dtype="datetime64[ns]"),
+                                **deltas,
+                            }))
+                            pbar.update()
+                finally:
+                    os.remove(cube_fp)
+
+                chunks.sort(key=lambda item: item[0])
+                yield {col: np.concatenate([c[col] for _, c in chunks]) for col in _COLUMNS}
+        finally:
+            if ex is not None:
+                ex.shutdown(cancel_futures=True)
 
     def fetch_stats_for_range(
             self, 
@@ -99,132 +241,18 @@ class StatsClient:
         ) -> pd.DataFrame: 
         """
         **Timezone**: ``UTC``
-        TODO: rewrite to ONLY support batch proc.; this func is in shambles
+        - ``iter_stats_for_range``, collected into a single dataframe; prefer the iterator for long ranges
         """
 
-        assert start_time < end_time, f"Error: `start_time` >= `end_time`"
+        assert timezone == "UTC", f"Error: only UTC is supported"
 
-        suffix = mrms_product.split("_")[-2]
-        if suffix == "15M":
-            raise NotImplementedError(f"Error: invalid product: {mrms_product}")
-        elif suffix == "01H":
-            step         = timedelta(hours=1)
-            mrms_fetch_f = self.mrms_client.fetch_radar_only_qpe_1hr
-            if fetch_full_day:
-                mrms_fetch_f = self.mrms_client.fetch_radar_only_qpe_full_day_1hr
-        elif suffix == "03H":
-            step         = timedelta(hours=3)
-            mrms_fetch_f = self.mrms_client.fetch_radar_only_qpe_3hr
-        elif suffix == "6H":
-            step         = timedelta(hours=6)
-            mrms_fetch_f = self.mrms_client.fetch_radar_only_qpe_6hr
-        elif suffix == "12H":
-            step         = timedelta(hours=12)
-            mrms_fetch_f = self.mrms_client.fetch_radar_only_qpe_12hr
-        elif suffix == "24H":
-            step         = timedelta(hours=24)
-            mrms_fetch_f = self.mrms_client.fetch_radar_only_qpe_24hr
-        elif suffix == "48H":
-            raise NotImplementedError(f"Error: invalid product: {mrms_product}")
-        else: 
-            raise NotImplementedError(f"Error: invalid product: {mrms_product}")
-        
-        if timedelta_interval != None:
-            step = timedelta_interval
-
-        df_dict = {
-            "start_time": [],
-            "end_time": [],
-            "station_id": [],
-            "lat": [],
-            "lon": [],
-            "gauge_qpe": [],
-            "mrms_qpe": [],
-            "delta_qpe": [],
-        }
-
-        mrms_qpe_xarrs = mrms_fetch_f(end_time, del_tmps=False)
-
-        # HACK:
-
-        with tqdm(total=len(mrms_qpe_xarrs), desc="Fetching stats.") as pbar:
-            with ProcessPoolExecutor() as ex:
-                futures = {ex.submit(self._proc_gauge, xarr): xarr for xarr in mrms_qpe_xarrs}
-                for future in as_completed(futures):   
-                    deltas, curr_start_time, next_time_ccrfcd = future.result()
-                    for item in deltas:
-                        df_dict['start_time'].append(str(curr_start_time))
-                        df_dict['end_time'].append(str(next_time_ccrfcd))
-                        df_dict['station_id'].append(item['station_id'])
-                        df_dict['lat'].append(float(item['lat']))
-                        df_dict['lon'].append(float(item['lon']))
-                        df_dict['gauge_qpe'].append(float(item['gauge_qpe']))
-                        df_dict['mrms_qpe'].append(float(item['mrms_qpe']))
-                        df_dict['delta_qpe'].append(float(item['delta_qpe']))
-                    pbar.update()
-
-        # TODO: parallelize
-        # for xarr in tqdm(mrms_qpe_xarrs, total=len(mrms_qpe_xarrs), desc="Fetching stats: "):
-            
-        #     # get start_time from xarr
-        #     secs = xarr.time.values.astype('datetime64[s]').astype('int64')
-        #     curr_start_time = datetime.utcfromtimestamp(secs)
-
-        #     # HACK:
-        #     next_time_ccrfcd = curr_start_time + timedelta(hours=1)
-
-        #     # grab rain-gauge qpe
-        #     gauge_qpes    = self.ccrfcd_client._fetch_all_gauge_qpe(curr_start_time, next_time_ccrfcd, disable_tqdm=True)
-
-        #     deltas = self._get_gauge_mrms_deltas(gauge_qpes, xarr)
-
-        #     for item in deltas:
-
-        #         df_dict['start_time'].append(str(curr_start_time))
-        #         df_dict['end_time'].append(str(next_time_ccrfcd))
-        #         df_dict['station_id'].append(item['station_id'])
-        #         df_dict['lat'].append(float(item['lat']))
-        #         df_dict['lon'].append(float(item['lon']))
-        #         df_dict['gauge_qpe'].append(float(item['gauge_qpe']))
-        #         df_dict['mrms_qpe'].append(float(item['mrms_qpe']))
-        #         df_dict['delta_qpe'].append(float(item['delta_qpe']))
-
-        # # TODO: optimize
-        # with tqdm(total=total_steps, desc="Fetching stats...") as pbar:
-
-        #     while next_time <= end_time:
-
-        #         # HACK
-        #         next_time_ccrfcd = curr_start_time + timedelta(hours=1)
-
-        #         # grab rain-gauge qpe
-        #         gauge_qpes    = self.ccrfcd_client._fetch_all_gauge_qpe(curr_start_time, next_time_ccrfcd, disable_tqdm=True)
-                
-        #         # TODO: optimize
-        #         # we download a seperate MRMS grib2 file for each 2-min interval at each step
-        #         # could we save time here...
-        #         # ... 1. bulk downloads
-        #         # ... 2. view/peak MRMS data instead of downloading/unzipping/etc
-        #         mrms_qpe_xarr = mrms_fetch_f(next_time, time_zone=timezone)
-
-        #         deltas = self._get_gauge_mrms_deltas(gauge_qpes, mrms_qpe_xarr)
-
-        #         for item in deltas:
-
-        #             df_dict['start_time'].append(str(curr_start_time))
-        #             df_dict['end_time'].append(str(next_time))
-        #             df_dict['station_id'].append(item['station_id'])
-        #             df_dict['lat'].append(float(item['lat']))
-        #             df_dict['lon'].append(float(item['lon']))
-        #             df_dict['gauge_qpe'].append(float(item['gauge_qpe']))
-        #             df_dict['mrms_qpe'].append(float(item['mrms_qpe']))
-        #             df_dict['delta_qpe'].append(float(item['delta_qpe']))
-
-        #         curr_start_time += step
-        #         next_time       += step
-        #         pbar.update()
-
-        return pd.DataFrame(df_dict)
+        chunks = list(self.iter_stats_for_range(
+            start_time, end_time, mrms_product, timedelta_interval=timedelta_interval, fetch_full_day=fetch_full_day,
+        ))
+        if not chunks:
+            return pd.DataFrame({col: np.zeros(0, dtype=dtype) for col, dtype in _COLUMNS.items()})
+
+        return pd.DataFrame({col: np.concatenate([c[col] for c in chunks]) for col in _COLUMNS})
 
 
 if __name__ == "__main__":
@@ -22,12 +22,15 @@ queries:
 import logging
 import numpy as np
 import pandas as pd
+import xarray as xr
 
 from tqdm import tqdm
-from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+from src.utils.ccrfcd.store import GaugeStore, local_to_utc, window_sums
+from src.utils.ccrfcd.interp import GaugeInterpolator
 
 
 class Location:
@@ -39,8 +42,9 @@ class Location:
 
 class CCRFCDClient:
 
-    _METADATA_FP    = "data/ccrfcd_rain_gauge_metadata.csv"
-    _GAUGE_DATA_DIR = "data/7-23-25-scrape"
+    _METADATA_FP     = "data/ccrfcd_rain_gauge_metadata.csv"
+    _GAUGE_DATA_DIR  = "data/7-23-25-scrape"
+    _GAUGE_STORE_DIR = "data/__cache__/ccrfcd/gauges"
 
     # state of nevada
     _LAT_MIN = 34.751857
@@ -57,29 +61,83 @@ class CCRFCDClient:
         self.metadata                            = pd.read_csv(CCRFCDClient._METADATA_FP)
         self.valid_station_ids                   = self.metadata[self.metadata['station_id'] > 0]['station_id'].astype(int).tolist()
         self.data_cache: Dict[int, pd.DataFrame] = {}
+        self._store: GaugeStore | None           = None
+        self._cell_cache: Dict[tuple, Tuple[np.ndarray, np.ndarray]] = {}
+        self._interp_cache: Dict[tuple, GaugeInterpolator]          = {}
+
+    @property
+    def store(self) -> GaugeStore:
+        """
+        Columnar, memory-mapped history of every gauge; built from the scraped csvs on first use.
+        """
+        if self._store is None:
+            self._store = GaugeStore.open_or_build(self._GAUGE_DATA_DIR, self._GAUGE_STORE_DIR)
+        return self._store
 
     def _get_gauge_df(self, gauge_id) -> pd.DataFrame | None:
 
         if gauge_id in self.data_cache:
             return self.data_cache[gauge_id]
-        
-        fp = Path(self._GAUGE_DATA_DIR) / f"gagedata_{gauge_id}.csv"
-        if not fp.is_file():
+
+        df = self.store.to_frame(gauge_id)
+        if df is None:
             return None
-        
-        df = pd.read_csv(fp)
-        df['datetime'] = pd.to_datetime(df['Date'] + ' ' + df['Time'])
-        df.set_index('datetime', inplace=True)
         self.data_cache[gauge_id] = df
 
         return df
 
+    def _get_gauge_csum(self, gauge_id) -> Tuple[np.ndarray, np.ndarray] | None:
+        """
+        Returns
+        ---
+        - ``(times, csum)``; ascending ``datetime64[ns]`` times as ``int64`` and a running sum of ``delta`` (NaN -> 0)
+            - ``csum[k] - csum[0]`` is the sum of the first ``k`` deltas; ``len(csum) == len(times) + 1``
+        """
+        return self.store.csum_view(gauge_id)
+
+    def _fetch_gauge_qpe_windows(
+            self,
+            start_times: np.ndarray,
+            end_times: np.ndarray,
+            gauge_ids: List[int] | None = None,
+            timezone="UTC",
+        ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        **Time Zone: UTC**
+        Batch ``_fetch_gauge_qpe``; many gauges x many windows in one call.
+
+        Params
+        ---
+        - :start_times, end_times: array-like of ``datetime64`` / ``datetime``; one entry per window
+        - :gauge_ids: default: ``self.valid_station_ids``
+        - :timezone: "UTC", or anything else for naive Las Vegas local times (DST-aware)
+
+        Returns
+        ---
+        - ``(gauge_ids, qpe)``; ``qpe`` is a ``[n_gauges, n_windows]`` array (in.); rows of gauges w/o data are NaN
+        """
+
+        start_times = np.asarray(start_times, dtype="datetime64[ns]").ravel()
+        end_times   = np.asarray(end_times, dtype="datetime64[ns]").ravel()
+        assert start_times.shape == end_times.shape, f"Error: expected one `end_time` per `start_time`"
+        assert np.all(start_times < end_times), f"Error: expected `start_time` < `end_time`"
+
+        # gauge times are stored in UTC; only local queries need converting
+        if timezone != "UTC":
+            start_times = local_to_utc(start_times, chronological=False).view("datetime64[ns]")
+            end_times   = local_to_utc(end_times, chronological=False).view("datetime64[ns]")
+
+        gauge_ids = np.asarray(self.valid_station_ids if gauge_ids is None else gauge_ids, dtype=np.int64)
+        return gauge_ids, self.store.window_sums(gauge_ids, start_times, end_times)
+
     def _fetch_gauge_qpe(self, 
                          gauge_id: int, 
                          start_time: datetime, 
                          end_time: datetime
                          ) -> Tuple[Location, float, int]:
         """
+        **Time Zone: UTC**
+
         Returns
         --- 
         - Cumlative precipitation (QPE) for a clark county rain gauge between ``start_time`` and ``end_time``.
@@ -87,31 +145,9 @@ class CCRFCDClient:
 
         assert start_time < end_time, f"Error: expected `start_time` < `end_time`"
 
-        df = self._get_gauge_df(gauge_id)
-        if df is None:
+        if gauge_id not in self.store:
             return (None, None, None)
 
-        # one issue is that rain gauges occasionally reset (e.g., 3.0" -> 0.0")
-        # these resets (and descending values, generally should be ignored)
-        if 'delta' not in df.columns:
-
-            delta_arr   = []
-            values = list(df["Value"])
-
-            for i, val in enumerate(values): 
-
-                if i >= len(values) - 1: break
-                curr_val = val
-                prev_val = values[i + 1]
-                delta    = curr_val - prev_val
-
-                # handle gauge resets; negative values
-                delta    = max(delta, 0.0)
-                delta_arr.append(delta)
-
-            delta_arr   = delta_arr + [0.0]
-            df['delta'] = delta_arr
-
         # cumulative precip
         cum_precip = None
 
@@ -121,13 +157,13 @@ class CCRFCDClient:
         row          = location_row.iloc[0]
         location     = Location(lat=float(row.lat), lon=float(row.lon))
 
-        # get [start, end] bounds
-        # TODO: fix, we should just index between start and end times
-        # start_idx  = df.index.get_indexer([start_time], method='nearest')[0]
-        # end_idx    = df.index.get_indexer([end_time],   method='nearest')[0]
-        # cum_precip = df.iloc[end_idx:start_idx+1]['delta'].sum()
-
-        cum_precip = df.loc[end_time:start_time]['delta'][:-1].sum()
+        # [start, end] -> two binary searches over the gauge's running sum
+        times, csum = self._get_gauge_csum(gauge_id)
+        cum_precip  = window_sums(
+            times, csum, 
+            np.asarray([start_time], dtype="datetime64[ns]").view(np.int64),
+            np.asarray([end_time], dtype="datetime64[ns]").view(np.int64),
+        )[0]
         return location, float(cum_precip), gauge_id
 
     def _fetch_all_gauge_qpe(self, start_time: datetime, end_time: datetime, timezone="UTC", disable_tqdm=False) -> List[Dict]:
@@ -146,32 +182,33 @@ class CCRFCDClient:
         ```
         """
 
-        # UTC -> PDT
-        if timezone == "UTC":
-            start_time -= timedelta(hours=7)
-            end_time   -= timedelta(hours=7)
-        
+        assert start_time < end_time, f"Error: expected `start_time` < `end_time`"
+
         all_gauge_qpe = []
-        
-        with ThreadPoolExecutor() as executor:
-            
-            futures = {executor.submit(self._fetch_gauge_qpe, _id, start_time, end_time): _id for _id in self.valid_station_ids}
-            for future in as_completed(futures):
-                try:
-                    res: Tuple[Optional[Location], Optional[float], Optional[int]] = future.result()
-                    if res[0] is None: continue
-                    all_gauge_qpe.append({
-                        "station_id": res[2],
-                        "lat": res[0].lat,
-                        "lon": res[0].lon + 360,
-                        "qpe": res[1],
-                    })
-                except Exception as e:
-                    # HACK: silencing these errors for now
-                    # print(e)
-                    # print(f"Error fetching gauge id: ???")
-                    pass
-            
+
+        # one window; every gauge's sum is two binary searches
+        gauge_ids, qpe = self._fetch_gauge_qpe_windows([start_time], [end_time], timezone=timezone)
+        locations      = self.metadata.groupby('station_id')[['lat', 'lon']]
+
+        for gauge_id, gauge_qpe in zip(gauge_ids.tolist(), qpe[:, 0].tolist()):
+
+            # no data for this gauge
+            if np.isnan(gauge_qpe): continue
+
+            # HACK: silently skip gauges w/o exactly one metadata row
+            try:
+                row = locations.get_group(gauge_id)
+            except KeyError:
+                continue
+            if len(row) != 1: continue
+
+            all_gauge_qpe.append({
+                "station_id": gauge_id,
+                "lat": float(row.lat.iloc[0]),
+                "lon": float(row.lon.iloc[0]) + 360,
+                "qpe": gauge_qpe,
+            })
+
         # for _id in tqdm(self.valid_station_ids, total=len(self.valid_station_ids), disable=disable_tqdm):
 
         #     try:
@@ -195,43 +232,210 @@ class CCRFCDClient:
 
         return all_gauge_qpe
 
-    def _grid_all_gauge_qpe(self, gauge_qpes: List[Tuple[Location, float]]) -> List[List[float]]: 
+    def _gauge_locations(self, gauge_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Convert a list of (Location, precip: float) values into a 2D grid of precipitation values (in.)
-        # TODO: how do we map MRMS data and our rain gauge data to the same 2D cartesian grid?
+        Returns
+        ---
+        - ``(lat, lon)`` per gauge; ``lon`` in ``[0, 360)`` (same as MRMS). NaN for gauges w/o exactly one metadata row
         """
 
-        def _latlon_to_idx(lat, lon) -> Tuple[int, int]:
-            """
-            Return (i, j) indices on grid.
-            """
-            i = int((lat - self._LAT_MIN) / self._DLAT)
-            j = int((lon - self._LON_MIN) / self._DLON)
-            return i, j
+        meta   = self.metadata.dropna(subset=['station_id'])
+        counts = meta['station_id'].astype(int).value_counts()
+        meta   = meta[meta['station_id'].astype(int).map(counts) == 1].set_index(meta['station_id'].astype(int))
+        rows   = meta.reindex(np.asarray(gauge_ids, dtype=np.int64))
+        return rows['lat'].to_numpy(dtype=np.float64), rows['lon'].to_numpy(dtype=np.float64) + 360
+
+    def build_gauge_acc_table(
+            self,
+            start_time: datetime,
+            end_time: datetime,
+            window: timedelta = timedelta(hours=1),
+            step: timedelta = timedelta(minutes=2),
+            store: str | None = None,
+            time_chunk: int = 21600,
+        ) -> xr.Dataset:
+        """
+        **Time Zone: UTC**
+        Dense ``gauge x time`` table of trailing accumulation (in.); one column per MRMS timestep (see ``notes/dataset_form.md``).
+
+        - column ``t`` holds every gauge's positive-difference sum over ``[t - window, t]``
+        - NaN where ``t`` falls outside a gauge's record (first to last tip)
+        - built ``time_chunk`` steps at a time (default: ~30 days of 2-min steps); memory is bounded by one chunk
+
+        Params
+        ---
+        - :start_time, end_time: range of window end times; snapped to multiples of ``step``
+        - :store: if set, the table is written to this zarr store chunk by chunk and re-opened from it
 
-        # 1-km grid covering the CCRFCD domain
+        Returns
+        ---
+        - ``xr.Dataset`` w/ ``gauge_acc[gauge, time]``, plus ``lat``/``lon`` per gauge
+        """
+
+        step_ns = np.timedelta64(step, "ns")
+        t0      = np.datetime64(start_time, "ns")
+        t1      = np.datetime64(end_time, "ns")
+        assert t0 <= t1, f"Error: expected `start_time` <= `end_time`"
+
+        # MRMS-aligned steps
+        t0    = t0 + (-t0.astype(np.int64)) % step_ns.astype(np.int64)
+        times = np.arange(t0, t1 + np.timedelta64(1, "ns"), step_ns)
+
+        gauge_ids = np.asarray(self.valid_station_ids, dtype=np.int64)
+        g_idx     = self.store.positions(gauge_ids)
+        gauge_ids = gauge_ids[g_idx >= 0]
+        g_idx     = g_idx[g_idx >= 0]
+        lat, lon  = self._gauge_locations(gauge_ids)
+
+        # first/last tip of every gauge; windows outside the record are NaN rather than 0
+        offsets  = np.asarray(self.store.offsets)
+        first_t  = np.asarray(self.store.time)[offsets[g_idx]]
+        last_t   = np.asarray(self.store.time)[offsets[g_idx + 1] - 1]
+
+        window_ns = np.timedelta64(window, "ns")
+        blocks    = []
+        for c0 in range(0, len(times), time_chunk):
+
+            end_times = times[c0:c0 + time_chunk]
+            _, acc    = self._fetch_gauge_qpe_windows(end_times - window_ns, end_times, gauge_ids=gauge_ids)
+
+            e = end_times.view(np.int64)[None, :]
+            acc[(e < first_t[:, None]) | (e - window_ns.astype(np.int64) > last_t[:, None])] = np.nan
+
+            ds = xr.Dataset(
+                {"gauge_acc": (("gauge", "time"), acc.astype(np.float32))},
+                coords={
+                    "gauge": gauge_ids,
+                    "time":  end_times,
+                    "lat":   ("gauge", lat),
+                    "lon":   ("gauge", lon),
+                },
+                attrs={"window": str(window), "units": "in"},
+            )
+
+            if store is None:
+                blocks.append(ds)
+            elif c0 == 0:
+                encoding = {
+                    "gauge_acc": {"chunks": (len(gauge_ids), time_chunk)},
+                    # fixed units so appended chunks aren't truncated to the first chunk's resolution
+                    "time": {"units": "seconds since 1970-01-01", "dtype": "int64", "chunks": (time_chunk,)},
+                }
+                ds.to_zarr(store, mode="w", encoding=encoding)
+            else:
+                ds.to_zarr(store, append_dim="time")
+
+        if store is None:
+            return xr.concat(blocks, dim="time", data_vars="minimal", coords="minimal")
+        return xr.open_dataset(store, engine="zarr", chunks=None)
+
+    def _grid_axes(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns
+        ---
+        - ``(lat_bins, lon_bins)``; lower edges of the 0.02° grid covering the CCRFCD domain (lon in ``[-180, 180)``)
+        """
         lat_bins = np.arange(self._LAT_MIN, self._LAT_MAX + self._DLAT, self._DLAT)
         lon_bins = np.arange(self._LON_MIN, self._LON_MAX + self._DLON, self._DLON)
+        return lat_bins, lon_bins
 
-        grid_sum = np.full((len(lat_bins), len(lon_bins)), 0.0)
-        grid_cnt = np.zeros_like(grid_sum)
+    def _gauge_cells(self, lats: np.ndarray, lons: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns
+        ---
+        - ``(cell, inside)``; flat grid-cell index of every gauge and a mask of gauges on the grid
+            - cached per gauge network; the gauges don't move
+        """
 
-        for loc, precip in gauge_qpes:
-            
-            # skip bad gauges
-            if precip is None:
-                continue
-            
-            i, j = _latlon_to_idx(loc.lat, loc.lon)
-            
-            if 0 <= i < grid_sum.shape[0] and 0 <= j < grid_sum.shape[1]:
-                grid_sum[i, j] += float(precip)
-                grid_cnt[i, j] += 1
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        key  = (lats.tobytes(), lons.tobytes())
+        if key in self._cell_cache:
+            return self._cell_cache[key]
+
+        lat_bins, lon_bins = self._grid_axes()
+
+        # accept lon in either [-180, 180) or [0, 360)
+        lons = np.where(lons >= 180, lons - 360, lons)
 
         with np.errstate(invalid="ignore"):
-            grid_mean = grid_sum / grid_cnt
+            i = np.floor((lats - self._LAT_MIN) / self._DLAT)
+            j = np.floor((lons - self._LON_MIN) / self._DLON)
+        inside = (i >= 0) & (i < len(lat_bins)) & (j >= 0) & (j < len(lon_bins))
 
-        return grid_mean
+        cell = np.where(inside, i * len(lon_bins) + j, 0).astype(np.int64)
+        self._cell_cache[key] = (cell, inside)
+        return cell, inside
+
+    def _grid_all_gauge_qpe(self, lats: np.ndarray, lons: np.ndarray, values: np.ndarray) -> np.ndarray: 
+        """
+        Bin gauge values -> the 0.02° CCRFCD grid; each cell is the mean of the gauges inside it (NaN if none).
+
+        Params
+        ---
+        - :lats, lons: ``[n_gauges]``
+        - :values: ``[n_gauges]`` or ``[n_gauges, n_times]`` (e.g., from ``_fetch_gauge_qpe_windows``); NaN values are skipped
+
+        Returns
+        ---
+        - A ``[n_times, H, W]`` stack (``[H, W]`` for 1D ``values``) of precipitation values (in.)
+        """
+
+        values  = np.asarray(values, dtype=np.float64)
+        squeeze = values.ndim == 1
+        if squeeze:
+            values = values[:, None]
+        assert values.shape[0] == len(lats), f"Error: expected one row of `values` per gauge"
+
+        lat_bins, lon_bins = self._grid_axes()
+        n_cells            = len(lat_bins) * len(lon_bins)
+        n_times            = values.shape[1]
+
+        cell, inside = self._gauge_cells(lats, lons)
+        cell, values = cell[inside], values[inside]
+
+        # one flat (time, cell) index per valid value; a single bincount does every timestep at once
+        valid    = ~np.isnan(values)
+        flat     = (np.arange(n_times)[None, :] * n_cells + cell[:, None])[valid]
+        grid_sum = np.bincount(flat, weights=values[valid], minlength=n_times * n_cells)
+        grid_cnt = np.bincount(flat, minlength=n_times * n_cells)
+
+        with np.errstate(invalid="ignore"):
+            grid_mean = (grid_sum / grid_cnt).reshape(n_times, len(lat_bins), len(lon_bins))
+
+        return grid_mean[0] if squeeze else grid_mean
+
+    def _interp_all_gauge_qpe(self, gauge_ids: np.ndarray, values: np.ndarray, method: str = "idw", **kwargs) -> np.ndarray:
+        """
+        Interpolate gauge values -> every cell of the 0.02° CCRFCD grid (see ``GaugeInterpolator``).
+
+        Params
+        ---
+        - :gauge_ids: ``[n_gauges]``; locations are read from the gauge metadata
+        - :values: ``[n_gauges]`` or ``[n_gauges, n_times]`` (e.g., from ``_fetch_gauge_qpe_windows``)
+        - :method: {"idw", "kriging"}; extra ``kwargs`` are passed to ``GaugeInterpolator``
+
+        Returns
+        ---
+        - A ``[n_times, H, W]`` stack (``[H, W]`` for 1D ``values``) of precipitation values (in.)
+        """
+
+        gauge_ids = np.asarray(gauge_ids, dtype=np.int64)
+        key       = (gauge_ids.tobytes(), method, tuple(sorted(kwargs.items())))
+
+        # neighbor sets + weights are built once per gauge network
+        if key not in self._interp_cache:
+            lat, lon           = self._gauge_locations(gauge_ids)
+            lat_bins, lon_bins = self._grid_axes()
+            self._interp_cache[key] = GaugeInterpolator(
+                lat, lon,
+                grid_lat = lat_bins + self._DLAT / 2,
+                grid_lon = lon_bins + self._DLON / 2,
+                method   = method,
+                **kwargs,
+            )
+
+        return self._interp_cache[key](values)
 
     def _fetch_ccrfcd_qpe_xhr(self, end_time: datetime, delta_hr: int = 0, delta_min: int = 0) -> List[Dict]:
         """
@@ -271,7 +475,7 @@ class CCRFCDClient:
 
     def fetch_ccrfcd_qpe_12hr(self, end_time: datetime) -> np.ndarray: 
         """
-        **Time Zone: PDT**
+        **Time Zone: UTC**
         - Fetch precip accumulation from ``end_time - 12:00`` to ``end_time``
 
         Returns
@@ -0,0 +1,257 @@
+"""
+# Gauge -> grid interpolation
+---
+Spread point gauge values over a regular lat/lon grid (e.g., the 0.02° CCRFCD grid) w/ IDW or ordinary kriging.
+
+- The gauge network is fixed, so every grid cell's ``k`` nearest gauges and their weights are found once (``cKDTree``)
+  and stored as a sparse ``[n_cells, n_gauges]`` matrix
+- Gridding any number of timesteps is then one sparse ``[n_cells, n_gauges] @ [n_gauges, n_times]`` product
+- Missing gauge values (NaN) are handled per timestep:
+    - IDW: each cell's (non-negative) weights are renormalized over the gauges that reported
+    - kriging: weights can be negative, so renormalizing is not valid; the systems of the cells that lost a neighbor are
+      re-solved w/o it, once per distinct pattern of missing gauges (cached)
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+from typing import Dict, Tuple
+from scipy.spatial import cKDTree
+
+
+# km per degree of latitude
+_KM_PER_DEG = 111.195
+
+
+def _to_km(lats: np.ndarray, lons: np.ndarray, lat0: float) -> np.ndarray:
+    """
+    lat/lon -> local equirectangular ``(x, y)`` (km); plenty accurate over a county-sized domain.
+    """
+    lons = np.where(lons >= 180, lons - 360, lons)
+    x = lons * _KM_PER_DEG * np.cos(np.deg2rad(lat0))
+    y = lats * _KM_PER_DEG
+    return np.column_stack([x, y])
+
+
+class GaugeInterpolator:
+
+    # max cached kriging weight matrices, one per distinct missing-gauge pattern
+    _MAX_MASKED = 64
+
+    def __init__(
+            self,
+            lats: np.ndarray,
+            lons: np.ndarray,
+            grid_lat: np.ndarray,
+            grid_lon: np.ndarray,
+            method: str = "idw",
+            k: int = 8,
+            power: float = 2.0,
+            max_dist_km: float | None = None,
+            variogram_range_km: float = 10.0,
+            variogram_nugget: float = 0.0,
+        ):
+        """
+        Params
+        ---
+        - :lats, lons: ``[n_gauges]`` gauge locations; gauges w/ a NaN location get no weight
+        - :grid_lat, grid_lon: 1D cell-center coordinates of the output grid
+        - :method: {"idw", "kriging"}
+        - :k: neighbors per cell
+        - :power: IDW distance exponent
+        - :max_dist_km: neighbors further away are ignored; cells w/o any neighbor stay NaN
+        - :variogram_range_km, variogram_nugget: exponential variogram (sill of 1) used for ordinary kriging
+        """
+
+        self.method    = method.lower()
+        self.grid_lat  = np.asarray(grid_lat, dtype=np.float64)
+        self.grid_lon  = np.asarray(grid_lon, dtype=np.float64)
+        self.n_gauges  = len(lats)
+        self.shape     = (len(self.grid_lat), len(self.grid_lon))
+
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        ok   = ~(np.isnan(lats) | np.isnan(lons))
+        assert ok.sum() > 0, f"Error: no gauges w/ a valid location"
+
+        lat0      = float(np.nanmean(self.grid_lat))
+        gauge_xy  = _to_km(lats[ok], lons[ok], lat0)
+        glon, glat = np.meshgrid(self.grid_lon, self.grid_lat)
+        cell_xy   = _to_km(glat.ravel(), glon.ravel(), lat0)
+
+        k    = min(k, len(gauge_xy))
+        tree = cKDTree(gauge_xy)
+        dist, nbr = tree.query(cell_xy, k=k, distance_upper_bound=np.inf if max_dist_km is None else max_dist_km)
+        dist, nbr = dist.reshape(len(cell_xy), k), nbr.reshape(len(cell_xy), k)
+
+        # ``query`` pads missing neighbors w/ inf distance + index ``n``
+        found = np.isfinite(dist)
+
+        if self.method == "idw":
+            w = self._idw_weights(dist, found, power)
+        elif self.method == "kriging":
+            w = self._kriging_weights(gauge_xy, cell_xy, dist, nbr, found, variogram_range_km, variogram_nugget)
+        else:
+            raise ValueError(f"Unrecognized method '{method}'. "
+                             "Choose 'idw' or 'kriging'.")
+
+        # neighbor idx -> original gauge idx (skipping gauges w/o a location)
+        self._gauge_idx = np.flatnonzero(ok)
+        self.weights: sp.csr_matrix = self._to_sparse(w, found, nbr)
+
+        # kept for re-solving kriging systems when gauges are missing; {missing-gauge pattern: weights}
+        if self.method == "kriging":
+            self._gauge_xy   = gauge_xy
+            self._dist       = dist
+            self._nbr        = nbr
+            self._found      = found
+            self._w          = w
+            self._variogram  = (variogram_range_km, variogram_nugget)
+            self._masked_w: Dict[bytes, Tuple[sp.csr_matrix, np.ndarray]] = {}
+
+    def _to_sparse(self, w: np.ndarray, found: np.ndarray, nbr: np.ndarray) -> sp.csr_matrix:
+        n_cells, k = nbr.shape
+        rows = np.repeat(np.arange(n_cells), k)[found.ravel()]
+        cols = self._gauge_idx[nbr[found]]
+        return sp.csr_matrix((w[found], (rows, cols)), shape=(n_cells, self.n_gauges))
+
+    def _kriging_masked(self, valid: np.ndarray) -> Tuple[sp.csr_matrix, np.ndarray]:
+        """
+        Kriging weights w/ every gauge where ``~valid`` dropped; only cells that lost a neighbor are re-solved.
+
+        Returns
+        ---
+        - ``(weights, empty)``; ``empty`` ``[n_cells]`` marks cells left w/o any reporting neighbor
+        """
+
+        key = np.packbits(valid).tobytes()
+        if key in self._masked_w:
+            return self._masked_w[key]
+
+        found = self._found & valid[self._gauge_idx[np.where(self._found, self._nbr, 0)]]
+        hit   = (found != self._found).any(axis=1)
+
+        w = self._w.copy()
+        if hit.any():
+            w[hit] = self._kriging_weights(
+                self._gauge_xy, None, self._dist[hit], self._nbr[hit], found[hit], *self._variogram,
+            )
+        empty = ~found.any(axis=1)
+
+        if len(self._masked_w) >= self._MAX_MASKED:
+            self._masked_w.pop(next(iter(self._masked_w)))
+        self._masked_w[key] = (self._to_sparse(w, found & ~empty[:, None], self._nbr), empty)
+        return self._masked_w[key]
+
+    @staticmethod
+    def _idw_weights(dist: np.ndarray, found: np.ndarray, power: float) -> np.ndarray:
+
+        with np.errstate(divide="ignore"):
+            w = np.where(found, 1.0 / np.maximum(dist, 1e-6) ** power, 0.0)
+
+        # a gauge sitting (practically) on a cell center takes the whole cell
+        exact = found & (dist < 1e-6)
+        w     = np.where(exact.any(axis=1, keepdims=True), exact.astype(np.float64), w)
+
+        with np.errstate(invalid="ignore"):
+            return w / w.sum(axis=1, keepdims=True)
+
+    @staticmethod
+    def _kriging_weights(
+            gauge_xy: np.ndarray,
+            cell_xy: np.ndarray,
+            dist: np.ndarray,
+            nbr: np.ndarray,
+            found: np.ndarray,
+            range_km: float,
+            nugget: float,
+        ) -> np.ndarray:
+        """
+        Ordinary kriging over each cell's ``k`` nearest gauges; all cells' systems are solved in one batched ``np.linalg.solve``.
+        """
+
+        def _gamma(h):
+            return nugget + (1.0 - nugget) * (1.0 - np.exp(-h / range_km))
+
+        n_cells, k = nbr.shape
+        nbr_c      = np.where(found, nbr, 0)
+        pts        = gauge_xy[nbr_c]                                       # [C, k, 2]
+
+        # [C, k+1, k+1] system: [[Γ, 1], [1ᵀ, 0]] [w, μ] = [γ, 1]
+        h  = np.linalg.norm(pts[:, :, None, :] - pts[:, None, :, :], axis=-1)
+        A  = np.zeros((n_cells, k + 1, k + 1))
+        A[:, :k, :k] = _gamma(h)
+        A[:, :k, k]  = 1.0
+        A[:, k, :k]  = 1.0
+        b  = np.ones((n_cells, k + 1))
+        b[:, :k] = _gamma(np.where(found, dist, 0.0))
+
+        # padded neighbors: decouple them (identity row, zero rhs) so they get a weight of 0
+        pad = ~found
+        A[:, :k, :k][np.broadcast_to(pad[:, :, None], (n_cells, k, k))] = 0.0
+        A[:, :k, :k][np.broadcast_to(pad[:, None, :], (n_cells, k, k))] = 0.0
+        A[:, :k, k][pad] = 0.0
+        A[:, k, :k][pad] = 0.0
+        ii = np.arange(k)
+        A[:, ii, ii] = np.where(pad, 1.0, A[:, ii, ii])
+        b[:, :k][pad] = 0.0
+
+        # cells w/o any neighbor: solve a dummy system, weights are dropped below
+        empty = ~found.any(axis=1)
+        A[empty, k, k] = 1.0
+
+        w = np.linalg.solve(A, b[..., None])[..., 0][:, :k]
+        w[empty] = np.nan
+        return w
+
+    def __call__(self, values: np.ndarray) -> np.ndarray:
+        """
+        Params
+        ---
+        - :values: ``[n_gauges]`` or ``[n_gauges, n_times]``; NaN = gauge didn't report
+
+        Returns
+        ---
+        - A ``[n_times, H, W]`` stack (``[H, W]`` for 1D ``values``); NaN where no neighbor reported
+            - IDW: weights renormalized over the gauges that reported
+            - kriging: weights re-solved over the gauges that reported
+        """
+
+        values  = np.asarray(values, dtype=np.float64)
+        squeeze = values.ndim == 1
+        if squeeze:
+            values = values[:, None]
+        assert values.shape[0] == self.n_gauges, f"Error: expected one row of `values` per gauge"
+
+        valid = ~np.isnan(values)
+        vals  = np.where(valid, values, 0.0)
+
+        if self.method == "kriging":
+            # kriging weights already sum to 1 and may be negative; re-solve per missing-gauge pattern instead of renormalizing
+            out = np.empty((self.weights.shape[0], values.shape[1]))
+            patterns, inv = np.unique(valid.T, axis=0, return_inverse=True)
+            inv = inv.ravel()
+            for p, pattern in enumerate(patterns):
+                cols = np.flatnonzero(inv == p)
+                weights, empty = self._kriging_masked(pattern)
+                block = weights @ vals[:, cols]
+                block[empty] = np.nan
+                out[:, cols] = block
+        else:
+            num = self.weights @ vals
+            # per cell + timestep, the total weight of gauges that actually reported
+            den = self.weights @ valid.astype(np.float64)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                out = np.where(np.abs(den) > 1e-12, num / den, np.nan)
+
+        out = out.T.reshape(values.shape[1], *self.shape)
+        return out[0] if squeeze else out
+
+    def cell_weights(self, i: int, j: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns
+        ---
+        - ``(gauge_idx, weights)`` contributing to grid cell ``(i, j)``
+        """
+        row = self.weights.getrow(i * self.shape[1] + j)
+        return row.indices, row.data
@@ -0,0 +1,340 @@
+"""
+# Columnar CCRFCD gauge store
+---
+Every gauge's history is parsed from ``data/7-23-25-scrape/gagedata_{id}.csv`` once, then kept as flat, memory-mapped NumPy columns.
+
+| file | dtype | shape |
+| :--: | :--: | :--: |
+| ``gauge_ids.npy`` | ``int64`` | ``[G]`` |
+| ``offsets.npy``   | ``int64`` | ``[G + 1]``; rows of gauge ``g`` are ``offsets[g]:offsets[g + 1]`` |
+| ``gauge_idx.npy`` | ``int32`` | ``[N]`` |
+| ``time.npy``      | ``int64`` | ``[N]``; ``datetime64[ns]``, ascending per gauge |
+| ``value.npy``     | ``float64`` | ``[N]``; accumulated precip (in.) |
+| ``delta.npy``     | ``float64`` | ``[N]``; per-row accumulation (see ``_tip_deltas``) |
+| ``csum.npy``      | ``float64`` | ``[N + 1]``; zero-padded running sum of ``delta`` (NaN -> 0) |
+
+- Opening the store is a handful of ``mmap`` calls; pages are shared by every process reading it
+- The store is rebuilt automatically when the source CSVs change
+- **Timezone**: csvs are recorded in Las Vegas local time; times are stored in ``UTC`` (see ``local_to_utc``)
+"""
+
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+
+_COLUMNS = ["gauge_ids", "offsets", "gauge_idx", "time", "value", "delta", "csum"]
+
+# bump whenever the on-disk layout/semantics change so stale stores are rebuilt
+_STORE_VERSION = 2
+
+LOCAL_TZ = "America/Los_Angeles"
+
+
+def local_to_utc(times: np.ndarray, chronological: bool = True) -> np.ndarray:
+    """
+    Naive Las Vegas local times -> naive ``UTC``; whole column at once, DST-aware.
+
+    Params
+    ---
+    - :times: ``datetime64`` / ``int64`` ns
+    - :chronological: ``times`` are in the order they were recorded
+        - if so, the repeated hour in November is resolved by order: a time not later than one already seen is the second (PST) pass
+        - otherwise, ambiguous times are taken as the first (PDT) pass
+
+    Returns
+    ---
+    - ``int64`` ns ``UTC``; times in the skipped hour in March are shifted forward to 03:00 PDT
+    """
+
+    t = np.asarray(times).astype("datetime64[ns]").view(np.int64)
+    if len(t) == 0:
+        return t.copy()
+
+    if chronological:
+        # running max of everything before each row; anything not past it is a repeat of local time
+        prev_max    = np.maximum.accumulate(np.concatenate([[np.iinfo(np.int64).min], t[:-1]]))
+        first_pass  = t > prev_max
+    else:
+        first_pass  = np.ones(len(t), dtype=bool)
+
+    local = pd.DatetimeIndex(t.view("datetime64[ns]")).tz_localize(LOCAL_TZ, ambiguous=first_pass, nonexistent="shift_forward")
+    return local.tz_convert("UTC").tz_localize(None).to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def _tip_deltas(values: np.ndarray) -> np.ndarray:
+    """
+    Per-row accumulation from a gauge's (descending-time) running total.
+
+    - one issue is that rain gauges occasionally reset (e.g., 3.0" -> 0.0")
+        - these resets (and descending values, generally) are clipped to 0
+    - the oldest row has nothing to difference against; its delta is 0
+    - NaN readings propagate as NaN deltas (skipped by ``sum()``)
+    """
+
+    delta = np.zeros(len(values), dtype=np.float64)
+    if len(values) > 1:
+        # NOTE: np.maximum (not np.fmax) so NaN propagates, same as ``max(nan, 0.0)``
+        delta[:-1] = np.maximum(values[:-1] - values[1:], 0.0)
+    return delta
+
+
+def _read_gauge_csv(fp: Path) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Returns
+    ---
+    - ``(times, values, deltas)``; ``UTC``, sorted ascending by time
+    """
+
+    df     = pd.read_csv(fp, dtype={"Date": str, "Time": str})
+    times  = pd.to_datetime(df["Date"] + " " + df["Time"], format="%m/%d/%Y %H:%M:%S").to_numpy(dtype="datetime64[ns]")
+    values = pd.to_numeric(df["Value"], errors="coerce").to_numpy(dtype=np.float64)
+
+    # csvs are newest-first; flip to recording order so the repeated Nov. hour can be told apart
+    times  = local_to_utc(times[::-1], chronological=True)[::-1]
+
+    # deltas are taken in file (newest-first) order, same as the original per-gauge dataframes
+    deltas = _tip_deltas(values)
+
+    if len(times) > 1 and np.all(times[:-1] >= times[1:]):
+        order = np.arange(len(times))[::-1]
+    else:
+        order = np.argsort(times, kind="stable")
+
+    return times[order], values[order], deltas[order]
+
+
+def window_sums(times: np.ndarray, csum: np.ndarray, start_times: np.ndarray, end_times: np.ndarray) -> np.ndarray:
+    """
+    Accumulation over every ``[start, end]`` window (inclusive) in one pass; ``(times, csum)`` as from ``GaugeStore.csum_view``.
+
+    - same as ``df.loc[end:start]['delta'][:-1].sum()``: the oldest in-window row's delta
+      belongs to the interval *before* ``start`` and is left out
+    """
+
+    left  = np.searchsorted(times, start_times, side="left")
+    right = np.searchsorted(times, end_times, side="right")
+    first = np.minimum(left + 1, right)
+    return csum[right] - csum[first]
+
+
+class GaugeStore:
+
+    _DEFAULT_DIR = "data/__cache__/ccrfcd/gauges"
+
+    def __init__(self, root: str = _DEFAULT_DIR):
+        self.root = Path(root)
+        self._open()
+
+    def _open(self) -> None:
+        cols = {}
+        for name in _COLUMNS:
+            fp = self.root / f"{name}.npy"
+            # NOTE: empty arrays can't be mmap'd
+            cols[name] = np.load(fp, mmap_mode="r") if fp.stat().st_size > 128 else np.load(fp)
+
+        self.gauge_ids = cols["gauge_ids"]
+        self.offsets   = cols["offsets"]
+        self.gauge_idx = cols["gauge_idx"]
+        self.time      = cols["time"]
+        self.value     = cols["value"]
+        self.delta     = cols["delta"]
+        self.csum      = cols["csum"]
+
+        self._lookup: Dict[int, int] = {int(g): i for i, g in enumerate(self.gauge_ids.tolist())}
+
+        # ``gauge_ids`` follow file-name order; a sorted view for vectorized lookups
+        self._order      = np.argsort(self.gauge_ids, kind="stable")
+        self._sorted_ids = np.asarray(self.gauge_ids)[self._order]
+
+    # only the path crosses process boundaries; workers re-map the same pages
+    def __getstate__(self):
+        return {"root": str(self.root)}
+
+    def __setstate__(self, state):
+        self.root = Path(state["root"])
+        self._open()
+
+    def __len__(self) -> int:
+        return len(self.gauge_ids)
+
+    def __contains__(self, gauge_id: int) -> bool:
+        return int(gauge_id) in self._lookup
+
+    def positions(self, gauge_ids: np.ndarray) -> np.ndarray:
+        """
+        Returns
+        ---
+        - Position of each of ``gauge_ids`` in this store (index into ``offsets``); ``-1`` for gauges w/o data
+        """
+
+        gauge_ids = np.asarray(gauge_ids, dtype=np.int64)
+        if len(self._sorted_ids) == 0:
+            return np.full(gauge_ids.shape, -1, dtype=np.int64)
+
+        pos = np.clip(np.searchsorted(self._sorted_ids, gauge_ids), 0, len(self._sorted_ids) - 1)
+        ok  = self._sorted_ids[pos] == gauge_ids
+        return np.where(ok, self._order[pos], -1)
+
+    def rows(self, gauge_id: int) -> slice | None:
+        """
+        Returns
+        ---
+        - The row slice of ``gauge_id``; ``None`` if the gauge has no data.
+        """
+
+        g = self._lookup.get(int(gauge_id))
+        if g is None:
+            return None
+        return slice(int(self.offsets[g]), int(self.offsets[g + 1]))
+
+    def csum_view(self, gauge_id: int) -> Tuple[np.ndarray, np.ndarray] | None:
+        """
+        Returns
+        ---
+        - ``(times, csum)``; views, no copies. ``csum[k] - csum[0]`` is the sum of the gauge's first ``k`` deltas
+        """
+
+        rows = self.rows(gauge_id)
+        if rows is None:
+            return None
+        return self.time[rows], self.csum[rows.start:rows.stop + 1]
+
+    def window_sums(self, gauge_ids: np.ndarray, start_times: np.ndarray, end_times: np.ndarray) -> np.ndarray:
+        """
+        **Time Zone: UTC**
+
+        Params
+        ---
+        - :start_times, end_times: ``[n_windows]``; ``datetime64[ns]`` or ``int64`` ns
+
+        Returns
+        ---
+        - ``[n_gauges, n_windows]`` accumulation (in.); rows of gauges w/o data are NaN
+        """
+
+        t0  = np.asarray(start_times).astype("datetime64[ns]").view(np.int64)
+        t1  = np.asarray(end_times).astype("datetime64[ns]").view(np.int64)
+        out = np.full((len(gauge_ids), len(t0)), np.nan, dtype=np.float64)
+
+        for i, gauge_id in enumerate(np.asarray(gauge_ids).tolist()):
+            res = self.csum_view(gauge_id)
+            if res is None:
+                continue
+            out[i] = window_sums(*res, t0, t1)
+
+        return out
+
+    @staticmethod
+    def _source_signature(data_dir: Path) -> Dict:
+        fps = sorted(data_dir.glob("gagedata_*.csv"))
+        sts = [fp.stat() for fp in fps]
+        return {
+            "version": _STORE_VERSION,
+            "source":  str(data_dir.resolve()),
+            "n_files": len(fps),
+            "n_bytes": sum(st.st_size for st in sts),
+            "mtime":   max((st.st_mtime for st in sts), default=0.0),
+        }
+
+    @classmethod
+    def build(cls, data_dir: str, root: str = _DEFAULT_DIR) -> 'GaugeStore':
+        """
+        Parse every ``gagedata_{id}.csv`` in ``data_dir`` -> one columnar store at ``root``.
+        """
+
+        data_dir = Path(data_dir)
+        root     = Path(root)
+
+        gauge_ids, times, values, deltas = [], [], [], []
+        for fp in sorted(data_dir.glob("gagedata_*.csv")):
+            try:
+                gauge_id = int(fp.stem.split("_")[-1])
+                t, v, d  = _read_gauge_csv(fp)
+            except Exception as e:
+                print(f"Error: could not ingest {fp}: {e}")
+                continue
+            gauge_ids.append(gauge_id)
+            times.append(t)
+            values.append(v)
+            deltas.append(d)
+
+        sizes   = np.asarray([len(t) for t in times], dtype=np.int64)
+        offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+
+        delta = np.concatenate(deltas) if deltas else np.zeros(0, dtype=np.float64)
+        csum  = np.zeros(len(delta) + 1, dtype=np.float64)
+        np.cumsum(np.nan_to_num(delta, nan=0.0), out=csum[1:])
+
+        cols = {
+            "gauge_ids": np.asarray(gauge_ids, dtype=np.int64),
+            "offsets":   offsets,
+            "gauge_idx": np.repeat(np.arange(len(sizes), dtype=np.int32), sizes),
+            "time":      np.concatenate(times) if times else np.zeros(0, dtype=np.int64),
+            "value":     np.concatenate(values) if values else np.zeros(0, dtype=np.float64),
+            "delta":     delta,
+            "csum":      csum,
+        }
+
+        # write -> tmp dir, then swap in so readers never see a partial store
+        tmp_root = root.with_name(f"{root.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_root, ignore_errors=True)
+        tmp_root.mkdir(parents=True)
+        for name, arr in cols.items():
+            np.save(tmp_root / f"{name}.npy", arr)
+        with open(tmp_root / "manifest.json", "w") as f:
+            json.dump(cls._source_signature(data_dir), f)
+
+        shutil.rmtree(root, ignore_errors=True)
+        os.replace(tmp_root, root)
+
+        return cls(str(root))
+
+    @classmethod
+    def open_or_build(cls, data_dir: str, root: str = _DEFAULT_DIR) -> 'GaugeStore':
+        """
+        Open the store at ``root``; (re)build it first if it's missing or ``data_dir`` has changed since.
+        """
+
+        data_dir = Path(data_dir)
+        manifest = Path(root) / "manifest.json"
+
+        if manifest.is_file():
+            # no source csvs (e.g., only the store was copied over); use what we have
+            if not data_dir.is_dir():
+                return cls(root)
+            with open(manifest) as f:
+                if json.load(f) == cls._source_signature(data_dir):
+                    return cls(root)
+
+        return cls.build(str(data_dir), root)
+
+    def to_frame(self, gauge_id: int) -> pd.DataFrame | None:
+        """
+        Returns
+        ---
+        - One gauge's history as a newest-first dataframe (``Value``, ``delta``) indexed by ``datetime``; ``None`` if the gauge has no data.
+        """
+
+        rows = self.rows(gauge_id)
+        if rows is None:
+            return None
+
+        # NOTE: newest-first, matching the scraped csvs
+        idx = pd.DatetimeIndex(np.asarray(self.time[rows][::-1]).view("datetime64[ns]"), name="datetime")
+        return pd.DataFrame(
+            {
+                "Value": np.asarray(self.value[rows][::-1]),
+                "delta": np.asarray(self.delta[rows][::-1]),
+            },
+            index=idx,
+        )
+
+    def gauges(self) -> List[int]:
+        return self.gauge_ids.tolist()
@@ -0,0 +1,223 @@
+"""
+# HRRR environment cube
+---
+Every downloaded analysis hour (``data/hrrr-env/{yyyymmdd}_{hh}z_anl``) consolidated into a single zarr store.
+
+- One ``(time, y, x)`` variable per field of interest, named ``"{level}_{name}"``
+- ``time`` is a sorted ``datetime64`` axis; ``y``/``x`` are the global HRRR row/col of the kept chunks' bounding window
+    - cells of the window outside the kept chunks (e.g. ``2.1`` for ``VEF_CHUNKS``) are never downloaded and are stored as NaN;
+      the kept chunk ids are recorded in the store's ``chunks`` attr
+- Chunked ``(time_chunk, y_chunk, x_chunk)`` w/ consolidated metadata: a multi-year series at one grid point reads
+  one small spatial tile per ``time_chunk`` hours and never globs a directory
+"""
+
+import numpy as np
+import pandas as pd
+import xarray as xr
+import zarr
+
+from pathlib import Path
+from datetime import datetime
+from glob import glob
+from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+
+from src.utils.hrrr.grid import HRRR_SHAPE, HRRR_CHUNK_SHAPE, chunk_ids
+from src.utils.hrrr.download import VEF_CHUNKS, hour_dir_name
+from src.utils.hrrr.variables import VARS_OF_INTEREST, column_name
+
+
+CUBE_FP = "data/hrrr-env.zarr"
+
+
+def chunks_window(chunks: List[str] = VEF_CHUNKS) -> tuple[slice, slice]:
+    """
+    Returns
+    ---
+    - ``(rows, cols)``; the smallest window of the HRRR grid covering every ``"{chunk_y}.{chunk_x}"`` in ``chunks``
+    """
+
+    cy = [int(c.split(".")[0]) for c in chunks]
+    cx = [int(c.split(".")[1]) for c in chunks]
+    rows = slice(min(cy) * HRRR_CHUNK_SHAPE[0], min((max(cy) + 1) * HRRR_CHUNK_SHAPE[0], HRRR_SHAPE[0]))
+    cols = slice(min(cx) * HRRR_CHUNK_SHAPE[1], min((max(cx) + 1) * HRRR_CHUNK_SHAPE[1], HRRR_SHAPE[1]))
+    return rows, cols
+
+
+def chunks_mask(rows: slice, cols: slice, chunks: List[str] = VEF_CHUNKS) -> np.ndarray:
+    """
+    Returns
+    ---
+    - ``[H, W]`` bool over the ``(rows, cols)`` window; ``True`` where the grid point falls in one of ``chunks``
+    """
+
+    iy, ix = np.meshgrid(np.arange(rows.start, rows.stop), np.arange(cols.start, cols.stop), indexing="ij")
+    return np.isin(chunk_ids(iy, ix), chunks)
+
+
+def list_hour_dirs(hrrr_env_dir: str) -> Dict[datetime, str]:
+    """
+    ``{analysis hour: local dir}``; TZ assumed UTC.
+    """
+    return {datetime.strptime(Path(fp).name, "%Y%m%d_%Hz_anl"): fp for fp in glob(f"{hrrr_env_dir}/*_anl")}
+
+
+def read_hour(
+        hour_dir: str,
+        rows: slice,
+        cols: slice,
+        vars: List[dict] = VARS_OF_INTEREST,
+        mask: np.ndarray | None = None,
+    ) -> Dict[str, np.ndarray]:
+    """
+    Every field of one local analysis hour, cropped to ``(rows, cols)``.
+
+    - Arrays are opened at their known ``{level}/{name}/{level}/{name}`` path; fields absent from the hour are all-NaN
+    - Any other read error is raised
+    - w/ ``mask`` (see ``chunks_mask``), cells outside it are set to NaN instead of zarr's fill value
+
+    Returns
+    ---
+    - ``{"{level}_{name}": [H, W] float32}``
+    """
+
+    shape = (rows.stop - rows.start, cols.stop - cols.start)
+    out   = {}
+    for var in vars:
+        fp = Path(hour_dir) / var["level"] / var["name"] / var["level"] / var["name"]
+        if not (fp / ".zarray").is_file():
+            out[column_name(var)] = np.full(shape, np.nan, dtype=np.float32)
+            continue
+        vals = np.asarray(zarr.open_array(str(fp), mode="r")[rows, cols], dtype=np.float32)
+        if mask is not None:
+            vals[~mask] = np.nan
+        out[column_name(var)] = vals
+    return out
+
+
+def ingest(
+        hrrr_env_dir: str,
+        store: str = CUBE_FP,
+        vars: List[dict] = VARS_OF_INTEREST,
+        chunks: List[str] = VEF_CHUNKS,
+        time_chunk: int = 720,
+        space_chunk: int = 30,
+        read_batch: int = 24,
+        max_workers: int | None = None,
+    ) -> int:
+    """
+    Append every hour in ``hrrr_env_dir`` not yet in ``store``; creates the store on first use.
+
+    - ``time_chunk`` only sets the store's chunking; hours are read ``read_batch`` at a time (concurrently)
+      and appended as one block, so peak memory is ``read_batch`` hours of every field, whatever ``time_chunk`` is
+        - each append rewrites the partially filled trailing time chunk; larger batches trade memory for fewer rewrites
+    - Hours older than the last one in the store are still appended; ``HRRREnvCube`` does not assume a sorted axis
+
+    Returns
+    ---
+    - Number of hours appended
+    """
+
+    rows, cols = chunks_window(chunks)
+    mask       = chunks_mask(rows, cols, chunks)
+    names      = [column_name(v) for v in vars]
+
+    hour_dirs = list_hour_dirs(hrrr_env_dir)
+    exists    = Path(store).is_dir()
+    if exists:
+        with xr.open_zarr(store, consolidated=True) as ds:
+            done = set(pd.DatetimeIndex(ds.time.values).to_pydatetime())
+        hour_dirs = {t: fp for t, fp in hour_dirs.items() if t not in done}
+
+    hours = sorted(hour_dirs)
+    shape = (rows.stop - rows.start, cols.stop - cols.start)
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        for b0 in range(0, len(hours), read_batch):
+            block = hours[b0:b0 + read_batch]
+
+            # filled in place as hours arrive; never a list of grids + a stacked copy
+            data = {n: np.empty((len(block),) + shape, dtype=np.float32) for n in names}
+            for i, grid in enumerate(ex.map(lambda t: read_hour(hour_dirs[t], rows, cols, vars, mask), block)):
+                for n in names:
+                    data[n][i] = grid[n]
+
+            ds = xr.Dataset(
+                {n: (("time", "y", "x"), data[n]) for n in names},
+                coords={
+                    "time": np.asarray(block, dtype="datetime64[ns]"),
+                    "y": np.arange(rows.start, rows.stop, dtype=np.int64),
+                    "x": np.arange(cols.start, cols.stop, dtype=np.int64),
+                },
+                attrs={"chunks": ",".join(chunks)},
+            )
+            if not exists:
+                encoding = {n: {"chunks": (time_chunk, space_chunk, space_chunk)} for n in names}
+                # fixed units so hourly appends are never truncated to the first block's resolution
+                encoding["time"] = {"units": "seconds since 1970-01-01", "dtype": "int64", "chunks": (time_chunk,)}
+                ds.to_zarr(store, mode="w", encoding=encoding, consolidated=True)
+                exists = True
+            else:
+                ds.to_zarr(store, append_dim="time", consolidated=True)
+
+    return len(hours)
+
+
+class HRRREnvCube:
+    """
+    Read-only view of a store written by ``ingest``.
+    """
+
+    def __init__(self, store: str = CUBE_FP):
+        self.store = store
+        self.ds    = xr.open_zarr(store, consolidated=True)
+        self.times = pd.DatetimeIndex(self.ds.time.values)
+        self.y     = self.ds.y.values
+        self.x     = self.ds.x.values
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.ds.data_vars)
+
+    def time_positions(self, times) -> np.ndarray:
+        """
+        Returns
+        ---
+        - Position of each of ``times`` on the time axis; ``-1`` where the hour is not in the cube
+        """
+        return self.times.get_indexer(pd.DatetimeIndex(times))
+
+    def _local(self, iy: np.ndarray, ix: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        ly = np.asarray(iy, dtype=np.int64) - self.y[0]
+        lx = np.asarray(ix, dtype=np.int64) - self.x[0]
+        ok = (ly >= 0) & (ly < len(self.y)) & (lx >= 0) & (lx < len(self.x))
+        return np.where(ok, ly, 0), np.where(ok, lx, 0), ok
+
+    def series(self, column: str, iy: int, ix: int) -> pd.Series:
+        """
+        Full time series of ``column`` at global HRRR grid point ``(iy, ix)``.
+        """
+
+        ly, lx, ok = self._local([iy], [ix])
+        assert ok[0], f"Error: grid point ({iy}, {ix}) is outside the cube"
+        vals = self.ds[column].isel(y=int(ly[0]), x=int(lx[0])).values
+        return pd.Series(vals, index=self.times, name=column)
+
+    def gather(self, column: str, iy: np.ndarray, ix: np.ndarray) -> np.ndarray:
+        """
+        Params
+        ---
+        - :iy, ix: ``[...]`` global HRRR grid points
+
+        Returns
+        ---
+        - ``[T, ...]``; NaN at points outside the cube
+        """
+
+        iy, ix = np.asarray(iy), np.asarray(ix)
+        ly, lx, ok = self._local(iy.ravel(), ix.ravel())
+        vals = self.ds[column].isel(y=xr.DataArray(ly, dims="p"), x=xr.DataArray(lx, dims="p")).values
+        vals = np.where(ok, vals, np.nan)
+        return vals.reshape((len(self.times),) + iy.shape)
@@ -0,0 +1,135 @@
+"""
+# Selective HRRR zarr download
+---
+Fetch only the bytes a local HRRR analysis hour actually needs: the variables of interest, restricted to a few chunks.
+
+- An hour lives under ``{bucket}/{store}/{yyyymmdd}/{yyyymmdd}_{hh}z_anl.zarr/``; every field under ``{level}/{name}/``
+- Only each variable's subtree is listed; only its zarr metadata (``ZARR_META``) + the kept chunk keys are transferred
+- Both stores (``sfc``, ``prs``) of an hour are written into the same local dir, keeping the ``{level}/{name}/{level}/{name}`` layout
+"""
+
+import os
+import posixpath
+
+from pathlib import Path
+from typing import List, Tuple
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.utils.mrms.mrms import MRMSAWSS3Client, BulkDownload
+from src.utils.hrrr.variables import VARS_OF_INTEREST
+
+
+HRRR_BUCKET = "s3://hrrrzarr"
+
+# the zarr chunks we keep; roughly corresponding to the VEF CWA
+# https://mesowest.utah.edu/html/hrrr/zarr_documentation/html/python_data_loading.html
+VEF_CHUNKS = ["4.1", "4.2", "3.1", "3.2", "2.2"]
+
+# zarr v2 metadata keys; fetched for every group/array of a variable's subtree
+ZARR_META = {".zarray", ".zattrs", ".zgroup"}
+
+
+def hour_dir_name(dt: datetime) -> str:
+    """
+    ``"{yyyymmdd}_{hh}z_anl"``
+    """
+    return f"{dt.year}{dt.month:02d}{dt.day:02d}_{dt.hour:02d}z_anl"
+
+
+def hour_url(dt: datetime, store: str, bucket: str = HRRR_BUCKET) -> str:
+    """
+    Prefix of an analysis hour in ``store``; ends w/ ``"/"``.
+    """
+    return f"{bucket.rstrip('/')}/{store}/{dt.year}{dt.month:02d}{dt.day:02d}/{hour_dir_name(dt)}.zarr/"
+
+
+def _keep(key: str, chunks: set[str]) -> bool:
+    name = posixpath.basename(key)
+    return name in ZARR_META or name in chunks
+
+
+def list_hour(
+        client: MRMSAWSS3Client,
+        dt: datetime,
+        out_dir: str,
+        vars: List[dict] = VARS_OF_INTEREST,
+        chunks: List[str] = VEF_CHUNKS,
+        bucket: str = HRRR_BUCKET,
+    ) -> Tuple[List[str], List[str]]:
+    """
+    Remote keys of one analysis hour worth keeping + their local dst paths under ``out_dir / hour_dir_name(dt)``.
+
+    - Variables missing from this hour are skipped
+
+    Returns
+    ---
+    - ``(keys, tos)``
+    """
+
+    fs      = client.s3_file_system
+    chunks  = set(chunks)
+    sub_dir = Path(out_dir) / hour_dir_name(dt)
+
+    keys, tos = [], []
+    for var in vars:
+        root   = client._strip_protocol(hour_url(dt, var["store"], bucket)).rstrip("/") + "/"
+        prefix = f"{root}{var['level']}/{var['name']}/"
+        try:
+            found = fs.find(prefix)
+        except FileNotFoundError:
+            continue
+        for key in found:
+            if _keep(key, chunks):
+                keys.append(key)
+                tos.append(str(sub_dir / key[len(root):]))
+
+    return keys, tos
+
+
+def submit_hours(
+        client: MRMSAWSS3Client,
+        dts: List[datetime],
+        out_dir: str,
+        vars: List[dict] = VARS_OF_INTEREST,
+        chunks: List[str] = VEF_CHUNKS,
+        bucket: str = HRRR_BUCKET,
+        skip_existing: bool = True,
+        max_workers: int | None = None,
+    ) -> Tuple[BulkDownload, List[str]]:
+    """
+    List every hour concurrently, then queue all of their transfers on a single bulk download.
+
+    Params
+    ---
+    - :skip_existing: skip hours whose local dir already exists (assumed complete)
+    - :max_workers: concurrency cap for listing; transfers use ``client.max_workers``
+
+    Returns
+    ---
+    - ``(bulk, sub_dirs)``; the queued transfers + the local dir of every listed hour
+    """
+
+    if skip_existing:
+        dts = [dt for dt in dts if not (Path(out_dir) / hour_dir_name(dt)).is_dir()]
+
+    all_keys, all_tos, sub_dirs = [], [], []
+    with ThreadPoolExecutor(max_workers=max_workers or client.max_workers) as ex:
+        futures = {ex.submit(list_hour, client, dt, out_dir, vars, chunks, bucket): dt for dt in dts}
+        for future in as_completed(futures):
+            dt = futures[future]
+            try:
+                keys, tos = future.result()
+            except Exception as e:
+                print(f"[{dt}] failed: {e}")
+                continue
+            if len(keys) == 0:
+                continue
+            all_keys.extend(keys)
+            all_tos.extend(tos)
+            sub_dirs.append(str(Path(out_dir) / hour_dir_name(dt)))
+
+    for sub_dir in sub_dirs:
+        os.makedirs(sub_dir, exist_ok=True)
+
+    return client.submit_bulk_download(all_keys, all_tos), sub_dirs
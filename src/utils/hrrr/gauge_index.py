@@ -0,0 +1,299 @@
+"""
+# Gauge -> HRRR grid index
+---
+Where every gauge sits on the HRRR grid, found once per gauge network from a local copy of ``HRRR_chunk_index.zarr`` and persisted under ``data/__cache__/hrrr/gauge_index``.
+
+- Nearest grid point: ``(chunk id, in-chunk iy, ix, distance)`` + the global ``(iy, ix)``
+- Bilinear: the 4 grid points around each gauge + their weights
+- Extraction then needs no network and no KD-tree: ``values[..., iy, ix]`` or ``(values[..., nbr_iy, nbr_ix] * nbr_w).sum(-1)``
+"""
+
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from pathlib import Path
+from typing import Dict
+
+from scipy.spatial import cKDTree
+
+from src.utils.hrrr.grid import CHUNK_INDEX_FP, HRRR_CHUNK_SHAPE, chunk_ids
+
+
+class GaugeHRRRIndex:
+
+    _DEFAULT_DIR = "data/__cache__/hrrr/gauge_index"
+
+    # in-process cache; {key: index}
+    _MEM: Dict[str, 'GaugeHRRRIndex'] = {}
+
+    # npz fields; everything but ``grid_shape`` is per-gauge
+    _FIELDS = ["gauge_ids", "lat", "lon", "iy", "ix", "dist", "nbr_iy", "nbr_ix", "nbr_w"]
+
+    def __init__(
+            self,
+            gauge_ids: np.ndarray,
+            lat: np.ndarray,
+            lon: np.ndarray,
+            iy: np.ndarray,
+            ix: np.ndarray,
+            dist: np.ndarray,
+            nbr_iy: np.ndarray,
+            nbr_ix: np.ndarray,
+            nbr_w: np.ndarray,
+            grid_shape: tuple,
+            key: str,
+        ):
+        """
+        Params
+        ---
+        - :gauge_ids: ``[G]``; sorted, unique ``gauge_idx``
+        - :lat, lon: ``[G]`` gauge locations
+        - :iy, ix: ``[G]`` nearest grid point of each gauge
+        - :dist: ``[G]`` distance to it; degrees
+        - :nbr_iy, nbr_ix: ``[G, 4]`` corners of the grid cell each gauge falls in
+        - :nbr_w: ``[G, 4]`` bilinear weights of those corners; rows sum to 1
+        """
+        self.gauge_ids  = gauge_ids
+        self.lat        = lat
+        self.lon        = lon
+        self.iy         = iy
+        self.ix         = ix
+        self.dist       = dist
+        self.nbr_iy     = nbr_iy
+        self.nbr_ix     = nbr_ix
+        self.nbr_w      = nbr_w
+        self.grid_shape = tuple(int(n) for n in grid_shape)
+        self.key        = key
+
+    def __len__(self) -> int:
+        return len(self.gauge_ids)
+
+    @property
+    def chunk_id(self) -> np.ndarray:
+        """
+        ``[G]``; ``"{chunk_y}.{chunk_x}"`` of each gauge's nearest grid point
+        """
+        return chunk_ids(self.iy, self.ix)
+
+    @property
+    def chunk_iy(self) -> np.ndarray:
+        return self.iy % HRRR_CHUNK_SHAPE[0]
+
+    @property
+    def chunk_ix(self) -> np.ndarray:
+        return self.ix % HRRR_CHUNK_SHAPE[1]
+
+    @staticmethod
+    def _gauges_key(gauge_ids: np.ndarray, lat: np.ndarray, lon: np.ndarray, chunk_index_fp: str) -> str:
+        h = hashlib.sha256()
+        for a in (gauge_ids, lat, lon):
+            h.update(np.ascontiguousarray(a).tobytes())
+        h.update(str(Path(chunk_index_fp).resolve()).encode())
+        return h.hexdigest()
+
+    @staticmethod
+    def _read_grid(chunk_index_fp: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns
+        ---
+        - ``(lats, lons)``; ``[H, W]`` each, w/ ``lons`` in ``[-180, 180)``
+        """
+        with xr.open_zarr(chunk_index_fp) as chunk_index:
+            lats = np.asarray(chunk_index.latitude.values, dtype=np.float64)
+            lons = np.asarray(chunk_index.longitude.values, dtype=np.float64)
+        return lats, (lons + 180.0) % 360.0 - 180.0
+
+    @staticmethod
+    def _bilinear(
+            lats: np.ndarray,
+            lons: np.ndarray,
+            iy: np.ndarray,
+            ix: np.ndarray,
+            lat: np.ndarray,
+            lon: np.ndarray,
+        ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Fractional grid position of every gauge from a local linearization of the grid at its nearest point,
+        then the 4 corners of the cell it falls in + their bilinear weights.
+
+        Returns
+        ---
+        - ``(nbr_iy, nbr_ix, nbr_w)``; ``[G, 4]`` each, corners ordered ``(y0, x0), (y0, x1), (y1, x0), (y1, x1)``
+        """
+
+        H, W = lats.shape
+
+        # one-sided differences at the grid edges, central differences elsewhere
+        yp, ym = np.minimum(iy + 1, H - 1), np.maximum(iy - 1, 0)
+        xp, xm = np.minimum(ix + 1, W - 1), np.maximum(ix - 1, 0)
+
+        # [G, 2, 2]; d(lat, lon) / d(y, x)
+        jac = np.empty((len(iy), 2, 2), dtype=np.float64)
+        jac[:, 0, 0] = (lats[yp, ix] - lats[ym, ix]) / (yp - ym)
+        jac[:, 1, 0] = (lons[yp, ix] - lons[ym, ix]) / (yp - ym)
+        jac[:, 0, 1] = (lats[iy, xp] - lats[iy, xm]) / (xp - xm)
+        jac[:, 1, 1] = (lons[iy, xp] - lons[iy, xm]) / (xp - xm)
+
+        d   = np.stack([lat - lats[iy, ix], lon - lons[iy, ix]], axis=-1)
+        fyx = np.linalg.solve(jac, d[..., None])[..., 0]
+
+        y  = iy + fyx[:, 0]
+        x  = ix + fyx[:, 1]
+        y0 = np.clip(np.floor(y), 0, H - 2).astype(np.int64)
+        x0 = np.clip(np.floor(x), 0, W - 2).astype(np.int64)
+        ty = np.clip(y - y0, 0.0, 1.0)
+        tx = np.clip(x - x0, 0.0, 1.0)
+
+        nbr_iy = np.stack([y0, y0, y0 + 1, y0 + 1], axis=-1)
+        nbr_ix = np.stack([x0, x0 + 1, x0, x0 + 1], axis=-1)
+        nbr_w  = np.stack([(1 - ty) * (1 - tx), (1 - ty) * tx, ty * (1 - tx), ty * tx], axis=-1)
+        return nbr_iy, nbr_ix, nbr_w
+
+    @classmethod
+    def for_gauges(
+            cls,
+            gauge_ids: np.ndarray,
+            lat: np.ndarray,
+            lon: np.ndarray,
+            chunk_index_fp: str = CHUNK_INDEX_FP,
+            root: str = _DEFAULT_DIR,
+        ) -> 'GaugeHRRRIndex':
+        """
+        Index for these gauges on the grid in ``chunk_index_fp`` (a local copy; see ``sync_chunk_index``); memory -> disk -> build.
+        """
+
+        gauge_ids = np.asarray(gauge_ids, dtype=np.int64)
+        order     = np.argsort(gauge_ids, kind="stable")
+        gauge_ids = gauge_ids[order]
+        lat       = np.asarray(lat, dtype=np.float64)[order]
+        lon       = np.asarray(lon, dtype=np.float64)[order]
+        lon       = (lon + 180.0) % 360.0 - 180.0
+        assert len(np.unique(gauge_ids)) == len(gauge_ids), "Error: gauge ids must be unique"
+
+        key = cls._gauges_key(gauge_ids, lat, lon, chunk_index_fp)
+
+        # 1. in-memory
+        if key in cls._MEM:
+            return cls._MEM[key]
+
+        # 2. on-disk
+        fp = Path(root) / f"{key}.npz"
+        if fp.is_file():
+            try:
+                with np.load(fp, allow_pickle=False) as npz:
+                    index = cls(*[npz[f] for f in cls._FIELDS], tuple(npz["grid_shape"]), key)
+                cls._MEM[key] = index
+                return index
+            except Exception:
+                pass
+
+        # 3. build; the only place the grid is read or a tree is built
+        lats, lons = cls._read_grid(chunk_index_fp)
+        tree       = cKDTree(np.column_stack([lats.ravel(), lons.ravel()]))
+        dist, flat = tree.query(np.column_stack([lat, lon]), k=1)
+        iy, ix     = (a.astype(np.int64) for a in np.unravel_index(flat, lats.shape))
+
+        nbr_iy, nbr_ix, nbr_w = cls._bilinear(lats, lons, iy, ix, lat, lon)
+        index = cls(gauge_ids, lat, lon, iy, ix, dist.astype(np.float64), nbr_iy, nbr_ix, nbr_w, lats.shape, key)
+
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        tmp_fp = fp.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_fp, "wb") as f:
+            np.savez(
+                f,
+                **{field: getattr(index, field) for field in cls._FIELDS},
+                grid_shape=np.asarray(index.grid_shape, dtype=np.int64),
+            )
+        os.replace(tmp_fp, fp)
+
+        cls._MEM[key] = index
+        return index
+
+    @classmethod
+    def for_frame(
+            cls,
+            df: pd.DataFrame,
+            chunk_index_fp: str = CHUNK_INDEX_FP,
+            root: str = _DEFAULT_DIR,
+        ) -> 'GaugeHRRRIndex':
+        """
+        Index for every located gauge in a frame w/ ``gauge_idx``, ``lat``, ``lon`` columns; first location per gauge wins.
+        """
+
+        g = df[["gauge_idx", "lat", "lon"]].dropna().drop_duplicates("gauge_idx")
+        return cls.for_gauges(
+            g["gauge_idx"].to_numpy(dtype=np.int64),
+            g["lat"].to_numpy(dtype=np.float64),
+            g["lon"].to_numpy(dtype=np.float64),
+            chunk_index_fp,
+            root,
+        )
+
+    def positions(self, gauge_ids: np.ndarray) -> np.ndarray:
+        """
+        Returns
+        ---
+        - Position of each of ``gauge_ids`` in this index; ``-1`` for unknown gauges
+        """
+
+        gauge_ids = np.asarray(gauge_ids, dtype=np.int64)
+        pos = np.searchsorted(self.gauge_ids, gauge_ids)
+        pos = np.clip(pos, 0, max(len(self.gauge_ids) - 1, 0))
+        ok  = (len(self.gauge_ids) > 0) & (self.gauge_ids[pos] == gauge_ids)
+        return np.where(ok, pos, -1)
+
+    def table(self) -> pd.DataFrame:
+        """
+        Returns
+        ---
+        - One row per gauge: ``gauge_idx, lat, lon, chunk_id, chunk_iy, chunk_ix, iy, ix, dist``
+        """
+
+        return pd.DataFrame({
+            "gauge_idx": self.gauge_ids,
+            "lat": self.lat,
+            "lon": self.lon,
+            "chunk_id": self.chunk_id,
+            "chunk_iy": self.chunk_iy,
+            "chunk_ix": self.chunk_ix,
+            "iy": self.iy,
+            "ix": self.ix,
+            "dist": self.dist,
+        })
+
+    def gather(self, values: np.ndarray) -> np.ndarray:
+        """
+        Params
+        ---
+        - :values: ``[..., H, W]`` on the full HRRR grid
+
+        Returns
+        ---
+        - ``[..., G]``; every gauge's nearest grid point value
+        """
+
+        values = np.asarray(values)
+        assert values.shape[-2:] == self.grid_shape, (
+            f"Error: grid shape {values.shape[-2:]} does not match index {self.grid_shape}"
+        )
+        return values[..., self.iy, self.ix]
+
+    def interp(self, values: np.ndarray) -> np.ndarray:
+        """
+        Params
+        ---
+        - :values: ``[..., H, W]`` on the full HRRR grid
+
+        Returns
+        ---
+        - ``[..., G]``; every gauge's bilinearly interpolated value
+        """
+
+        values = np.asarray(values)
+        assert values.shape[-2:] == self.grid_shape, (
+            f"Error: grid shape {values.shape[-2:]} does not match index {self.grid_shape}"
+        )
+        return (values[..., self.nbr_iy, self.nbr_ix] * self.nbr_w).sum(axis=-1)
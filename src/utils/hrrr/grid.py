@@ -0,0 +1,61 @@
+"""
+# HRRR grid
+---
+Layout of the HRRR zarr archive (``s3://hrrrzarr``) + a local copy of its chunk index.
+
+- Every 2D field is a ``[1059, 1799]`` Lambert conformal grid split into ``150 x 150`` chunks
+- A chunk is addressed by ``"{chunk_y}.{chunk_x}"`` (e.g., ``"4.1"``), which is also its key in each array's zarr dir
+- ``HRRR_chunk_index.zarr`` holds the ``latitude``/``longitude`` of every grid point
+"""
+
+import os
+import shutil
+import numpy as np
+
+from pathlib import Path
+
+from src.utils.mrms.mrms import MRMSAWSS3Client
+
+
+HRRR_SHAPE       = (1059, 1799)
+HRRR_CHUNK_SHAPE = (150, 150)
+
+CHUNK_INDEX_URL = "s3://hrrrzarr/grid/HRRR_chunk_index.zarr/"
+CHUNK_INDEX_FP  = "data/hrrr-grid/HRRR_chunk_index.zarr"
+
+
+def chunk_ids(iy: np.ndarray, ix: np.ndarray) -> np.ndarray:
+    """
+    Returns
+    ---
+    - ``"{chunk_y}.{chunk_x}"`` of the chunk each grid point ``(iy, ix)`` falls in
+    """
+    cy = np.asarray(iy) // HRRR_CHUNK_SHAPE[0]
+    cx = np.asarray(ix) // HRRR_CHUNK_SHAPE[1]
+    return np.char.add(np.char.add(cy.astype(str), "."), cx.astype(str))
+
+
+def sync_chunk_index(dst: str = CHUNK_INDEX_FP, client: MRMSAWSS3Client | None = None) -> str:
+    """
+    Copy ``HRRR_chunk_index.zarr`` -> ``dst`` once; later calls are a no-op.
+
+    Params
+    ---
+    - :client: any client w/ an ``fsspec`` filesystem; defaults to an anonymous S3 client
+
+    Returns
+    ---
+    - ``dst``
+    """
+
+    if Path(dst).is_dir():
+        return dst
+
+    client = client or MRMSAWSS3Client()
+
+    # download next to dst, then move into place so a partial copy is never mistaken for a complete one
+    tmp_dst = f"{dst}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dst, ignore_errors=True)
+    client.download(CHUNK_INDEX_URL, tmp_dst, recursive=True)
+    os.replace(tmp_dst, dst)
+    return dst
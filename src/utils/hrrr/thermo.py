@@ -0,0 +1,501 @@
+"""
+# Derived HRRR environment fields
+---
+The derived (``*``) fields of ``dataset.md``, ported from ``zarr.ipynb`` / ``env_var_test.ipynb`` to plain NumPy.
+
+- Every function takes + returns ``[N]`` arrays in SI units (K, Pa, m, m/s) unless noted; no per-row Python loops
+- Iterative solvers run a fixed number of steps; converged / invalid elements are masked out of further updates
+- ``derive`` computes every field for a frame of ``"{level}_{name}"`` columns, ``chunk_size`` rows at a time
+"""
+
+import numpy as np
+import pandas as pd
+
+from typing import Dict
+
+
+G      = 9.81       # m/s^2
+G0     = 9.80665    # m/s^2; used for layer PW
+RD     = 287.04     # J/(kg K)
+CP     = 1005.0     # J/(kg K)
+LV     = 2.501e6    # J/kg
+EPS    = 0.622      # Rd/Rv
+KAPPA  = 0.2857     # Rd/Cp
+C_TO_K = 273.15
+
+P_500, P_700, P_850 = 50000.0, 70000.0, 85000.0
+
+# wet-bulb psychrometric constant; 1/K
+_PSY_A = 6.6e-4
+
+
+# ------------------------------------------------------------------
+# moisture
+# ------------------------------------------------------------------
+
+def saturation_vapor_pressure(T: np.ndarray) -> np.ndarray:
+    """
+    Bolton (1980); ``T`` in K, returns Pa.
+    """
+    T_C = np.asarray(T, dtype=np.float64) - C_TO_K
+    return 611.2 * np.exp(17.67 * T_C / (T_C + 243.5))
+
+
+def mixing_ratio(e: np.ndarray, p: np.ndarray) -> np.ndarray:
+    """
+    kg/kg from vapor pressure ``e`` and pressure ``p`` (same units).
+    """
+    return EPS * e / (p - e)
+
+
+def relative_humidity(T: np.ndarray, Td: np.ndarray) -> np.ndarray:
+    """
+    Magnus (``A=17.625, B=243.04``); %, clipped to ``[0, 100]``.
+    """
+    A, B = 17.625, 243.04
+    Tc, Tdc = np.asarray(T) - C_TO_K, np.asarray(Td) - C_TO_K
+    return np.clip(100 * np.exp(A * Tdc / (B + Tdc) - A * Tc / (B + Tc)), 0, 100)
+
+
+def equivalent_potential_temperature(p: np.ndarray, T: np.ndarray, Td: np.ndarray) -> np.ndarray:
+    """
+    Bolton (1980) eq. 39; same formulation as ``metpy.calc.equivalent_potential_temperature``.
+    """
+
+    p, T, Td = (np.asarray(a, dtype=np.float64) for a in (p, T, Td))
+    e    = saturation_vapor_pressure(Td)
+    r    = mixing_ratio(e, p)
+    t_l  = 56 + 1.0 / (1.0 / (Td - 56) + np.log(T / Td) / 800.0)
+    th_l = T * (100000.0 / (p - e)) ** KAPPA * (T / t_l) ** (0.28 * r)
+    return th_l * np.exp(r * (1 + 0.448 * r) * (3036.0 / t_l - 1.78))
+
+
+def wet_bulb_temperature(T: np.ndarray, Td: np.ndarray, p: np.ndarray, n_iter: int = 8, tol: float = 0.05) -> np.ndarray:
+    """
+    Psychrometric wet-bulb temperature via Newton-Raphson; K.
+
+    - Exactly ``n_iter`` vectorized steps; an element stops updating once its step is below ``tol``
+      instead of the whole array iterating until the slowest element converges
+    """
+
+    T, Td = np.asarray(T, dtype=np.float64), np.asarray(Td, dtype=np.float64)
+    p     = np.broadcast_to(np.asarray(p, dtype=np.float64), T.shape)
+
+    e_actual = saturation_vapor_pressure(Td)
+    Tw       = 0.5 * (T + Td)
+    active   = np.isfinite(Tw) & np.isfinite(p)
+
+    for _ in range(n_iter):
+        e_sat = saturation_vapor_pressure(Tw)
+        T_C   = Tw - C_TO_K
+        deriv = e_sat * 17.67 * 243.5 / (T_C + 243.5) ** 2 + _PSY_A * p
+        delta = (e_sat - _PSY_A * p * (T - Tw) - e_actual) / deriv
+        Tw    = np.where(active, Tw - delta, Tw)
+        active &= np.abs(delta) >= tol
+
+    return np.clip(Tw, Td, T)
+
+
+def wet_bulb_stull(T: np.ndarray, Td: np.ndarray) -> np.ndarray:
+    """
+    Closed-form wet-bulb temperature, Stull (2011); K.
+    """
+    T_C = np.asarray(T, dtype=np.float64) - C_TO_K
+    RH  = np.clip(100.0 * saturation_vapor_pressure(Td) / saturation_vapor_pressure(T), 1.0, 100.0)
+    Tw_C = (
+        T_C * np.arctan(0.151977 * np.sqrt(RH + 8.313659))
+        + np.arctan(T_C + RH) - np.arctan(RH - 1.676331)
+        + 0.00391838 * RH ** 1.5 * np.arctan(0.023101 * RH) - 4.686035
+    )
+    return Tw_C + C_TO_K
+
+
+def lowest_100mb_mean_mixing_ratio(
+        p_sfc: np.ndarray,
+        Td_sfc: np.ndarray,
+        Td_925: np.ndarray,
+        Td_850: np.ndarray,
+        Td_700: np.ndarray,
+    ) -> np.ndarray:
+    """
+    Mean mixing ratio of the surface + every isobaric level within 100 mb above it; g/kg.
+    """
+
+    def _w(p_hpa, Td):
+        e = 0.01 * saturation_vapor_pressure(Td)
+        return 1000 * mixing_ratio(e, p_hpa)
+
+    p_sfc = np.asarray(p_sfc, dtype=np.float64) / 100.0
+    w_sum = _w(p_sfc, Td_sfc)
+    count = np.ones_like(p_sfc)
+    for p_lvl, Td in ((925.0, Td_925), (850.0, Td_850), (700.0, Td_700)):
+        m = (p_lvl < p_sfc) & (p_lvl >= p_sfc - 100.0)
+        w_sum += np.where(m, _w(p_lvl, Td), 0.0)
+        count += m
+    return w_sum / count
+
+
+def layer_pw(
+        p_sfc: np.ndarray,
+        Td_sfc: np.ndarray,
+        Td_925: np.ndarray,
+        Td_850: np.ndarray,
+        Td_700: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Trapezoidal precipitable water over sfc-850 mb and sfc-700 mb, skipping levels below ground; mm.
+
+    Returns
+    ---
+    - ``(sfc_850_pw, sfc_700_pw)``
+    """
+
+    p_sfc = np.asarray(p_sfc, dtype=np.float64) / 100.0
+
+    def _q(p_hpa, Td):
+        return mixing_ratio(0.01 * saturation_vapor_pressure(Td), p_hpa)
+
+    q_sfc, q_925, q_850, q_700 = _q(p_sfc, Td_sfc), _q(925.0, Td_925), _q(850.0, Td_850), _q(700.0, Td_700)
+
+    def _pw(q0, q1, p0, p1):
+        return (q0 + q1) / 2 * (p0 - p1) * 100 / G0
+
+    sfc_925 = _pw(q_sfc, q_925, p_sfc, 925.0)
+    s925_850 = _pw(q_925, q_850, 925.0, 850.0)
+    s850_700 = _pw(q_850, q_700, 850.0, 700.0)
+    sfc_850 = _pw(q_sfc, q_850, p_sfc, 850.0)
+    sfc_700 = _pw(q_sfc, q_700, p_sfc, 700.0)
+
+    pw_850 = np.select([p_sfc >= 925, p_sfc >= 850], [sfc_925 + s925_850, sfc_850], 0.0)
+    pw_700 = np.select(
+        [p_sfc >= 925, p_sfc >= 850, p_sfc >= 700],
+        [sfc_925 + s925_850 + s850_700, sfc_850 + s850_700, sfc_700],
+        0.0,
+    )
+    return pw_850, pw_700
+
+
+def layer_rh(
+        T_sfc: np.ndarray, Td_sfc: np.ndarray,
+        Td_925: np.ndarray,
+        T_850: np.ndarray, Td_850: np.ndarray,
+        T_700: np.ndarray, Td_700: np.ndarray,
+        T_500: np.ndarray, Td_500: np.ndarray,
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Pressure-weighted (trapezoidal) mean RH; %. The 925 mb temperature is estimated as ``0.9 T_sfc + 0.1 T_850``.
+
+    Returns
+    ---
+    - ``(rh_0_3km, rh_0_5km)``
+    """
+
+    rh_sfc = relative_humidity(T_sfc, Td_sfc)
+    rh_925 = relative_humidity(0.9 * np.asarray(T_sfc) + 0.1 * np.asarray(T_850), Td_925)
+    rh_850 = relative_humidity(T_850, Td_850)
+    rh_700 = relative_humidity(T_700, Td_700)
+    rh_500 = relative_humidity(T_500, Td_500)
+
+    # layer dp (mb): sfc-925, 925-850, 850-700, 700-500
+    w  = np.array([9, 75, 150, 200])
+    s3 = w[0] * (rh_sfc + rh_925) + w[1] * (rh_925 + rh_850) + w[2] * (rh_850 + rh_700)
+    return s3 / (2 * w[:3].sum()), (s3 + w[3] * (rh_700 + rh_500)) / (2 * w.sum())
+
+
+def mean_dewpoints(Td_925: np.ndarray, Td_850: np.ndarray, Td_700: np.ndarray, Td_500: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Pressure-weighted (trapezoidal) layer-mean dewpoints; K.
+    """
+    return {
+        "925mb_700mb_DPT": (1 / 6) * Td_925 + (3 / 6) * Td_850 + (2 / 6) * Td_700,
+        "850mb_700mb_DPT": (Td_850 + Td_700) / 2,
+        "850mb_500mb_DPT": (3 / 14) * Td_850 + (1 / 2) * Td_700 + (2 / 7) * Td_500,
+    }
+
+
+# ------------------------------------------------------------------
+# stability + kinematics
+# ------------------------------------------------------------------
+
+def low_level_lapse_rate(T_850: np.ndarray, T_700: np.ndarray, z_850: np.ndarray, z_700: np.ndarray) -> np.ndarray:
+    """
+    850-700 mb lapse rate; K/km, positive when temperature decreases w/ height.
+    """
+    return (T_850 - T_700) / (z_700 - z_850) * 1000
+
+
+def mean_wind_850_700(u_850: np.ndarray, v_850: np.ndarray, u_700: np.ndarray, v_700: np.ndarray) -> np.ndarray:
+    """
+    Mean of the 850 mb and 700 mb wind speeds; m/s.
+    """
+    return (np.hypot(u_850, v_850) + np.hypot(u_700, v_700)) / 2
+
+
+def convective_warm_cloud_depth(z_freezing: np.ndarray, z_lcl: np.ndarray) -> np.ndarray:
+    """
+    Freezing level - LCL height, floored at 0; m.
+    """
+    return np.maximum(0, z_freezing - z_lcl)
+
+
+def _interp3(x: np.ndarray, xp: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """
+    Row-wise ``np.interp`` w/ 3 knots per row: ``x`` ``[N, S]``, ``xp``/``fp`` ``[N, 3]`` (``xp`` sorted per row).
+    """
+
+    x0, x1, x2 = (xp[:, [k]] for k in range(3))
+    f0, f1, f2 = (fp[:, [k]] for k in range(3))
+
+    # clamp outside the knots like np.interp; zero-width segments take their right knot
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lo = np.where(x1 > x0, f0 + (x - x0) / (x1 - x0) * (f1 - f0), f1)
+        hi = np.where(x2 > x1, f1 + (x - x1) / (x2 - x1) * (f2 - f1), f2)
+    return np.select([x < x0, x <= x1, x <= x2], [f0, lo, hi], f2)
+
+
+def lcl_lfc_rh(
+        z_lcl: np.ndarray,
+        p_sfc: np.ndarray,
+        theta_e_sfc: np.ndarray,
+        Td_925: np.ndarray,
+        T_850: np.ndarray, Td_850: np.ndarray, z_850: np.ndarray,
+        T_700: np.ndarray, Td_700: np.ndarray, z_700: np.ndarray,
+        n_samples: int = 5,
+    ) -> np.ndarray:
+    """
+    Mean RH between the LCL and an LFC estimated from surface vs. 850/700 mb theta-e; %.
+
+    - Kept as in ``zarr.ipynb`` (the ``LCL_LFC_RH`` cell) so the column does not change: Tetens vapor pressure, and
+      ``theta_e_sfc`` (full Bolton, see ``equivalent_potential_temperature``) is compared against a simplified
+      ``theta * exp(Lv r / (Cp T))`` at 850/700 mb; the two differ by a few K, which biases the LFC upward
+    """
+
+    def _svp(T):
+        T_C = np.asarray(T, dtype=np.float64) - C_TO_K
+        return 610.78 * np.exp(17.27 * T_C / (T_C + 237.3))
+
+    def _rh(T, Td):
+        return np.clip(_svp(Td) / _svp(T), 0, 1)
+
+    def _theta_e(T, Td, p_hpa):
+        e = _svp(Td)
+        r = EPS * e / (p_hpa * 100 - e + 1e-10)
+        return T * (1000 / p_hpa) ** 0.286 * np.exp(2.5e6 * r / (CP * T))
+
+    rh_850 = _rh(T_850, Td_850)
+    rh_700 = _rh(T_700, Td_700)
+
+    # rough hypsometric 925 mb height + temperature
+    h_925  = np.maximum(0, (np.asarray(p_sfc) / 100 - 925) * 8)
+    rh_925 = _rh(np.asarray(Td_925) + 4, Td_925)
+
+    th_850 = _theta_e(T_850, Td_850, 850)
+    th_700 = _theta_e(T_700, Td_700, 700)
+    denom  = th_700 - th_850
+    denom  = np.where(np.abs(denom) < 0.1, 0.1, denom)
+    frac   = np.clip((theta_e_sfc - th_850) / denom, 0, 1)
+    z_lfc  = np.maximum(z_850 + frac * (z_700 - z_850), z_lcl)
+
+    fracs    = np.linspace(0, 1, n_samples)[None, :]
+    sample_h = np.asarray(z_lcl)[:, None] + fracs * (z_lfc - z_lcl)[:, None]
+
+    h_stack  = np.column_stack([h_925, z_850, z_700])
+    rh_stack = np.column_stack([rh_925, rh_850, rh_700])
+    order    = np.argsort(h_stack, axis=1)
+    h_sorted  = np.take_along_axis(h_stack, order, axis=1)
+    rh_sorted = np.take_along_axis(rh_stack, order, axis=1)
+
+    return _interp3(sample_h, h_sorted, rh_sorted).mean(axis=1) * 100
+
+
+def dcape(
+        T_500: np.ndarray, Td_500: np.ndarray,
+        T_700: np.ndarray, Td_700: np.ndarray,
+        T_850: np.ndarray, Td_850: np.ndarray,
+        T_sfc: np.ndarray,
+        p_sfc: np.ndarray,
+        n_levels: int = 40,
+    ) -> np.ndarray:
+    """
+    DCAPE (J/kg): a saturated parcel descends from the min. wet-bulb level (500/700/850 mb) along a moist adiabat
+    to the surface; negative buoyancy is integrated over ``n_levels`` pressure steps.
+
+    - Steps over levels, vectorized over rows: ``n_levels - 1`` array passes instead of one Python loop per profile
+    """
+
+    T_500, T_700, T_850, T_sfc, p_sfc = (np.asarray(a, dtype=np.float64) for a in (T_500, T_700, T_850, T_sfc, p_sfc))
+
+    Tw = np.stack([wet_bulb_stull(T_500, Td_500), wet_bulb_stull(T_700, Td_700), wet_bulb_stull(T_850, Td_850)])
+
+    # origin; first min wins on ties (500, then 700, then 850)
+    k        = np.argmin(Tw, axis=0)
+    p_origin = np.array([P_500, P_700, P_850])[k]
+    T_parcel = np.take_along_axis(Tw, k[None, :], axis=0)[0]
+
+    ln500, ln700, ln850, ln_sfc = np.log(P_500), np.log(P_700), np.log(P_850), np.log(p_sfc)
+
+    dp  = (p_sfc - p_origin) / (n_levels - 1)
+    out = np.zeros_like(p_sfc)
+    for i in range(n_levels - 1):
+        p     = p_origin + i * dp
+        p_avg = p + 0.5 * dp
+
+        # environmental temperature; linear in log-p between the bracketing levels
+        log_p = np.log(p_avg)
+        T_env = np.select(
+            [p_avg <= P_700, p_avg <= P_850],
+            [
+                T_500 + (log_p - ln500) / (ln700 - ln500) * (T_700 - T_500),
+                T_700 + (log_p - ln700) / (ln850 - ln700) * (T_850 - T_700),
+            ],
+            T_850 + (log_p - ln850) / (ln_sfc - ln850) * (T_sfc - T_850),
+        )
+
+        # moist adiabatic descent
+        es      = saturation_vapor_pressure(T_parcel)
+        ws      = EPS * es / np.maximum(p - es, 1.0)
+        numer   = 1.0 + (LV * ws) / (RD * T_parcel)
+        denom   = 1.0 + (LV * LV * ws * EPS) / (CP * RD * T_parcel * T_parcel)
+        gamma_m = (RD * T_parcel / (p * CP)) * numer / denom
+
+        T_next  = T_parcel + gamma_m * dp
+        T_avg   = 0.5 * (T_parcel + T_next)
+
+        # virtual temperature correction
+        es_p      = saturation_vapor_pressure(T_avg)
+        ws_p      = EPS * es_p / np.maximum(p_avg - es_p, 1.0)
+        Tv_parcel = T_avg * (1.0 + 0.61 * ws_p)
+        Tv_env    = T_env * 1.01
+
+        # negative buoyancy only
+        d_Tv = Tv_parcel - Tv_env
+        rho  = p_avg / (RD * Tv_env)
+        dz   = dp / (rho * G)
+        out += np.where(d_Tv < 0, G * (-d_Tv / Tv_env) * dz, 0.0)
+
+        T_parcel = T_next
+
+    return np.maximum(out, 0.0)
+
+
+def dcape_layer(
+        T_700: np.ndarray, Td_700: np.ndarray, z_700: np.ndarray,
+        T_850: np.ndarray, z_850: np.ndarray,
+        T_sfc: np.ndarray,
+        p_sfc: np.ndarray,
+    ) -> np.ndarray:
+    """
+    Two-layer DCAPE (J/kg): the 700 mb wet-bulb parcel descends at fixed lapse rates through 700-850 mb and 850 mb-sfc.
+
+    - Ported from the layer-based ``compute_dcape`` in ``zarr.ipynb``; see ``scripts/validate_thermo.py``
+    """
+
+    Tw_700 = wet_bulb_temperature(T_700, Td_700, P_700)
+
+    dz_700_850   = z_700 - z_850
+    T_parcel_850 = Tw_700 + 6.5e-3 * dz_700_850
+
+    # surface height via the hypsometric equation
+    # NOTE: 287.05 (not RD) to match the notebook this was ported from
+    z_sfc = np.maximum(z_850 - (287.05 * 0.5 * (T_850 + T_sfc) / G) * np.log(p_sfc / P_850), 0)
+
+    dz_850_sfc   = z_850 - z_sfc
+    T_parcel_sfc = T_parcel_850 + 7.5e-3 * dz_850_sfc
+
+    T_env_1 = 0.5 * (T_700 + T_850)
+    b_1     = (T_env_1 - 0.5 * (Tw_700 + T_parcel_850)) / T_env_1
+    T_env_2 = 0.5 * (T_850 + T_sfc)
+    b_2     = (T_env_2 - 0.5 * (T_parcel_850 + T_parcel_sfc)) / T_env_2
+
+    return np.maximum(G * np.maximum(b_1, 0) * dz_700_850 + G * np.maximum(b_2, 0) * dz_850_sfc, 0)
+
+
+# ------------------------------------------------------------------
+# frame-level
+# ------------------------------------------------------------------
+
+def _derive_chunk(c: Dict[str, np.ndarray], dcape_method: str) -> Dict[str, np.ndarray]:
+
+    out = {}
+    out["surface_theta_e"] = equivalent_potential_temperature(c["surface_PRES"], c["2m_above_ground_TMP"], c["2m_above_ground_DPT"])
+    out["lowest_100mb_mean_mixing_ratio"] = lowest_100mb_mean_mixing_ratio(
+        c["surface_PRES"], c["2m_above_ground_DPT"], c["925mb_DPT"], c["850mb_DPT"], c["700mb_DPT"],
+    )
+    out.update(mean_dewpoints(c["925mb_DPT"], c["850mb_DPT"], c["700mb_DPT"], c["500mb_DPT"]))
+    out["LCL_height"] = c["level_of_adiabatic_condensation_from_sfc_HGT"]
+    out["LCL_LFC_RH"] = lcl_lfc_rh(
+        c["level_of_adiabatic_condensation_from_sfc_HGT"], c["surface_PRES"], out["surface_theta_e"], c["925mb_DPT"],
+        c["850mb_TMP"], c["850mb_DPT"], c["850mb_HGT"],
+        c["700mb_TMP"], c["700mb_DPT"], c["700mb_HGT"],
+    )
+    out["0-3km_RH"], out["0-5km_RH"] = layer_rh(
+        c["2m_above_ground_TMP"], c["2m_above_ground_DPT"], c["925mb_DPT"],
+        c["850mb_TMP"], c["850mb_DPT"], c["700mb_TMP"], c["700mb_DPT"], c["500mb_TMP"], c["500mb_DPT"],
+    )
+    if dcape_method == "layer":
+        out["DCAPE"] = dcape_layer(
+            c["700mb_TMP"], c["700mb_DPT"], c["700mb_HGT"], c["850mb_TMP"], c["850mb_HGT"],
+            c["2m_above_ground_TMP"], c["surface_PRES"],
+        )
+    else:
+        out["DCAPE"] = dcape(
+            c["500mb_TMP"], c["500mb_DPT"], c["700mb_TMP"], c["700mb_DPT"], c["850mb_TMP"], c["850mb_DPT"],
+            c["2m_above_ground_TMP"], c["surface_PRES"],
+        )
+    out["low_level_lapse_rate"] = low_level_lapse_rate(c["850mb_TMP"], c["700mb_TMP"], c["850mb_HGT"], c["700mb_HGT"])
+    out["sfc_850_pw"], out["sfc_700_pw"] = layer_pw(
+        c["surface_PRES"], c["2m_above_ground_DPT"], c["925mb_DPT"], c["850mb_DPT"], c["700mb_DPT"],
+    )
+    out["850_700_mean_wind"] = mean_wind_850_700(c["850mb_UGRD"], c["850mb_VGRD"], c["700mb_UGRD"], c["700mb_VGRD"])
+    out["convective_warm_cloud_depth"] = convective_warm_cloud_depth(
+        c["highest_tropospheric_freezing_level_HGT"], out["LCL_height"],
+    )
+    return out
+
+
+def lapse_rate_change_3hr(df: pd.DataFrame, col: str = "low_level_lapse_rate") -> pd.Series:
+    """
+    Change in ``col`` over the previous 3 rows of the same gauge (ordered by ``start_datetime_utc``); aligned to ``df.index``.
+    """
+    ordered = df.sort_values(["gauge_idx", "start_datetime_utc"])
+    return (ordered[col] - ordered.groupby("gauge_idx")[col].shift(3)).reindex(df.index)
+
+
+def derive(df: pd.DataFrame, chunk_size: int = 1 << 18, dcape_method: str = "layer") -> pd.DataFrame:
+    """
+    Every derived field of ``df`` (HRRR ``"{level}_{name}"`` columns), ``chunk_size`` rows at a time.
+
+    Params
+    ---
+    - :dcape_method: ``"layer"`` (``dcape_layer``; the notebook's layer-based ``compute_dcape``) or ``"integrated"`` (``dcape``)
+
+    Returns
+    ---
+    - A frame of derived columns aligned to ``df.index``; ``3hr_lapse_rate_change`` only if ``df`` has ``gauge_idx`` + ``start_datetime_utc``
+    """
+
+    assert dcape_method in ("layer", "integrated"), f"Error: unknown dcape_method: {dcape_method}"
+
+    cols = [
+        "surface_PRES", "2m_above_ground_TMP", "2m_above_ground_DPT",
+        "925mb_DPT", "850mb_TMP", "850mb_DPT", "850mb_HGT", "700mb_TMP", "700mb_DPT", "700mb_HGT", "500mb_TMP", "500mb_DPT",
+        "850mb_UGRD", "850mb_VGRD", "700mb_UGRD", "700mb_VGRD",
+        "level_of_adiabatic_condensation_from_sfc_HGT", "highest_tropospheric_freezing_level_HGT",
+    ]
+    missing = [c for c in cols if c not in df.columns]
+    assert len(missing) == 0, f"Error: missing columns: {missing}"
+
+    arrays = {c: df[c].to_numpy(dtype=np.float64) for c in cols}
+
+    parts = []
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for i0 in range(0, len(df), chunk_size):
+            parts.append(_derive_chunk({c: a[i0:i0 + chunk_size] for c, a in arrays.items()}, dcape_method))
+
+    if len(parts) == 0:
+        return pd.DataFrame(index=df.index)
+
+    out = pd.DataFrame({k: np.concatenate([p[k] for p in parts]) for k in parts[0]}, index=df.index)
+    if {"gauge_idx", "start_datetime_utc"}.issubset(df.columns):
+        out["3hr_lapse_rate_change"] = lapse_rate_change_3hr(df.assign(low_level_lapse_rate=out["low_level_lapse_rate"]))
+    return out
@@ -0,0 +1,43 @@
+"""
+# HRRR variables of interest
+---
+The ``(name, level, store)`` of every HRRR analysis field extracted at the gauges.
+
+- ``store`` is the top-level prefix the field lives under in ``s3://hrrrzarr``: ``sfc`` or ``prs``
+- A field's output column is ``"{level}_{name}"``
+"""
+
+
+VARS_OF_INTEREST = [
+    {"name": "DPT", "level": "2m_above_ground", "store": "sfc"},
+    {"name": "PWAT", "level": "entire_atmosphere_single_layer", "store": "sfc"},
+    {"name": "HGT", "level": "level_of_adiabatic_condensation_from_sfc", "store": "sfc"},
+    {"name": "HGT", "level": "highest_tropospheric_freezing_level", "store": "sfc"},
+    {"name": "APCP", "level": "surface", "store": "sfc"},
+    {"name": "DPT", "level": "925mb", "store": "sfc"},
+    {"name": "DPT", "level": "850mb", "store": "sfc"},
+    {"name": "DPT", "level": "700mb", "store": "sfc"},
+    {"name": "DPT", "level": "500mb", "store": "sfc"},
+    {"name": "UGRD", "level": "850mb", "store": "sfc"},
+    {"name": "VGRD", "level": "850mb", "store": "sfc"},
+    {"name": "UGRD", "level": "700mb", "store": "sfc"},
+    {"name": "VGRD", "level": "700mb", "store": "sfc"},
+    {"name": "TMP", "level": "2m_above_ground", "store": "sfc"},
+    {"name": "PRES", "level": "surface", "store": "sfc"},
+    {"name": "HGT", "level": "700mb", "store": "sfc"},
+    {"name": "HGT", "level": "850mb", "store": "sfc"},
+    {"name": "TMP", "level": "700mb", "store": "sfc"},
+    {"name": "TMP", "level": "850mb", "store": "sfc"},
+    {"name": "TMP", "level": "500mb", "store": "sfc"},
+    {"name": "SPFH", "level": "1000mb", "store": "prs"},
+    {"name": "SPFH", "level": "925mb",  "store": "prs"},
+    {"name": "SPFH", "level": "850mb",  "store": "prs"},
+    {"name": "SPFH", "level": "700mb",  "store": "prs"},
+    {"name": "RH",   "level": "925mb",  "store": "prs"},
+    {"name": "RH",   "level": "850mb",  "store": "prs"},
+    {"name": "RH",   "level": "700mb",  "store": "prs"},
+]
+
+
+def column_name(var: dict) -> str:
+    return var["level"] + "_" + var["name"]
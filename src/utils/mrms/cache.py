@@ -0,0 +1,197 @@
+"""
+# Persistent MRMS grid cache
+---
+Decoded (optionally cropped) MRMS grids, stored on disk so re-runs never touch S3.
+
+- key: ``sha256(product | valid datetime | bbox)``
+- value: one uncompressed ``.npz`` per grid (``values``, ``latitude``, ``longitude``, ``time``)
+- index: ``sqlite`` table w/ size, mtime, checksum and last access time of every entry
+    - entries are evicted least-recently-used first once ``max_bytes`` is exceeded
+    - the checksum is taken once at write time; a hit only re-hashes the file if its size/mtime changed since,
+      and a mismatch (or a file that fails to decode) drops the entry and is treated as a miss
+    - ``last_access`` is only rewritten once it is ``_TOUCH_S`` stale, so hot reads stay read-only
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import zipfile
+import numpy as np
+
+from pathlib import Path
+from datetime import datetime
+from contextlib import closing, contextmanager
+
+from src.utils.mrms.grid import BoundingBox, MRMSGrid
+
+
+class MRMSGridCache:
+
+    _DEFAULT_DIR       = "data/__cache__/mrms/grids"
+    _DEFAULT_MAX_BYTES = 20 * 2**30
+
+    # LRU resolution; a hit within this many seconds of the last recorded access does not write
+    _TOUCH_S = 60.0
+
+    def __init__(self, root: str = _DEFAULT_DIR, max_bytes: int = _DEFAULT_MAX_BYTES):
+        self.root      = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._session() as con:
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS entries (
+                    key         TEXT PRIMARY KEY,
+                    product     TEXT NOT NULL,
+                    valid_time  TEXT NOT NULL,
+                    bbox        TEXT NOT NULL,
+                    path        TEXT NOT NULL,
+                    nbytes      INTEGER NOT NULL,
+                    sha256      TEXT NOT NULL,
+                    last_access REAL NOT NULL,
+                    mtime_ns    INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            # indexes written before ``mtime_ns``; their entries get verified (once) on their next hit
+            if "mtime_ns" not in {r[1] for r in con.execute("PRAGMA table_info(entries)")}:
+                con.execute("ALTER TABLE entries ADD COLUMN mtime_ns INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self) -> sqlite3.Connection:
+        # NOTE: a fresh connection per op keeps the cache safe to share w/ process-pool workers
+        return sqlite3.connect(str(self.root / "index.sqlite"), timeout=60)
+
+    @contextmanager
+    def _session(self):
+        """
+        One transaction on a fresh connection; committed (or rolled back) and closed on exit.
+        """
+        with closing(self._connect()) as con, con:
+            yield con
+
+    @staticmethod
+    def _bbox_str(bbox: BoundingBox | None) -> str:
+        return "CONUS" if bbox is None else ",".join(f"{v:.6f}" for v in bbox.to_tuple())
+
+    @staticmethod
+    def make_key(product: str, valid_time: datetime, bbox: BoundingBox | None = None) -> str:
+        s = f"{product}|{valid_time.isoformat()}|{MRMSGridCache._bbox_str(bbox)}"
+        return hashlib.sha256(s.encode()).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.npz"
+
+    @staticmethod
+    def _sha256(fp: Path) -> str:
+        return hashlib.sha256(fp.read_bytes()).hexdigest()
+
+    def _drop(self, con: sqlite3.Connection, key: str, path: str) -> None:
+        con.execute("DELETE FROM entries WHERE key = ?", (key,))
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def get(self, product: str, valid_time: datetime, bbox: BoundingBox | None = None) -> MRMSGrid | None:
+        """
+        Returns
+        ---
+        - The cached ``MRMSGrid``, or ``None`` on a miss / failed integrity check.
+        """
+
+        key = self.make_key(product, valid_time, bbox)
+        with self._session() as con:
+
+            row = con.execute(
+                "SELECT path, nbytes, sha256, mtime_ns, last_access FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            path, nbytes, sha256, mtime_ns, last_access = row
+            fp = Path(path)
+            try:
+                st = fp.stat()
+            except FileNotFoundError:
+                self._drop(con, key, path)
+                return None
+
+            # only a file touched since it was written pays for a full checksum
+            if (st.st_size, st.st_mtime_ns) != (nbytes, mtime_ns):
+                if st.st_size != nbytes or self._sha256(fp) != sha256:
+                    self._drop(con, key, path)
+                    return None
+                con.execute("UPDATE entries SET mtime_ns = ? WHERE key = ?", (st.st_mtime_ns, key))
+
+            now = time.time()
+            if now - last_access >= self._TOUCH_S:
+                con.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+
+        try:
+            with np.load(fp) as npz:
+                return MRMSGrid(
+                    values    = npz["values"],
+                    latitude  = npz["latitude"],
+                    longitude = npz["longitude"],
+                    time      = npz["time"][()],
+                )
+        except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile):
+            with self._session() as con:
+                self._drop(con, key, path)
+            return None
+
+    def contains(self, product: str, valid_time: datetime, bbox: BoundingBox | None = None) -> bool:
+        key = self.make_key(product, valid_time, bbox)
+        with self._session() as con:
+            return con.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+
+    def put(self, product: str, valid_time: datetime, grid: MRMSGrid, bbox: BoundingBox | None = None) -> None:
+
+        key = self.make_key(product, valid_time, bbox)
+        fp  = self._path(key)
+        fp.parent.mkdir(parents=True, exist_ok=True)
+
+        # write -> tmp, then atomically swap in so readers never see a partial file
+        tmp_fp = fp.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_fp, "wb") as f:
+            np.savez(f, values=grid.values, latitude=grid.latitude, longitude=grid.longitude, time=grid.time)
+        sha256 = self._sha256(tmp_fp)
+        os.replace(tmp_fp, fp)
+        st = fp.stat()
+
+        with self._session() as con:
+            con.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    product,
+                    valid_time.isoformat(),
+                    self._bbox_str(bbox),
+                    str(fp),
+                    st.st_size,
+                    sha256,
+                    time.time(),
+                    st.st_mtime_ns,
+                ),
+            )
+            self._evict(con)
+
+    def _evict(self, con: sqlite3.Connection) -> None:
+        """
+        Drop least-recently-used entries until the cache fits in ``max_bytes``.
+        """
+
+        total = con.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, path, nbytes in con.execute("SELECT key, path, nbytes FROM entries ORDER BY last_access ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._drop(con, key, path)
+            total -= nbytes
+
+    def size(self) -> int:
+        with self._session() as con:
+            return con.execute("SELECT COALESCE(SUM(nbytes), 0) FROM entries").fetchone()[0]
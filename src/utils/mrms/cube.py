@@ -0,0 +1,143 @@
+import numpy as np
+import xarray as xr
+
+from typing import Dict, List
+
+from src.utils.mrms.grid import MRMSGrid
+
+
+class MRMSCubeWriter:
+    """
+    Assemble decoded grids -> a single time-sorted ``(time, latitude, longitude)`` cube; one variable per product.
+
+    - ``store=None``: the cube is held in memory as NumPy arrays
+    - ``store=path``: the cube is written to a zarr store, ``time_chunk`` steps at a time
+        - grids may arrive in any order; a time block is buffered until it is full and all earlier blocks are written
+        - memory is bounded by the number of blocks in flight, not the length of the range
+    """
+
+    def __init__(self, products: List[str], times: np.ndarray, store: str | None = None, time_chunk: int = 720):
+        self.products   = list(products)
+        self.times      = np.asarray(times, dtype="datetime64[ns]")
+        self.store      = store
+        self.time_chunk = int(time_chunk)
+
+        self.latitude  = None
+        self.longitude = None
+
+        # in-memory cube
+        self._arrays: Dict[str, np.ndarray] = {}
+
+        # zarr-backed cube: {block idx: ({product: block array}, n filled slots)}
+        self._blocks: Dict[int, list] = {}
+        self._block_sizes = [
+            min(self.time_chunk, len(self.times) - b0) for b0 in range(0, len(self.times), self.time_chunk)
+        ]
+        self._next_block  = 0
+        self._slots_total = {b: n * len(self.products) for b, n in enumerate(self._block_sizes)}
+
+    def _alloc(self, n_times: int) -> Dict[str, np.ndarray]:
+        shape = (n_times, len(self.latitude), len(self.longitude))
+        return {p: np.full(shape, np.nan, dtype=np.float32) for p in self.products}
+
+    def _init_geometry(self, grid: MRMSGrid) -> None:
+        self.latitude  = grid.latitude
+        self.longitude = grid.longitude
+        if self.store is None:
+            self._arrays = self._alloc(len(self.times))
+
+    def write(self, product: str, t_idx: int, grid: MRMSGrid) -> None:
+
+        if self.latitude is None:
+            self._init_geometry(grid)
+
+        assert grid.values.shape == (len(self.latitude), len(self.longitude)), (
+            f"Error: grid shape {grid.values.shape} does not match cube"
+        )
+
+        if self.store is None:
+            self._arrays[product][t_idx] = grid.values
+            return
+
+        b = t_idx // self.time_chunk
+        if b not in self._blocks:
+            self._blocks[b] = [None, 0]
+        if self._blocks[b][0] is None:
+            self._blocks[b][0] = self._alloc(self._block_sizes[b])
+        self._blocks[b][0][product][t_idx - b * self.time_chunk] = grid.values
+        self._blocks[b][1] += 1
+        self._flush_ready()
+
+    def skip(self, product: str, t_idx: int) -> None:
+        """
+        Mark a slot that will never be written (no file / failed fetch) so its block can still be flushed.
+        """
+
+        if self.store is None:
+            return
+
+        b = t_idx // self.time_chunk
+        if b not in self._blocks:
+            self._blocks[b] = [None, 0]
+        self._blocks[b][1] += 1
+        self._flush_ready()
+
+    def _block_ds(self, b: int, arrays: Dict[str, np.ndarray]) -> xr.Dataset:
+        t0 = b * self.time_chunk
+        t1 = t0 + self._block_sizes[b]
+        return xr.Dataset(
+            {p: (("time", "latitude", "longitude"), arrays[p]) for p in self.products},
+            coords={
+                "time": self.times[t0:t1],
+                "latitude": self.latitude,
+                "longitude": self.longitude,
+            },
+        )
+
+    def _flush_ready(self, force=False) -> None:
+
+        while self._next_block in self._blocks:
+
+            b = self._next_block
+            arrays, n_filled = self._blocks[b]
+            if n_filled < self._slots_total[b] and not force:
+                return
+            if self.latitude is None:
+                # nothing decoded yet; geometry unknown
+                return
+            if arrays is None:
+                arrays = self._alloc(self._block_sizes[b])
+
+            ds = self._block_ds(b, arrays)
+            if b == 0:
+                encoding = {p: {"chunks": (self.time_chunk, len(self.latitude), len(self.longitude))} for p in self.products}
+                # fixed units so appended blocks w/ finer steps aren't truncated to the first block's resolution
+                encoding["time"] = {"units": "seconds since 1970-01-01", "dtype": "int64", "chunks": (self.time_chunk,)}
+                ds.to_zarr(self.store, mode="w", encoding=encoding)
+            else:
+                ds.to_zarr(self.store, append_dim="time")
+
+            del self._blocks[b]
+            self._next_block += 1
+
+    def close(self) -> xr.Dataset | None:
+        """
+        Flush what is left and return the cube; ``None`` if nothing was ever written.
+        """
+
+        if self.latitude is None:
+            return None
+
+        if self.store is None:
+            return xr.Dataset(
+                {p: (("time", "latitude", "longitude"), self._arrays[p]) for p in self.products},
+                coords={"time": self.times, "latitude": self.latitude, "longitude": self.longitude},
+            )
+
+        # remaining blocks (incl. any never touched) are written in order
+        for b in range(self._next_block, len(self._block_sizes)):
+            if b not in self._blocks:
+                self._blocks[b] = [None, 0]
+        self._flush_ready(force=True)
+
+        return xr.open_dataset(self.store, engine="zarr", chunks=None)
@@ -1,9 +1,73 @@
 import gzip
 import eccodes
 import shutil
+import numpy as np
 import xarray as xr
 
 from pathlib import Path
+from datetime import datetime
+
+from src.utils.mrms.grid import BoundingBox, MRMSGrid, MRMSGridGeometry
+
+
+def decode_grib2_bytes(buf: bytes, bbox: BoundingBox | None = None) -> MRMSGrid:
+    """
+    Decode a single-message MRMS ``.grib2`` held in memory; no temp or ``cfgrib`` index files.
+
+    Params
+    ---
+    - :bbox: if set, crop on decode; only the rows/cols inside ``bbox`` are kept
+        - e.g., the CCRFCD extent is ~0.1% of the CONUS grid (few hundred KB vs. ~100 MB)
+    """
+
+    gid = eccodes.codes_new_from_message(buf)
+    try:
+        geometry = MRMSGridGeometry(
+            nj   = eccodes.codes_get(gid, "Nj"),
+            ni   = eccodes.codes_get(gid, "Ni"),
+            lat0 = eccodes.codes_get(gid, "latitudeOfFirstGridPointInDegrees"),
+            lat1 = eccodes.codes_get(gid, "latitudeOfLastGridPointInDegrees"),
+            lon0 = eccodes.codes_get(gid, "longitudeOfFirstGridPointInDegrees"),
+            lon1 = eccodes.codes_get(gid, "longitudeOfLastGridPointInDegrees"),
+        )
+
+        # MRMS grids are regular lat/lon, scanned row-major from the NW corner
+        values = eccodes.codes_get_values(gid).reshape(geometry.nj, geometry.ni)
+        missing_value = eccodes.codes_get(gid, "missingValue") if eccodes.codes_get(gid, "bitmapPresent") else None
+
+        time = datetime(
+            eccodes.codes_get(gid, "year"),
+            eccodes.codes_get(gid, "month"),
+            eccodes.codes_get(gid, "day"),
+            eccodes.codes_get(gid, "hour"),
+            eccodes.codes_get(gid, "minute"),
+            eccodes.codes_get(gid, "second"),
+        )
+    finally:
+        eccodes.codes_release(gid)
+
+    rows, cols = slice(None), slice(None)
+    if bbox is not None:
+        rows, cols = geometry.window(bbox)
+
+    # copy the window out so the full CONUS buffer can be freed right away
+    values = np.array(values[rows, cols], dtype=np.float32)
+    if missing_value is not None:
+        values[values == np.float32(missing_value)] = np.nan
+
+    return MRMSGrid(
+        values    = values,
+        latitude  = geometry.latitude()[rows],
+        longitude = geometry.longitude()[cols],
+        time      = np.datetime64(time, "ns"),
+    )
+
+
+def decode_grib2_gz_bytes(buf: bytes, bbox: BoundingBox | None = None) -> MRMSGrid:
+    """
+    gzip bytes (e.g., read straight from S3) -> decompress in memory -> ``MRMSGrid``.
+    """
+    return decode_grib2_bytes(gzip.decompress(buf), bbox=bbox)
 
 
 class Grib2File:
@@ -12,12 +76,15 @@ class Grib2File:
         self.path = Path(path)
         assert self.path.suffix == ".grib2"
 
+    def decode(self, bbox: BoundingBox | None = None) -> MRMSGrid:
+        return decode_grib2_bytes(self.path.read_bytes(), bbox=bbox)
+
     def to_xarray(self, engine="cfgrib") -> xr.Dataset:
         """
-        WARNING: very slow
+        WARNING: very slow; prefer ``decode()``
         """
 
-        
+
         return xr.open_dataset(str(self.path), chunks="auto",)
 
 
@@ -27,6 +94,15 @@ class ZippedGrib2File:
         self.path = Path(path)
         assert self.path.suffix == ".gz"
 
+    def decode(self, bbox: BoundingBox | None = None) -> MRMSGrid:
+        """
+        Decompress + decode in memory; nothing is written to disk.
+        """
+        return decode_grib2_gz_bytes(self.path.read_bytes(), bbox=bbox)
+
+    def to_xarray(self, bbox: BoundingBox | None = None) -> xr.Dataset:
+        return self.decode(bbox=bbox).to_xarray()
+
     def unzip(self, to_dir: str) -> Grib2File:
         to_dir = Path(to_dir)
         assert to_dir.exists(), f"Error! Bad path: {str(to_dir)}"
@@ -0,0 +1,208 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import xarray as xr
+
+from functools import lru_cache
+from typing import Tuple
+
+
+class BoundingBox:
+    """
+    A lat/lon window; longitudes may be given in either ``[-180, 180)`` or ``[0, 360)``.
+    """
+
+    def __init__(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float):
+        assert lat_min < lat_max, f"Error: expected `lat_min` < `lat_max`"
+        assert lon_min < lon_max, f"Error: expected `lon_min` < `lon_max`"
+        self.lat_min = float(lat_min)
+        self.lat_max = float(lat_max)
+        self.lon_min = float(lon_min)
+        self.lon_max = float(lon_max)
+
+    def to_tuple(self) -> Tuple[float, float, float, float]:
+        return (self.lat_min, self.lat_max, self.lon_min, self.lon_max)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BoundingBox) and self.to_tuple() == other.to_tuple()
+
+    def __hash__(self) -> int:
+        return hash(self.to_tuple())
+
+    def __repr__(self) -> str:
+        return f"BoundingBox(lat_min={self.lat_min}, lat_max={self.lat_max}, lon_min={self.lon_min}, lon_max={self.lon_max})"
+
+
+class MRMSGridGeometry:
+    """
+    Geometry of a regular MRMS lat/lon grid, as read from a GRIB2 header.
+
+    - Rows run north -> south from ``lat0``; columns run west -> east from ``lon0`` (``[0, 360)``)
+    """
+
+    # tolerance (deg) when snapping bbox edges onto grid points
+    _EPS = 1e-6
+
+    def __init__(self, nj: int, ni: int, lat0: float, lat1: float, lon0: float, lon1: float):
+        self.nj   = int(nj)
+        self.ni   = int(ni)
+        self.lat0 = float(lat0)
+        self.lat1 = float(lat1)
+        self.lon0 = float(lon0)
+        self.lon1 = float(lon1)
+
+    @property
+    def dlat(self) -> float:
+        return (self.lat0 - self.lat1) / (self.nj - 1)
+
+    @property
+    def dlon(self) -> float:
+        return (self.lon1 - self.lon0) / (self.ni - 1)
+
+    def latitude(self) -> np.ndarray:
+        return np.linspace(self.lat0, self.lat1, self.nj)
+
+    def longitude(self) -> np.ndarray:
+        return np.linspace(self.lon0, self.lon1, self.ni)
+
+    def to_tuple(self) -> tuple:
+        return (self.nj, self.ni, self.lat0, self.lat1, self.lon0, self.lon1)
+
+    def window(self, bbox: BoundingBox) -> Tuple[slice, slice]:
+        """
+        Row/column slices of every grid point inside ``bbox`` (edges inclusive, like ``.sel(slice(...))``).
+        """
+        return _window(self.to_tuple(), bbox.to_tuple())
+
+
+@lru_cache(maxsize=64)
+def _window(geometry: tuple, bbox: tuple) -> Tuple[slice, slice]:
+
+    nj, ni, lat0, lat1, lon0, lon1 = geometry
+    lat_min, lat_max, lon_min, lon_max = bbox
+    eps = MRMSGridGeometry._EPS
+
+    dlat = (lat0 - lat1) / (nj - 1)
+    dlon = (lon1 - lon0) / (ni - 1)
+
+    # -180..180 -> 0..360
+    if lon_min < 0: lon_min += 360
+    if lon_max < 0: lon_max += 360
+
+    # rows are north -> south
+    r0 = int(np.ceil((lat0 - lat_max) / dlat - eps))
+    r1 = int(np.floor((lat0 - lat_min) / dlat + eps)) + 1
+    c0 = int(np.ceil((lon_min - lon0) / dlon - eps))
+    c1 = int(np.floor((lon_max - lon0) / dlon + eps)) + 1
+
+    r0, r1 = min(max(r0, 0), nj), min(max(r1, 0), nj)
+    c0, c1 = min(max(c0, 0), ni), min(max(c1, 0), ni)
+    return slice(r0, r1), slice(c0, c1)
+
+
+class MRMSGrid:
+    """
+    A decoded MRMS field held entirely in memory.
+
+    - ``values``   : [lat, lon] ``float32`` array; missing points are ``NaN``
+    - ``latitude`` : [lat] degrees; descending (north -> south), same as ``cfgrib``
+    - ``longitude``: [lon] degrees in ``[0, 360)``, same as ``cfgrib``
+    - ``time``     : ``datetime64[ns]`` reference time of the product
+    """
+
+    # name ``cfgrib`` gives MRMS fields (no entry in the WMO parameter tables)
+    VAR_NAME = "unknown"
+
+    def __init__(self, values: np.ndarray, latitude: np.ndarray, longitude: np.ndarray, time: np.datetime64):
+        assert values.shape == (len(latitude), len(longitude)), f"Error: bad grid shape: {values.shape}"
+        self.values    = values
+        self.latitude  = latitude
+        self.longitude = longitude
+        self.time      = time
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.latitude.nbytes + self.longitude.nbytes
+
+    def to_xarray(self) -> xr.Dataset:
+        """
+        Wrap as an ``xr.Dataset`` laid out like the ``cfgrib`` output (``unknown``, ``latitude``, ``longitude``, ``time``).
+        """
+        return xr.Dataset(
+            {self.VAR_NAME: (("latitude", "longitude"), self.values)},
+            coords={
+                "time": self.time,
+                "latitude": self.latitude,
+                "longitude": self.longitude,
+            },
+        )
+
+
+# tmpfs-backed when available so "files" are just shared pages
+_SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def share_array(arr: np.ndarray, dir: str = _SHARED_DIR) -> str:
+    """
+    Copy ``arr`` -> a new memory-mapped ``.npy`` (tmpfs when available); any process can ``np.load(path, mmap_mode="r")`` it.
+
+    Returns
+    ---
+    - The buffer's path; the caller owns it and must ``os.remove`` it when done.
+    """
+
+    fd, path = tempfile.mkstemp(prefix="mrms_", suffix=".npy", dir=dir)
+    os.close(fd)
+
+    mm = np.lib.format.open_memmap(path, mode="w+", dtype=arr.dtype, shape=arr.shape)
+    mm[:] = arr
+    mm.flush()
+    del mm
+
+    return path
+
+
+class SharedGrid:
+    """
+    Picklable handle to an ``MRMSGrid`` whose values live in a memory-mapped buffer.
+
+    - Built in a worker process w/ ``from_grid``; only the buffer path + a small metadata record cross the process boundary
+    - ``to_grid`` maps the same pages in the caller (no copy) and unlinks the name; the pages are freed once the array is dropped
+    """
+
+    def __init__(self, path: str, shape: tuple, dtype: str, latitude: np.ndarray, longitude: np.ndarray, time: np.datetime64):
+        self.path      = path
+        self.shape     = shape
+        self.dtype     = dtype
+        self.latitude  = latitude
+        self.longitude = longitude
+        self.time      = time
+
+    @classmethod
+    def from_grid(cls, grid: MRMSGrid, dir: str = _SHARED_DIR) -> 'SharedGrid':
+
+        path = share_array(grid.values, dir=dir)
+        return cls(path, grid.values.shape, grid.values.dtype.str, grid.latitude, grid.longitude, grid.time)
+
+    def to_grid(self) -> MRMSGrid:
+        values = np.load(self.path, mmap_mode="r")
+        # the mapping outlives the name; nothing is left behind on disk
+        os.remove(self.path)
+        return MRMSGrid(values, self.latitude, self.longitude, self.time)
+
+    def to_grid_in(self, dir: str) -> MRMSGrid:
+        """
+        Move the buffer -> ``dir`` (e.g., a disk-backed dir) and map it from there; the shared (tmpfs) pages are freed
+        and the values stay lazily paged in from disk. The caller owns the moved file.
+        """
+        os.makedirs(dir, exist_ok=True)
+        dst = os.path.join(dir, os.path.basename(self.path))
+        shutil.move(self.path, dst)
+        return MRMSGrid(np.load(dst, mmap_mode="r"), self.latitude, self.longitude, self.time)
+
+    def discard(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,317 @@
+"""
+# MRMS bucket listing index
+---
+One listing per (product, day) prefix, parsed once into a sorted ``datetime64`` array alongside its keys.
+
+- Listings are kept in memory and persisted under ``data/__cache__/mrms/listings``
+    - prefixes for days that may still be receiving files expire after ``ttl_s``
+    - listings fetched after a day completed never change and are kept indefinitely
+- nearest/first/next lookups are a binary search over the sorted times
+    - ``match()`` resolves an entire array of target times in one ``searchsorted`` pass
+"""
+
+import os
+import time
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+from typing import Dict, List, Tuple
+from datetime import datetime, timedelta, timezone
+
+from src.utils.mrms.mrms import MRMSAWSS3Client, MRMSDomain, MRMSPath
+
+
+# ``MRMS_{PRODUCT_NAME}_{yyyymmdd}-{hhmmss}.grib2.gz``
+_SUFFIX  = ".grib2.gz"
+_DT_FMT  = "%Y%m%d-%H%M%S"
+_DT_LEN  = len("yyyymmdd-hhmmss")
+
+
+def _to_datetime64(t: datetime | np.datetime64) -> np.datetime64:
+    return np.datetime64(t, "ns")
+
+
+class MRMSListing:
+    """
+    Sorted keys + valid times for a single (product, day) prefix.
+    """
+
+    def __init__(self, keys: np.ndarray, times: np.ndarray, fetched_at: float):
+        self.keys       = keys
+        self.times      = times
+        self.fetched_at = fetched_at
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @classmethod
+    def from_keys(cls, keys: List[str], fetched_at: float | None = None) -> 'MRMSListing':
+        """
+        Parse every key's valid time in one vectorized pass; keys that don't match the MRMS file format are dropped.
+        """
+
+        keys  = np.asarray([k for k in keys if k.endswith(_SUFFIX)], dtype=object)
+        names = pd.Series(keys, dtype=object).str[-(len(_SUFFIX) + _DT_LEN):-len(_SUFFIX)]
+        times = pd.to_datetime(names, format=_DT_FMT, errors="coerce").to_numpy(dtype="datetime64[ns]")
+
+        valid = ~np.isnat(times)
+        keys, times = keys[valid], times[valid]
+
+        order = np.argsort(times, kind="stable")
+        return cls(keys[order], times[order], time.time() if fetched_at is None else fetched_at)
+
+    def _check_nonempty(self) -> None:
+        if len(self.keys) == 0:
+            raise ValueError("Received an empty list of paths.")
+
+    def nearest(self, t: datetime) -> str:
+        """
+        Key closest to ``t``; ties go to the earlier file.
+        """
+
+        self._check_nonempty()
+        t   = _to_datetime64(t)
+        idx = int(np.searchsorted(self.times, t, side="left"))
+
+        if idx == 0:
+            return self.keys[0]
+        if idx == len(self.times):
+            return self.keys[-1]
+        if (t - self.times[idx - 1]) <= (self.times[idx] - t):
+            return self.keys[idx - 1]
+        return self.keys[idx]
+
+    def first(self, t: datetime) -> str:
+        """
+        Latest key whose time is ``<= t``.
+        """
+
+        self._check_nonempty()
+        idx = int(np.searchsorted(self.times, _to_datetime64(t), side="right")) - 1
+        if idx < 0:
+            raise ValueError(
+                "No file time is ≤ start_time; cannot satisfy mode='first'."
+            )
+        return self.keys[idx]
+
+    def next(self, t: datetime) -> str:
+        """
+        Earliest key whose time is ``>= t``.
+        """
+
+        self._check_nonempty()
+        idx = int(np.searchsorted(self.times, _to_datetime64(t), side="left"))
+        if idx >= len(self.times):
+            raise ValueError(
+                "No file time is ≥ start_time; cannot satisfy mode='next'."
+            )
+        return self.keys[idx]
+
+    @classmethod
+    def concat(cls, listings: List['MRMSListing']) -> 'MRMSListing':
+        listings = [l for l in listings if len(l) > 0]
+        if not listings:
+            return cls(np.asarray([], dtype=object), np.asarray([], dtype="datetime64[ns]"), time.time())
+        keys  = np.concatenate([l.keys for l in listings])
+        times = np.concatenate([l.times for l in listings])
+        order = np.argsort(times, kind="stable")
+        return cls(keys[order], times[order], min(l.fetched_at for l in listings))
+
+    def match(
+            self, 
+            targets: np.ndarray, 
+            mode="nearest", 
+            tolerance: timedelta | None = None,
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Vectorized ``select`` for many target times at once.
+
+        Params
+        ---
+        - :targets: array-like of ``datetime64`` / ``datetime``
+        - :mode: {"nearest", "first", "next"}; same semantics as ``select``
+        - :tolerance: max allowed ``|file time - target|``; matches further away are reported as misses
+
+        Returns
+        ---
+        - ``(keys, times, hit)``; per target, the matched key (``None`` on a miss), its time (``NaT`` on a miss) and a ``bool`` hit mask
+        """
+
+        t = np.asarray(targets, dtype="datetime64[ns]").ravel()
+        n = len(self.times)
+
+        keys  = np.full(len(t), None, dtype=object)
+        times = np.full(len(t), np.datetime64("NaT"), dtype="datetime64[ns]")
+        if n == 0 or len(t) == 0:
+            return keys, times, np.zeros(len(t), dtype=bool)
+
+        ts = self.times.view(np.int64)
+        tt = t.view(np.int64)
+        mode = (mode or "nearest").lower()
+
+        if mode == "nearest":
+            right = np.searchsorted(ts, tt, side="left")
+            left  = right - 1
+            lc, rc = np.clip(left, 0, n - 1), np.clip(right, 0, n - 1)
+            big   = np.iinfo(np.int64).max
+            d_l   = np.where(left >= 0, tt - ts[lc], big)
+            d_r   = np.where(right < n, ts[rc] - tt, big)
+            # ties go to the earlier file
+            idx   = np.where(d_l <= d_r, lc, rc)
+            hit   = np.ones(len(t), dtype=bool)
+        elif mode == "first":
+            idx = np.searchsorted(ts, tt, side="right") - 1
+            hit = idx >= 0
+        elif mode == "next":
+            idx = np.searchsorted(ts, tt, side="left")
+            hit = idx < n
+        else:
+            raise ValueError(f"Unrecognized mode '{mode}'. "
+                             "Choose 'nearest', 'first', or 'next'.")
+
+        idx = np.clip(idx, 0, n - 1)
+        hit &= ~np.isnat(t)
+        if tolerance is not None:
+            hit &= np.abs(ts[idx] - tt) <= np.timedelta64(tolerance, "ns").astype(np.int64)
+
+        keys[hit]  = self.keys[idx[hit]]
+        times[hit] = self.times[idx[hit]]
+        return keys, times, hit
+
+    def select(self, t: datetime, mode="nearest") -> str:
+
+        mode = (mode or "nearest").lower()
+        if mode == "nearest":
+            return self.nearest(t)
+        elif mode == "first":
+            return self.first(t)
+        elif mode == "next":
+            return self.next(t)
+        else:
+            raise ValueError(f"Unrecognized mode '{mode}'. "
+                             "Choose 'nearest', 'first', or 'next'.")
+
+
+class MRMSListingIndex:
+    """
+    Fetch-once, persisted listings of ``CONUS/{product}/{yyyymmdd}`` prefixes.
+    """
+
+    _DEFAULT_DIR = "data/__cache__/mrms/listings"
+
+    def __init__(self, client: MRMSAWSS3Client, root: str = _DEFAULT_DIR, ttl_s: float = 600.0):
+        """
+        Params
+        ---
+        - :ttl_s: max age (s) of a listing for a day that may still be receiving files
+        """
+        self.client = client
+        self.root   = Path(root)
+        self.ttl_s  = ttl_s
+        self._mem: Dict[Tuple[str, str], MRMSListing] = {}
+
+    def _path(self, product: str, yyyymmdd: str) -> Path:
+        return self.root / product / f"{yyyymmdd}.npz"
+
+    def _is_fresh(self, listing: MRMSListing, yyyymmdd: str) -> bool:
+
+        # MRMS uploads lag real time; a listing is complete only if it was *fetched* a day after the prefix closed
+        day_end = (datetime.strptime(yyyymmdd, "%Y%m%d") + timedelta(days=2)).replace(tzinfo=timezone.utc)
+        return listing.fetched_at >= day_end.timestamp() or (time.time() - listing.fetched_at) < self.ttl_s
+
+    def _load(self, fp: Path) -> MRMSListing | None:
+        try:
+            with np.load(fp, allow_pickle=False) as npz:
+                return MRMSListing(
+                    keys       = npz["keys"].astype(object),
+                    times      = npz["times"],
+                    fetched_at = float(npz["fetched_at"]),
+                )
+        except Exception:
+            return None
+
+    def _save(self, fp: Path, listing: MRMSListing) -> None:
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        tmp_fp = fp.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_fp, "wb") as f:
+            np.savez(f, keys=listing.keys.astype(str), times=listing.times, fetched_at=listing.fetched_at)
+        os.replace(tmp_fp, fp)
+
+    def get(self, product: str, day: datetime) -> MRMSListing:
+        """
+        **Timezone**: ``UTC``
+
+        Returns
+        ---
+        - The listing for the UTC day containing ``day``; raises ``FileNotFoundError`` if the prefix dne.
+        """
+
+        yyyymmdd = day.strftime("%Y%m%d")
+        mem_key  = (product, yyyymmdd)
+
+        # 1. in-memory
+        listing = self._mem.get(mem_key)
+        if listing is not None and self._is_fresh(listing, yyyymmdd):
+            return listing
+
+        # 2. on-disk
+        fp      = self._path(product, yyyymmdd)
+        listing = self._load(fp) if fp.is_file() else None
+
+        # 3. S3
+        if listing is None or not self._is_fresh(listing, yyyymmdd):
+            basepath = MRMSPath(domain=MRMSDomain.CONUS, product=product, yyyymmdd=yyyymmdd)
+            listing  = MRMSListing.from_keys(self.client.ls(str(basepath)))
+            self._save(fp, listing)
+
+        self._mem[mem_key] = listing
+        return listing
+
+    def get_range(self, product: str, start_time: datetime, end_time: datetime) -> MRMSListing:
+        """
+        **Timezone**: ``UTC``
+        - One merged listing for every UTC day in ``[start_time, end_time]``; days w/o a prefix are skipped.
+        """
+
+        listings = []
+        day = datetime(start_time.year, start_time.month, start_time.day)
+        while day <= end_time:
+            try:
+                listings.append(self.get(product, day))
+            except FileNotFoundError:
+                pass
+            day += timedelta(days=1)
+
+        return MRMSListing.concat(listings)
+
+    def match(
+            self, 
+            product: str, 
+            targets: np.ndarray, 
+            mode="nearest", 
+            tolerance: timedelta | None = None,
+        ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        **Timezone**: ``UTC``
+        - ``MRMSListing.match`` over every day spanned by ``targets``, padded so matches may cross midnight:
+            - by ``tolerance`` when set
+            - otherwise by one day on the side(s) ``mode`` may look at: before for ``"first"``, after for ``"next"``, both for ``"nearest"``
+        """
+
+        t = np.asarray(targets, dtype="datetime64[ns]").ravel()
+        t_valid = t[~np.isnat(t)]
+        if len(t_valid) == 0:
+            return MRMSListing.concat([]).match(t, mode=mode, tolerance=tolerance)
+
+        if tolerance is not None:
+            pad_lo = pad_hi = np.timedelta64(tolerance, "ns")
+        else:
+            m      = (mode or "nearest").lower()
+            day    = np.timedelta64(1, "D").astype("timedelta64[ns]")
+            pad_lo = day if m in ("nearest", "first") else np.timedelta64(0, "ns")
+            pad_hi = day if m in ("nearest", "next") else np.timedelta64(0, "ns")
+
+        start = (t_valid.min() - pad_lo).astype("datetime64[us]").item()
+        end   = (t_valid.max() + pad_hi).astype("datetime64[us]").item()
+        return self.get_range(product, start, end).match(t, mode=mode, tolerance=tolerance)
@@ -13,16 +13,21 @@
             - PRODUCT_YYYYMMDD-ZZZZZZ.grib2.gz
 """
  
+import os
 import re
+import time
+import asyncio
 import xarray
-import subprocess
+import threading
 
 from enum import Enum
 from pathlib import Path
 from datetime import datetime
+from dataclasses import dataclass
 from s3fs import S3FileSystem
 from typing import List, Optional
 from urllib.parse import urljoin, urlparse
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 
 class MRMSDomain:
@@ -160,40 +165,245 @@ class MRMSProducts:
         return products
 
 
+@dataclass
+class DownloadResult:
+    """
+    Outcome of a single object transfer.
+    """
+
+    key: str
+    local_path: str
+    bytes: int
+    elapsed: float
+    attempts: int
+
+
+class BulkDownload:
+    """
+    Handle for a queue of object transfers submitted via ``MRMSAWSS3Client.submit_bulk_download``.
+
+    - Poll w/ ``done()`` / ``progress()``; block w/ ``wait()``; ``await handle.wait_async()`` from asyncio code.
+    """
+
+    def __init__(self, download_f, keys: List[str], tos: List[str], max_workers: int):
+
+        assert len(keys) == len(tos), f"Error: got {len(keys)} keys but {len(tos)} destinations"
+
+        self.keys      = list(keys)
+        self.tos       = list(tos)
+        self.total     = len(self.keys)
+        self.completed = 0
+        self.failed    = 0
+        self.bytes     = 0
+
+        self._lock = threading.Lock()
+        self._t0   = time.perf_counter()
+        self._t1   = None
+
+        self._executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, self.total)))
+        self.futures: List[Future] = [self._executor.submit(download_f, k, t) for k, t in zip(self.keys, self.tos)]
+        for future in self.futures:
+            future.add_done_callback(self._on_done)
+
+        # no further submissions; queued transfers still run to completion
+        self._executor.shutdown(wait=False)
+
+        if self.total == 0:
+            self._t1 = self._t0
+
+    def _on_done(self, future: Future) -> None:
+        with self._lock:
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+                self.bytes     += future.result().bytes
+            if self.completed + self.failed == self.total:
+                self._t1 = time.perf_counter()
+
+    def done(self) -> bool:
+        return all(f.done() for f in self.futures)
+
+    def elapsed(self) -> float:
+        return (self._t1 or time.perf_counter()) - self._t0
+
+    def progress(self) -> dict:
+        """
+        Returns
+        ---
+        ```python
+        {
+            "total": int,
+            "completed": int,
+            "failed": int,
+            "bytes": int,
+            "elapsed_s": float,
+            "files_per_s": float,
+            "bytes_per_s": float,
+        }
+        ```
+        """
+        with self._lock:
+            completed, failed, nbytes = self.completed, self.failed, self.bytes
+        elapsed = self.elapsed()
+        return {
+            "total": self.total,
+            "completed": completed,
+            "failed": failed,
+            "bytes": nbytes,
+            "elapsed_s": elapsed,
+            "files_per_s": completed / elapsed if elapsed > 0 else 0.0,
+            "bytes_per_s": nbytes / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def as_completed(self, timeout: float | None = None):
+        """
+        Yield futures as their transfers finish.
+        """
+        return as_completed(self.futures, timeout=timeout)
+
+    def cancel(self) -> int:
+        """
+        Cancel all transfers that have not started yet; returns the number cancelled.
+        """
+        return sum(f.cancel() for f in self.futures)
+
+    def wait(self, timeout: float | None = None, raise_errors=True) -> List[DownloadResult | None]:
+        """
+        Block until every transfer finishes.
+
+        Returns
+        ---
+        - A list of ``DownloadResult``; same order as submitted. Failed transfers are ``None`` when ``raise_errors=False``.
+        """
+        for _ in as_completed(self.futures, timeout=timeout): pass
+
+        results = []
+        for future in self.futures:
+            err = None if future.cancelled() else future.exception()
+            if future.cancelled() or err is not None:
+                if raise_errors:
+                    raise err if err is not None else RuntimeError("Download cancelled.")
+                results.append(None)
+                continue
+            results.append(future.result())
+        return results
+
+    async def wait_async(self, raise_errors=True) -> List[DownloadResult | None]:
+        """
+        Awaitable version of ``wait``.
+        """
+        await asyncio.gather(*[asyncio.wrap_future(f) for f in self.futures], return_exceptions=True)
+        return self.wait(raise_errors=raise_errors)
+
+
 class MRMSAWSS3Client:
     """
     A high-level python API for the public MRMS AWS S3 bucket.
     """
 
-    def __init__(self, format="NCEP"):
+    # per-object retry policy; backoff doubles after each failed attempt
+    _MAX_RETRIES = 3
+    _BACKOFF_S   = 0.5
 
-        # create an anonymous fs
-        self.s3_file_system = S3FileSystem(anon=True)
-        self.format = format
+    def __init__(self, format="NCEP", max_workers: int = 16, file_system=None):
+        """
+        Params
+        ---
+        - :max_workers: max number of concurrent object transfers
+        - :file_system: any ``fsspec`` filesystem; defaults to an anonymous ``S3FileSystem``
+            - e.g., pass a ``LocalFileSystem`` pointed at a local mirror of ``noaa-mrms-pds`` for testing
+        """
+
+        # create an anonymous fs; size the connection pool to the transfer pool so connections are reused
+        if file_system is None:
+            file_system = S3FileSystem(anon=True, config_kwargs={"max_pool_connections": max_workers})
+
+        self.s3_file_system = file_system
+        self.format         = format
+        self.max_workers    = max_workers
 
     def ls(self, path: str) -> List[str]:
         return self.s3_file_system.ls(path)
 
+    def _strip_protocol(self, path: str) -> str:
+        return self.s3_file_system._strip_protocol(path)
+
+    def _with_retries(self, f, key: str):
+        """
+        Call ``f()``; retry transient failures w/ exponential backoff.
+
+        Returns
+        ---
+        - ``(f(), attempts)``
+        """
+
+        for attempt in range(1, self._MAX_RETRIES + 1):
+            try:
+                return f(), attempt
+            except FileNotFoundError:
+                # missing keys will not appear on retry
+                raise
+            except Exception as e:
+                if attempt == self._MAX_RETRIES:
+                    raise RuntimeError(f"Transfer failed after {attempt} attempts: {key}") from e
+                time.sleep(self._BACKOFF_S * 2 ** (attempt - 1))
+
+    def _download_object(self, key: str, to: str) -> DownloadResult:
+        """
+        Copy a single remote object -> local file ``to``.
+        """
+
+        os.makedirs(os.path.dirname(to) or ".", exist_ok=True)
+
+        t0 = time.perf_counter()
+        _, attempts = self._with_retries(lambda: self.s3_file_system.get_file(key, to), key)
+        return DownloadResult(
+            key        = key,
+            local_path = to,
+            bytes      = os.path.getsize(to),
+            elapsed    = time.perf_counter() - t0,
+            attempts   = attempts,
+        )
+
+    def read_bytes(self, path: str) -> bytes:
+        """
+        Read a single remote object straight into memory; nothing touches disk.
+        """
+        key = self._strip_protocol(path)
+        buf, _ = self._with_retries(lambda: self.s3_file_system.cat_file(key), key)
+        return buf
+
+    def download_objects(self, keys: List[str], tos: List[str]) -> List[DownloadResult]:
+        """
+        Download many objects concurrently over the shared filesystem handle.
+
+        Returns
+        ---
+        - A list of ``DownloadResult``; same order as ``keys``.
+        """
+
+        return self.submit_bulk_download(keys, tos).wait()
+
     def download(self, path: str, to: str, recursive=False) -> List[str] | str:
         """
         Returns
         ---
-        - A list of `str` paths corresponding to successfully downloaded files.
+        - ``recursive=False``: the local path of the single downloaded object
+        - ``recursive=True``: a list of local paths, one per object under the prefix; always a list, even for one object
         """
 
         assert self.s3_file_system.exists(path), f"Error! Invalid path: {path}"
-        # assert Path(to).is_dir(), f"Error! 'To' not a valid dir: {to}"
 
         # if  : recursive is true than path msut always be a dir
         # else: path must be a file + file name must be appended to end of "to"
-        remote_files = [path]
+        remote_files = [self._strip_protocol(path)]
         if recursive == True:
             assert path.endswith("/"), (
                 "When recursive=True the S3 path must end with '/' so it is "
                 "interpreted as a prefix, not a single object."
             )
-            remote_entries = self.s3_file_system.ls(path, detail=True)
-            remote_files = [e["Key"] for e in remote_entries if e["type"] == "file"]
+            remote_files = self.s3_file_system.find(path)
         else:
             assert not path.endswith("/"), (
                 "When recursive=False the S3 path must point to a single object, "
@@ -204,33 +414,37 @@ class MRMSAWSS3Client:
         dst_root = Path(to).expanduser().resolve()
         local_paths: List[str] = []
         if recursive:
-            prefix_len = len(path)
+            prefix = self._strip_protocol(path).rstrip("/") + "/"
             for key in remote_files:
-                rel_key = key[prefix_len:]
+                rel_key = key[len(prefix):]
                 local_paths.append(str(dst_root / rel_key))
         else:
             local_paths.append(str(dst_root / Path(path).name))
 
         # try to download files -> "to"
-        cmd = ["aws", "s3", "cp", path, str(to), "--no-sign-request"]
-        if recursive:
-            cmd.append("--recursive")
-
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            from pprint import pprint
-            pprint(f"Command failed to execute: {cmd}")
-            raise RuntimeError(
-                f"Download failed:\nSTDOUT: {result.stdout}\nSTDERR: {result.stderr}"
-            )
+        results = self.download_objects(remote_files, local_paths)
+        local_paths = [res.local_path for res in results]
 
-        # TODO: clarify; wtf is this
-        if len(local_paths) == 1:
+        # the return type follows the mode, not the number of objects found
+        if not recursive:
             return local_paths[0]
-        
+
         return local_paths
 
-    def submit_bulk_download(self, paths: List[str], tos: List[str]): ...
+    def submit_bulk_download(self, paths: List[str], tos: List[str], max_workers: int | None = None) -> BulkDownload:
+        """
+        Queue many (remote key, local path) transfers without blocking.
+
+        Params
+        ---
+        - :max_workers: concurrency cap for this batch; default: ``self.max_workers``
+
+        Returns
+        ---
+        - A ``BulkDownload`` handle exposing per-key futures and aggregate progress/throughput counters.
+        """
+        keys = [self._strip_protocol(p) for p in paths]
+        return BulkDownload(self._download_object, keys, tos, max_workers or self.max_workers)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+"""
+# Staged MRMS fetch pipeline
+---
+download (thread pool) -> decompress + decode (process pool) -> caller, connected by bounded queues.
+
+- Files are decoded as soon as their bytes land; network and CPU overlap
+- Compressed bytes are held in memory; nothing is written to disk
+- Decoded values come back through shared buffers (see ``SharedGrid``), not pickled through the pool's result pipe
+- Backpressure: at most ``max_buffered`` downloaded files wait for a decoder and at most ``max_decoding``
+  decodes/results are outstanding, so memory stays flat no matter how many files are requested
+"""
+
+import os
+import queue
+import threading
+
+from typing import Any, Callable, Iterable, Iterator, Tuple
+from functools import partial
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+
+from src.utils.mrms.mrms import MRMSAWSS3Client
+
+
+_SENTINEL = object()
+
+# poll interval (s) for blocked stages to notice the pipeline was closed early
+_POLL_S = 0.1
+
+
+class MRMSFetchPipeline:
+
+    def __init__(
+            self,
+            client: MRMSAWSS3Client,
+            decode_f: Callable,
+            n_download: int = 16,
+            n_decode: int | None = None,
+            max_buffered: int = 32,
+            max_decoding: int | None = None,
+        ):
+        """
+        Params
+        ---
+        - :decode_f: picklable ``f(buf: bytes, *args)``; runs in the process pool
+        - :n_download: concurrent downloads
+        - :n_decode: decode processes; default: ``os.cpu_count()``
+        - :max_buffered: max downloaded files waiting for a decoder
+        - :max_decoding: max decodes submitted but not yet consumed; default: ``2 * n_decode``
+        """
+        self.client       = client
+        self.decode_f     = decode_f
+        self.n_download   = n_download
+        self.n_decode     = n_decode or os.cpu_count() or 1
+        self.max_buffered = max_buffered
+        self.max_decoding = max_decoding or 2 * self.n_decode
+
+    @staticmethod
+    def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=_POLL_S)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    @staticmethod
+    def _acquire(sem: threading.Semaphore, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            if sem.acquire(timeout=_POLL_S):
+                return True
+        return False
+
+    def run(self, items: Iterable[Tuple[Any, str, tuple]]) -> Iterator[Tuple[Any, Any]]:
+        """
+        Params
+        ---
+        - :items: ``(tag, key, decode_args)``; ``decode_f(bytes(key), *decode_args)`` is run for each
+
+        Returns
+        ---
+        - An iterator of ``(tag, result)`` in completion order; ``result`` is the ``Exception`` raised if the download or decode failed.
+        """
+
+        items = list(items)
+        if not items:
+            return
+
+        in_q  = queue.Queue()
+        buf_q = queue.Queue(maxsize=self.max_buffered)
+        out_q = queue.Queue()
+        stop  = threading.Event()
+        sem   = threading.Semaphore(self.max_decoding)
+
+        for item in items:
+            in_q.put(item)
+
+        # stage 1: download
+        def _download():
+            while not stop.is_set():
+                try:
+                    tag, key, args = in_q.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    buf = self.client.read_bytes(key)
+                except Exception as e:
+                    out_q.put((tag, e, False))
+                    continue
+                if not self._put(buf_q, (tag, buf, args), stop):
+                    return
+
+        downloaders = [threading.Thread(target=_download, daemon=True) for _ in range(min(self.n_download, len(items)))]
+        for t in downloaders:
+            t.start()
+
+        def _close_downloads():
+            for t in downloaders:
+                t.join()
+            self._put(buf_q, _SENTINEL, stop)
+
+        threading.Thread(target=_close_downloads, daemon=True).start()
+
+        # stage 2: decode
+        def _on_decoded(f, tag):
+            # cancelled by an early close; nothing to collect, but the slot is still handed back
+            if f.cancelled():
+                out_q.put((tag, CancelledError(f"decode of {tag} was cancelled"), True))
+                return
+            e = f.exception()
+            out_q.put((tag, e if e is not None else f.result(), True))
+
+        def _dispatch():
+            # a dead worker breaks the pool; every later item is failed w/ the same error instead of submitted
+            broken = None
+            with ProcessPoolExecutor(max_workers=self.n_decode) as ex:
+                while not stop.is_set():
+                    try:
+                        item = buf_q.get(timeout=_POLL_S)
+                    except queue.Empty:
+                        continue
+                    if item is _SENTINEL:
+                        break
+                    tag, buf, args = item
+                    if broken is not None:
+                        out_q.put((tag, broken, False))
+                        continue
+                    if not self._acquire(sem, stop):
+                        break
+                    try:
+                        future = ex.submit(self.decode_f, buf, *args)
+                    except Exception as e:
+                        sem.release()
+                        broken = e
+                        out_q.put((tag, e, False))
+                        continue
+                    future.add_done_callback(partial(_on_decoded, tag=tag))
+                if stop.is_set():
+                    # let in-flight decodes land so their results can be released below
+                    ex.shutdown(wait=True, cancel_futures=True)
+
+        dispatcher = threading.Thread(target=_dispatch, daemon=True)
+        dispatcher.start()
+
+        # stage 3: hand results to the caller
+        try:
+            for _ in range(len(items)):
+                while True:
+                    try:
+                        tag, result, decoded = out_q.get(timeout=_POLL_S)
+                        break
+                    except queue.Empty:
+                        # dispatcher exits only after every item has a result; if it is gone and nothing is left, it died
+                        if not dispatcher.is_alive() and out_q.empty():
+                            raise RuntimeError("Error: decode dispatcher exited before all items were processed")
+                if decoded:
+                    sem.release()
+                yield tag, result
+        finally:
+            stop.set()
+            dispatcher.join()
+            # closed early: release shared buffers of results nobody will consume
+            while True:
+                try:
+                    _, result, _ = out_q.get_nowait()
+                except queue.Empty:
+                    break
+                if hasattr(result, "discard"):
+                    result.discard()